@@ -0,0 +1,314 @@
+"""Generator of synthetic glue sessions for the benchmarks."""
+
+import json
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+SCATTER_VIEWER = "glue.viewers.scatter.qt.data_viewer.ScatterViewer"
+HISTOGRAM_VIEWER = "glue.viewers.histogram.qt.data_viewer.HistogramViewer"
+IDENTITY_FUNCTION = {
+    "_type": "types.FunctionType",
+    "function": "glue.core.link_helpers.identity",
+}
+
+
+def write_table(
+    path: Path, rows: int, components: int, seed: int = 0, prefix: str = "c"
+) -> None:
+    """Write a CSV table of random values
+
+    Args:
+        path (Path): Path of the file
+        rows (int): Number of rows
+        components (int): Number of columns, named <prefix>0, <prefix>1...
+        seed (int, optional): Seed of the random values
+        prefix (str, optional): Prefix of the column names
+    """
+    values = np.random.default_rng(seed).random((rows, components))
+    header = ",".join(f"{prefix}{i}" for i in range(components))
+    np.savetxt(path, values, delimiter=",", header=header, comments="", fmt="%.6f")
+
+
+def generate_session(
+    directory: str,
+    datasets: int = 2,
+    rows: int = 1000,
+    components: int = 4,
+    links: int = 1,
+    tabs: int = 1,
+    viewers: int = 2,
+    layers: int = 1,
+    seed: int = 0,
+) -> Path:
+    """Write a synthetic glue session and its data files
+
+    The datasets are CSV tables of random values. The viewers alternate
+    between scatter and histogram viewers, each one showing `layers`
+    datasets, and are spread over the tabs. The links are identity links
+    between the columns of consecutive datasets.
+
+    Args:
+        directory (str): Directory of the session and data files
+        datasets (int, optional): Number of datasets
+        rows (int, optional): Number of rows of each dataset
+        components (int, optional): Number of columns of each dataset,
+        at least 2
+        links (int, optional): Number of links between two consecutive
+        datasets, at most `components`
+        tabs (int, optional): Number of tabs
+        viewers (int, optional): Number of viewers per tab
+        layers (int, optional): Number of layers per viewer, at most
+        `datasets`
+        seed (int, optional): Seed of the random values
+
+    Returns:
+        Path: Path of the session file
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    contents: Dict[str, Dict] = {"Session": {"_type": "glue.core.session.Session"}}
+
+    data_names = [f"data_{i}" for i in range(datasets)]
+    cids: Dict[str, List[str]] = {}
+    all_cids, all_components = [], []
+    for i, data_name in enumerate(data_names):
+        # The columns are named after their dataset, so that their labels
+        # are unique and used as keys, as glue does when saving a session
+        prefix = f"{data_name}_c"
+        write_table(directory / f"{data_name}.csv", rows, components, seed + i, prefix)
+        load_log = "LoadLog" if i == 0 else f"LoadLog_{i - 1}"
+        contents[load_log] = {
+            "_protocol": 2,
+            "_type": "glue.core.data_factories.helpers.LoadLog",
+            "factory": {
+                "_type": "types.FunctionType",
+                "function": "glue.core.data_factories.tables.tabular_data",
+            },
+            "force_coords": False,
+            "kwargs": [[]],
+            "path": f"{data_name}.csv",
+        }
+
+        pixel_cid = f"Pixel Axis 0 [{data_name}]"
+        contents[pixel_cid] = {
+            "_type": "glue.core.component_id.PixelComponentID",
+            "axis": 0,
+            "label": "Pixel Axis 0 [x]",
+        }
+        contents[f"{data_name}.coordinates"] = {
+            "_type": "glue.core.component.CoordinateComponent",
+            "axis": 0,
+            "world": False,
+        }
+        data_components = [[pixel_cid, f"{data_name}.coordinates"]]
+        cids[data_name] = []
+        for j in range(components):
+            cid = f"{prefix}{j}"
+            contents[cid] = {
+                "_type": "glue.core.component_id.ComponentID",
+                "label": cid,
+            }
+            contents[f"{cid}.component"] = {
+                "_type": "glue.core.component.Component",
+                "log": load_log,
+                "log_item": j + 1,
+            }
+            data_components.append([cid, f"{cid}.component"])
+            cids[data_name].append(cid)
+
+        contents[data_name] = {
+            "_key_joins": [],
+            "_protocol": 5,
+            "_type": "glue.core.data.Data",
+            "components": data_components,
+            "label": data_name,
+            "meta": {"_type": "collections.OrderedDict", "contents": {}},
+            "primary_owner": [cid for cid, _ in data_components],
+            "style": _style("#595959", 0.8),
+            "subsets": [],
+            "uuid": f"00000000-0000-0000-0000-{i:012d}",
+        }
+        all_cids.extend(cid for cid, _ in data_components)
+        all_components.extend(component for _, component in data_components)
+
+    link_names = []
+    for i in range(datasets - 1):
+        for j in range(min(links, components)):
+            link_name = f"ComponentLink_{i}_{j}"
+            contents[link_name] = {
+                "_type": "glue.core.component_link.ComponentLink",
+                "frm": [cids[data_names[i]][j]],
+                "inverse": IDENTITY_FUNCTION,
+                "to": [cids[data_names[i + 1]][j]],
+                "using": IDENTITY_FUNCTION,
+            }
+            link_names.append(link_name)
+
+    contents["DataCollection"] = {
+        "_protocol": 4,
+        "_type": "glue.core.data_collection.DataCollection",
+        "cids": all_cids,
+        "components": all_components,
+        "data": data_names,
+        "groups": [],
+        "links": link_names,
+        "subset_group_count": 0,
+    }
+
+    tab_viewers = []
+    index = 0
+    for _ in range(tabs):
+        viewer_names = []
+        for _ in range(viewers):
+            viewer_name = f"Viewer_{index}"
+            layer_datasets = [
+                data_names[(index + k) % datasets] for k in range(min(layers, datasets))
+            ]
+            if index % 2 == 0:
+                _add_scatter_viewer(contents, viewer_name, layer_datasets, cids)
+            else:
+                _add_histogram_viewer(contents, viewer_name, layer_datasets, cids)
+            viewer_names.append(viewer_name)
+            index += 1
+        tab_viewers.append(viewer_names)
+
+    contents["__main__"] = {
+        "_type": "glue.app.qt.application.GlueApplication",
+        "data": "DataCollection",
+        "plugins": [],
+        "session": "Session",
+        "tab_names": [f"Tab {i + 1}" for i in range(tabs)],
+        "viewers": tab_viewers,
+    }
+
+    path = directory / "session.glu"
+    path.write_text(json.dumps(contents, indent=2, sort_keys=True))
+    return path
+
+
+def _style(color: str, alpha: float) -> Dict:
+    return {
+        "_type": "glue.core.visual.VisualAttributes",
+        "alpha": alpha,
+        "color": color,
+        "linestyle": "solid",
+        "linewidth": 1,
+        "marker": "o",
+        "markersize": 3,
+    }
+
+
+def _add_layers(
+    contents: Dict, viewer_name: str, layer_type: str, layer_states: List[Dict]
+) -> str:
+    names = []
+    for i, values in enumerate(layer_states):
+        name = f"{viewer_name}.layer_{i}"
+        contents[name] = {"_type": layer_type, "values": values}
+        names.append(name)
+    contents[f"{viewer_name}.layers"] = {
+        "_type": "echo.containers.CallbackList",
+        "values": names,
+    }
+    return f"{viewer_name}.layers"
+
+
+def _add_scatter_viewer(
+    contents: Dict, viewer_name: str, datasets: List[str], cids: Dict[str, List[str]]
+) -> None:
+    layer_states = [
+        {
+            "alpha": 0.8,
+            "color": "st__#595959",
+            "layer": data_name,
+            "points_mode": "st__auto",
+            "size": 3,
+            "visible": True,
+            "zorder": i + 1,
+        }
+        for i, data_name in enumerate(datasets)
+    ]
+    layers = _add_layers(
+        contents,
+        viewer_name,
+        "glue.viewers.scatter.state.ScatterLayerState",
+        layer_states,
+    )
+    x_att, y_att = cids[datasets[0]][:2]
+    contents[viewer_name] = {
+        "_protocol": 1,
+        "_type": SCATTER_VIEWER,
+        "layers": [
+            {
+                "_type": "glue.viewers.scatter.layer_artist.ScatterLayerArtist",
+                "state": name,
+            }
+            for name in contents[layers]["values"]
+        ],
+        "pos": [0, 0],
+        "session": "Session",
+        "size": [600, 400],
+        "state": {
+            "values": {
+                "layers": layers,
+                "x_att": x_att,
+                "x_log": False,
+                "x_max": 1,
+                "x_min": 0,
+                "y_att": y_att,
+                "y_log": False,
+                "y_max": 1,
+                "y_min": 0,
+            }
+        },
+    }
+
+
+def _add_histogram_viewer(
+    contents: Dict, viewer_name: str, datasets: List[str], cids: Dict[str, List[str]]
+) -> None:
+    layer_states = [
+        {
+            "alpha": 0.8,
+            "color": "st__#595959",
+            "layer": data_name,
+            "visible": True,
+            "zorder": i + 1,
+        }
+        for i, data_name in enumerate(datasets)
+    ]
+    layers = _add_layers(
+        contents,
+        viewer_name,
+        "glue.viewers.histogram.state.HistogramLayerState",
+        layer_states,
+    )
+    contents[viewer_name] = {
+        "_protocol": 1,
+        "_type": HISTOGRAM_VIEWER,
+        "layers": [
+            {
+                "_type": "glue.viewers.histogram.qt.layer_artist.QThreadedHistogramLayerArtist",
+                "state": name,
+            }
+            for name in contents[layers]["values"]
+        ],
+        "pos": [0, 0],
+        "session": "Session",
+        "size": [600, 400],
+        "state": {
+            "values": {
+                "cumulative": False,
+                "hist_n_bin": 20,
+                "hist_x_max": 1,
+                "hist_x_min": 0,
+                "layers": layers,
+                "normalize": False,
+                "x_att": cids[datasets[0]][0],
+                "x_log": False,
+                "y_log": False,
+            }
+        },
+    }
@@ -0,0 +1,330 @@
+"""Benchmarks of the open, edit and save paths of the glue sessions.
+
+Each scale generates a synthetic session (see `glu_generator`), then times:
+
+- `YGlue.set` and `YGlue.get` of the session file
+- the `SharedGlueSession` initialization
+- the loading of all the datasets
+- `render_viewer` of all the viewers
+- `YGlue.set` of the session file with a viewer state edited
+- `add_data` of a new data file
+- the removal and the addition of all the links
+
+Each operation is run `--repeat` times on a new session and the fastest run
+is kept. The peak memory of a whole open, edit and save cycle is measured in
+a separate run with `tracemalloc`, which slows down the code it traces.
+
+Usage:
+
+    python -m benchmarks.run_benchmarks --output results.json
+    python -m benchmarks.run_benchmarks --save-baseline
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+from .glu_generator import generate_session, write_table
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+
+SCALES: Dict[str, Dict] = {
+    "small": dict(
+        datasets=2, rows=1_000, components=4, links=1, tabs=1, viewers=2, layers=1
+    ),
+    "medium": dict(
+        datasets=5, rows=50_000, components=8, links=2, tabs=2, viewers=3, layers=2
+    ),
+    "large": dict(
+        datasets=8, rows=100_000, components=8, links=4, tabs=4, viewers=4, layers=3
+    ),
+}
+
+# Differences smaller than this (in seconds) are never regressions, the
+# timings of the fast operations being too noisy
+MIN_REGRESSION = 0.005
+
+
+@contextlib.contextmanager
+def _working_directory(path: Path) -> Iterator[None]:
+    # The session resolves the data paths against the working directory
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+class SessionBenchmark:
+    """Operations on a synthetic session, timed one by one"""
+
+    def __init__(self, directory: Path, session_path: Path):
+        self.directory = directory
+        self.session_path = session_path
+        self.source = session_path.read_text()
+        self.document = None
+        self.session = None
+
+    def ydoc_set(self) -> None:
+        from jupyter_ydoc import ydocs
+
+        self.document = ydocs["glu"]()
+        self.document.set(self.source)
+
+    def ydoc_get(self) -> None:
+        self.document.get()
+
+    def session_init(self) -> None:
+        from glue_jupyterlab.glue_session import SharedGlueSession
+
+        self.session = SharedGlueSession(str(self.session_path))
+        self.session._document = self.document
+
+    def load_data(self) -> None:
+        self.session._load_data()
+        self.session.load_all_data()
+
+    def render_viewer(self) -> None:
+        for tab_name in self.document.get_tab_names():
+            for viewer_id in self.document.get_tab_data(tab_name):
+                self.session.create_viewer(tab_name, viewer_id, display_view=False)
+        self.session.render_viewer()
+
+    def ydoc_edit(self) -> None:
+        # The session file saved after moving the x axis of the first viewer,
+        # only the difference is applied to the document
+        contents = json.loads(self.source)
+        viewer_id = contents["__main__"]["viewers"][0][0]
+        values = contents[viewer_id]["state"]["values"]
+        values["x_min"], values["x_max"] = 0.25, 0.75
+        self.document.set(json.dumps(contents))
+
+    def add_data(self) -> None:
+        path = self.directory / f"extra_{time.perf_counter_ns()}.csv"
+        write_table(path, 1_000, 4, prefix="extra_c")
+        self.session.add_data(str(path.resolve()))
+
+    def update_links(self) -> None:
+        links = self.document.view("links")
+        self.session._update_links(
+            {key: {"action": "delete", "oldValue": link} for key, link in links.items()}
+        )
+        self.session._update_links(
+            {key: {"action": "add", "newValue": link} for key, link in links.items()}
+        )
+
+    def run(self, steps: List[str]) -> Dict[str, float]:
+        """Run the steps in order, returning the duration of each one"""
+        timings = {}
+        # The widgets displayed outside of a kernel are printed
+        with _working_directory(self.directory), contextlib.redirect_stdout(
+            io.StringIO()
+        ):
+            for step in steps:
+                start = time.perf_counter()
+                getattr(self, step)()
+                timings[step] = time.perf_counter() - start
+        return timings
+
+    def check(self) -> List[str]:
+        """Names of the viewers which could not be rendered"""
+        errors = []
+        for tab_name, viewers in self.session._viewers.items():
+            for viewer_id, viewer in viewers.items():
+                if "viewer_options" not in viewer:
+                    errors.append(f"{tab_name}/{viewer_id}")
+        return errors
+
+
+STEPS = [
+    "ydoc_set",
+    "session_init",
+    "load_data",
+    "render_viewer",
+    "ydoc_edit",
+    "update_links",
+    "add_data",
+    "ydoc_get",
+]
+
+
+def run_scale(name: str, parameters: Dict, repeat: int = 3) -> Dict:
+    """Benchmark a session of the given scale
+
+    Args:
+        name (str): Name of the scale
+        parameters (Dict): Parameters of `generate_session`
+        repeat (int, optional): Number of runs, the fastest one being kept
+
+    Returns:
+        Dict: The "parameters", the "timings" of each step in seconds and
+        the "peak_memory" in bytes
+    """
+    with tempfile.TemporaryDirectory(prefix=f"glue-benchmark-{name}-") as tmp:
+        directory = Path(tmp)
+        session_path = generate_session(directory, **parameters)
+
+        timings: Dict[str, float] = {}
+        for _ in range(repeat):
+            benchmark = SessionBenchmark(directory, session_path)
+            run = benchmark.run(STEPS)
+            errors = benchmark.check()
+            if errors:
+                raise RuntimeError(f"Viewers not rendered: {', '.join(errors)}")
+            for step, duration in run.items():
+                timings[step] = min(duration, timings.get(step, duration))
+            del benchmark
+            gc.collect()
+
+        peak_memory = _measure_peak_memory(
+            lambda: SessionBenchmark(directory, session_path).run(STEPS)
+        )
+
+    return {
+        "parameters": parameters,
+        "timings": timings,
+        "peak_memory": peak_memory,
+    }
+
+
+def _measure_peak_memory(function: Callable[[], object]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run_benchmarks(scales: List[str], repeat: int = 3) -> Dict:
+    """Benchmark the sessions of the given scales
+
+    Returns:
+        Dict: The "metadata" of the run and the "results" of each scale
+    """
+    import glue
+    import glue_jupyter
+
+    results = {}
+    for name in scales:
+        print(f"Running the {name} benchmark...", file=sys.stderr)
+        results[name] = run_scale(name, SCALES[name], repeat)
+
+    return {
+        "metadata": {
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "glue": glue.__version__,
+            "glue_jupyter": glue_jupyter.__version__,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float = 0.5) -> List[str]:
+    """Compare benchmark results against a baseline
+
+    Args:
+        results (Dict): The results of `run_benchmarks`
+        baseline (Dict): The baseline, results of a previous run
+        tolerance (float, optional): Relative increase tolerated before a
+        value is considered as a regression
+
+    Returns:
+        List[str]: A description of each regression
+    """
+    regressions = []
+    for scale, result in results["results"].items():
+        reference = baseline.get("results", {}).get(scale)
+        if reference is None:
+            continue
+
+        for step, duration in result["timings"].items():
+            previous = reference["timings"].get(step)
+            if previous is None:
+                continue
+            if (
+                duration > previous * (1 + tolerance)
+                and duration - previous > MIN_REGRESSION
+            ):
+                regressions.append(
+                    f"{scale}/{step}: {duration * 1000:.1f} ms "
+                    f"(baseline {previous * 1000:.1f} ms)"
+                )
+
+        previous = reference.get("peak_memory")
+        if previous and result["peak_memory"] > previous * (1 + tolerance):
+            regressions.append(
+                f"{scale}/peak_memory: {result['peak_memory'] / 2**20:.1f} MiB "
+                f"(baseline {previous / 2**20:.1f} MiB)"
+            )
+    return regressions
+
+
+def _print_results(results: Dict) -> None:
+    for scale, result in results["results"].items():
+        print(f"{scale}:")
+        for step, duration in result["timings"].items():
+            print(f"  {step:<16}{duration * 1000:10.1f} ms")
+        print(f"  {'peak_memory':<16}{result['peak_memory'] / 2**20:10.1f} MiB")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scales", nargs="+", choices=list(SCALES), default=list(SCALES)
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.5,
+        help="Relative slowdown tolerated before failing (0.5 for 50%%)",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Write the results as the new baseline instead of comparing",
+    )
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.scales, args.repeat)
+    _print_results(results)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+    if args.save_baseline:
+        Path(args.baseline).write_text(json.dumps(results, indent=2) + "\n")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, nothing to compare")
+        return 0
+
+    baseline = json.loads(Path(args.baseline).read_text())
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"Regression: {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,3 @@
-from .handlers import setup_handlers
-
-
 def _jupyter_labextension_paths():
     return [{"src": "labextension", "dest": "glue-jupyterlab"}]
 
@@ -17,7 +14,13 @@ def _load_jupyter_server_extension(server_app):
     server_app: jupyterlab.labapp.LabApp
         JupyterLab application instance
     """
+    # Imported here so that the kernels importing the glue session do not
+    # import the server.
+    from .handlers import setup_handlers
+    from .kernel_pool import setup_kernel_pool
+
     setup_handlers(server_app.web_app)
+    setup_kernel_pool(server_app)
     name = "glue_jupyterlab"
     server_app.log.info(f"Registered {name} server extension")
 
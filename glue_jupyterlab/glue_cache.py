@@ -0,0 +1,226 @@
+import hashlib
+import importlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from astropy.wcs import WCS
+from glue.core.component import CategoricalComponent, Component
+from glue.core.data import Data
+from glue.core.data_factories import load_data
+from glue.core.data_factories.helpers import LoadLog
+
+# Set this environment variable to a directory to enable the data cache
+# in the glue sessions.
+CACHE_DIR_ENV = "GLUE_JUPYTERLAB_DATA_CACHE"
+
+DEFAULT_MAX_SIZE = 4 << 30
+
+CACHE_VERSION = 1
+
+
+class DataCache:
+    """On-disk cache of the datasets read by glue.
+
+    Entries are keyed by the path, modification time and size of the file
+    and by the loader options. The components are stored as ``.npy`` files
+    which are memory-mapped when the dataset is read back, so a cache hit
+    does not parse the file. The least recently used entries are evicted
+    when the cache grows over ``max_size`` bytes.
+    """
+
+    def __init__(self, directory: str, max_size: int = DEFAULT_MAX_SIZE):
+        self._directory = Path(directory)
+        self._max_size = max_size
+        self._directory.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_environment(cls) -> Optional["DataCache"]:
+        """Create the cache configured by the environment, if any"""
+        directory = os.environ.get(CACHE_DIR_ENV)
+        if not directory:
+            return None
+        return cls(directory)
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    def load_data(self, path: str, factory: Optional[Callable] = None, **kwargs):
+        """Same as `glue.core.data_factories.load_data`, reading the dataset
+        from the cache when possible"""
+        key = self.key(path, factory, kwargs)
+        data = self.get(key)
+        if data is not None:
+            return data
+
+        data = load_data(path, factory=factory, **kwargs)
+        if isinstance(data, Data):
+            self.put(key, data)
+        return data
+
+    def key(self, path: str, factory: Optional[Callable], options: Dict) -> str:
+        """Compute the key of a data file and its loader options"""
+        stat = os.stat(path)
+        description = [
+            CACHE_VERSION,
+            os.path.abspath(path),
+            stat.st_mtime_ns,
+            stat.st_size,
+            _function_name(factory) if factory is not None else None,
+            sorted((k, repr(v)) for k, v in options.items()),
+        ]
+        return hashlib.sha256(json.dumps(description).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Data]:
+        """Read a dataset from the cache, None if it is not cached"""
+        entry = self._directory / key
+        try:
+            with open(entry / "meta.json", "r") as fobj:
+                meta = json.load(fobj)
+            data = _restore_data(entry, meta)
+        except Exception:
+            return None
+
+        # Mark the entry as recently used
+        os.utime(entry / "meta.json")
+        return data
+
+    def put(self, key: str, data: Data) -> bool:
+        """Store a dataset in the cache
+
+        Returns:
+            bool: Whether the dataset could be cached
+        """
+        entry = self._directory / key
+        if entry.exists():
+            return True
+
+        tmp = Path(tempfile.mkdtemp(prefix=f".{key}-", dir=self._directory))
+        try:
+            meta = _store_data(tmp, data)
+            if meta is None:
+                return False
+            with open(tmp / "meta.json", "w") as fobj:
+                json.dump(meta, fobj)
+            os.replace(tmp, entry)
+        except (OSError, TypeError):
+            return False
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        self._evict()
+        return True
+
+    def info(self) -> List[Dict]:
+        """List the cache entries, most recently used first"""
+        entries = []
+        for entry in self._directory.iterdir():
+            meta_path = entry / "meta.json"
+            if entry.name.startswith(".") or not meta_path.exists():
+                continue
+            with open(meta_path, "r") as fobj:
+                meta = json.load(fobj)
+            entries.append(
+                {
+                    "key": entry.name,
+                    "path": meta["path"],
+                    "label": meta["label"],
+                    "size": _entry_size(entry),
+                    "last_used": meta_path.stat().st_mtime,
+                }
+            )
+        return sorted(entries, key=lambda e: e["last_used"], reverse=True)
+
+    def clear(self) -> None:
+        """Remove all the cache entries"""
+        for entry in self._directory.iterdir():
+            shutil.rmtree(entry, ignore_errors=True)
+
+    def _evict(self) -> None:
+        entries = self.info()
+        total = sum(e["size"] for e in entries)
+        while entries and total > self._max_size:
+            entry = entries.pop()
+            shutil.rmtree(self._directory / entry["key"], ignore_errors=True)
+            total -= entry["size"]
+
+
+def _store_data(directory: Path, data: Data) -> Optional[Dict]:
+    load_log = getattr(data, "_load_log", None)
+    if load_log is None:
+        return None
+
+    if data.coords is None:
+        wcs = None
+    elif isinstance(data.coords, WCS):
+        wcs = data.coords.to_header_string()
+    else:
+        return None
+
+    components = []
+    for idx, cid in enumerate(data.main_components):
+        component = data.get_component(cid)
+        if type(component) is Component:
+            kind = "numerical"
+            array = np.asarray(component.data)
+        elif type(component) is CategoricalComponent:
+            kind = "categorical"
+            # The labels of the tables are object arrays of strings, stored
+            # as fixed-width strings to be memory-mapped when restored.
+            array = np.asarray(component.labels)
+            if array.dtype.kind == "O":
+                array = array.astype(str)
+        else:
+            return None
+        if array.dtype.kind == "O":
+            return None
+        np.save(directory / f"{idx}.npy", array)
+        components.append({"label": cid.label, "kind": kind, "units": component.units})
+
+    return {
+        "label": data.label,
+        "path": load_log.path,
+        "factory": _function_name(load_log.factory),
+        "kwargs": {k: v for k, v in load_log.kwargs.items()},
+        "wcs": wcs,
+        "components": components,
+        "time": time.time(),
+    }
+
+
+def _restore_data(directory: Path, meta: Dict) -> Data:
+    data = Data(label=meta["label"])
+    if meta["wcs"] is not None:
+        data.coords = WCS(meta["wcs"])
+
+    for idx, info in enumerate(meta["components"]):
+        array = np.load(directory / f"{idx}.npy", mmap_mode="r")
+        if info["kind"] == "numerical":
+            component = Component(array, units=info["units"] or None)
+        else:
+            component = CategoricalComponent(array, units=info["units"] or None)
+        data.add_component(component, info["label"])
+
+    # Attach the same LoadLog as `load_data`, so that the dataset is saved
+    # as a reference to its file in the session.
+    module, name = meta["factory"].rsplit(".", 1)
+    factory = getattr(importlib.import_module(module), name)
+    log = LoadLog(meta["path"], factory, meta["kwargs"])
+    log.log(data)
+    for cid in data.coordinate_components + data.main_components:
+        log.log(data.get_component(cid))
+    return data
+
+
+def _entry_size(entry: Path) -> int:
+    return sum(f.stat().st_size for f in entry.iterdir() if f.is_file())
+
+
+def _function_name(function: Callable) -> str:
+    return f"{function.__module__}.{function.__name__}"
@@ -0,0 +1,169 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+# Window (in seconds) during which the document events are collected before
+# being processed together
+DEFAULT_EVENT_DELAY = 0.05
+
+# Changes of a target of the document, keyed by path
+Changes = Dict[Tuple[str, ...], Dict]
+
+
+def merge_change(previous: Optional[Dict], change: Dict) -> Optional[Dict]:
+    """Merge two successive changes of the same key of a Y map
+
+    Args:
+        previous (Optional[Dict]): The first change, None if there is none
+        change (Dict): The next change, with the "action" and the
+        "oldValue" and "newValue" of the key
+
+    Returns:
+        Optional[Dict]: The change equivalent to both, None if they cancel
+        out (a key added then deleted)
+    """
+    if previous is None:
+        return dict(change)
+
+    first, last = previous["action"], change["action"]
+    if first == "add" and last == "delete":
+        return None
+
+    merged = {**previous, **change}
+    merged.pop("oldValue", None)
+    if "oldValue" in previous:
+        merged["oldValue"] = previous["oldValue"]
+    if first == "add":
+        merged["action"] = "add"
+    elif first == "delete" and last == "add":
+        merged["action"] = "update"
+    return merged
+
+
+def map_changes(event: Any) -> Changes:
+    """Read the changes of a Y map event
+
+    Args:
+        event (YMapEvent): The event, only valid in the observer callback
+
+    Returns:
+        Changes: The change of each key
+    """
+    return {(key,): dict(change) for key, change in event.keys.items()}
+
+
+def tab_changes(events: Iterable[Any]) -> Changes:
+    """Read the changes of the viewers from the deep events of the tabs
+
+    Args:
+        events (Iterable[YMapEvent]): The deep events of the tabs map,
+        only valid in the observer callback
+
+    Returns:
+        Changes: The changes of the tabs, keyed by (tab,), and of the
+        viewers, keyed by (tab, viewer). A change nested in a viewer is an
+        "update" of the viewer.
+    """
+    changes: Changes = {}
+    for event in events:
+        path = tuple(event.path())
+        if len(path) >= 2:
+            changes[path[:2]] = merge_change(
+                changes.get(path[:2]), {"action": "update"}
+            )
+            continue
+        for key, change in getattr(event, "keys", {}).items():
+            target = path + (key,)
+            merged = merge_change(changes.get(target), change)
+            if merged is None:
+                changes.pop(target, None)
+            else:
+                changes[target] = merged
+    return changes
+
+
+class EventScheduler:
+    """Coalesce the events of the Y document before processing them
+
+    The events are converted to changes as they are received, and merged
+    per target (a key of a root map, or a tab or viewer of the tabs). When
+    running in an event loop, the changes received within `delay` seconds
+    of the first one are processed together in a single call of the
+    callback. Without event loop, each event is processed immediately.
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[Dict[str, Changes]], None],
+        delay: float = DEFAULT_EVENT_DELAY,
+    ):
+        self._callback = callback
+        self._delay = delay
+        self._pending: Dict[str, Changes] = {}
+        self._received = 0
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._metrics = {
+            "events": 0,
+            "batches": 0,
+            "coalesced": 0,
+            "changes": 0,
+            "max_batch": 0,
+            "processing_time": 0.0,
+        }
+
+    @property
+    def metrics(self) -> Dict:
+        """Number of events received ("events"), of batches processed
+        ("batches"), of events merged in a batch with other ones
+        ("coalesced"), of changes processed ("changes"), the largest number
+        of events of a batch ("max_batch") and the total time spent
+        processing the batches in seconds ("processing_time")"""
+        return dict(self._metrics)
+
+    def push(self, target: str, event: Any) -> None:
+        """Add an event of the document
+
+        Args:
+            target (str): The root map of the document
+            event (Any): The event, or the list of deep events for the tabs
+        """
+        changes = tab_changes(event) if target == "tabs" else map_changes(event)
+        pending = self._pending.setdefault(target, {})
+        for key, change in changes.items():
+            merged = merge_change(pending.get(key), change)
+            if merged is None:
+                pending.pop(key, None)
+            else:
+                pending[key] = merged
+        self._received += 1
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        if self._handle is None:
+            self._handle = loop.call_later(self._delay, self.flush)
+
+    def flush(self) -> None:
+        """Process the pending changes now"""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if self._received == 0:
+            return
+
+        pending, self._pending = self._pending, {}
+        received, self._received = self._received, 0
+        metrics = self._metrics
+        metrics["events"] += received
+        metrics["batches"] += 1
+        metrics["coalesced"] += received - 1
+        metrics["changes"] += sum(len(changes) for changes in pending.values())
+        metrics["max_batch"] = max(metrics["max_batch"], received)
+
+        start = time.perf_counter()
+        try:
+            self._callback(pending)
+        finally:
+            metrics["processing_time"] += time.perf_counter() - start
@@ -0,0 +1,199 @@
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+import numpy as np
+from glue.core.component_id import ComponentID
+from glue.core.data import Data
+from glue.core.exceptions import IncompatibleAttribute
+from glue.core.subset import Subset, SubsetState
+from glue.utils import categorical_ndarray
+from glue_jupyter.bqplot.histogram.layer_artist import BqplotHistogramLayerArtist
+from glue_jupyter.bqplot.histogram.viewer import BqplotHistogramView
+
+from .glue_subset import data_version
+
+# Default bound of the memory used by the sorted columns
+DEFAULT_HISTOGRAM_CACHE_SIZE = 512 << 20
+
+
+class HistogramEngine:
+    """Histograms of the glue datasets computed from sorted columns
+
+    The finite values of each (dataset, attribute) are sorted once. The
+    histogram of any range and number of bins is then computed with a binary
+    search of the bin edges, without reading the values again. The sorted
+    values of the subsets are extracted from the sorted column with the
+    subset mask, and cached as well until the subset or the dataset changes.
+    The cache is bounded by the memory of the sorted arrays, the least
+    recently used being dropped first.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_HISTOGRAM_CACHE_SIZE):
+        self._max_size = max_size
+        self._entries: "OrderedDict[Hashable, Tuple[Tuple, np.ndarray]]" = OrderedDict()
+        self._size = 0
+
+    @property
+    def size(self) -> int:
+        """Memory (in bytes) used by the cached arrays"""
+        return self._size
+
+    def histogram(
+        self,
+        data: Data,
+        cid: ComponentID,
+        range: Tuple[float, float],
+        bins: int,
+        log: bool = False,
+        subset_state: Optional[SubsetState] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Compute a histogram, same as `glue.core.data.Data.compute_histogram`
+
+        Args:
+            data (Data): The dataset
+            cid (ComponentID): The attribute
+            range (Tuple[float, float]): The histogram range
+            bins (int): The number of bins
+            log (bool, optional): Use bins regularly spaced in log space
+            subset_state (Optional[SubsetState]): Only count the values of
+            this subset
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The bin edges and the histogram
+        """
+        vmin, vmax = sorted(range)
+        if log:
+            if vmin < 0 or vmax < 0:
+                return np.linspace(vmin, vmax, bins + 1), np.zeros(bins)
+            edges = np.logspace(np.log10(vmin), np.log10(vmax), bins + 1)
+        else:
+            edges = np.linspace(vmin, vmax, bins + 1)
+
+        values = self.sorted_values(data, cid, subset_state)
+        positions = np.searchsorted(values, edges, side="left")
+        # The last bin includes its upper edge, as in `np.histogram`
+        positions[-1] = np.searchsorted(values, edges[-1], side="right")
+        return edges, np.diff(positions).astype(float)
+
+    def sorted_values(
+        self,
+        data: Data,
+        cid: ComponentID,
+        subset_state: Optional[SubsetState] = None,
+    ) -> np.ndarray:
+        """Get the sorted finite values of an attribute
+
+        Args:
+            data (Data): The dataset
+            cid (ComponentID): The attribute
+            subset_state (Optional[SubsetState]): Only keep the values of
+            this subset
+
+        Returns:
+            np.ndarray: The sorted values
+        """
+        order, values = self._sorted_column(data, cid)
+        if subset_state is None:
+            return values
+
+        key = ("subset", data.uuid, id(cid), id(subset_state))
+        dependencies = (cid, subset_state) + data_version(data)
+        result = self._get(key, dependencies)
+        if result is None:
+            mask = data.get_mask(subset_state)
+            result = values[mask.ravel()[order]]
+            self._put(key, dependencies, result)
+        return result
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._size = 0
+
+    def _sorted_column(
+        self, data: Data, cid: ComponentID
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        raw = data.get_data(cid)
+        # Component ids are compared by identity, see `_get`
+        key_order = ("order", data.uuid, id(cid))
+        key_values = ("values", data.uuid, id(cid))
+        order = self._get(key_order, (cid, raw))
+        values = self._get(key_values, (cid, raw))
+        if order is None or values is None:
+            column = raw.codes if isinstance(raw, categorical_ndarray) else raw
+            column = np.asarray(column, dtype=float).ravel()
+            order = np.argsort(column)
+            # NaN are sorted last
+            order = order[: np.count_nonzero(~np.isnan(column))]
+            values = column[order]
+            self._put(key_order, (cid, raw), order)
+            self._put(key_values, (cid, raw), values)
+        return order, values
+
+    def _get(self, key: Hashable, dependencies: Tuple) -> Optional[np.ndarray]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        cached_dependencies, array = entry
+        if len(cached_dependencies) != len(dependencies) or any(
+            a is not b for a, b in zip(cached_dependencies, dependencies)
+        ):
+            return None
+        self._entries.move_to_end(key)
+        return array
+
+    def _put(self, key: Hashable, dependencies: Tuple, array: np.ndarray) -> None:
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= previous[1].nbytes
+        self._entries[key] = (dependencies, array)
+        self._size += array.nbytes
+        while self._size > self._max_size and len(self._entries) > 1:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._size -= evicted.nbytes
+
+
+# Histogram engine shared by all the histogram viewers of the kernel
+HISTOGRAM_ENGINE = HistogramEngine()
+
+
+class CachedHistogramLayerArtist(BqplotHistogramLayerArtist):
+    """Histogram layer artist computing its histogram with the
+    `HISTOGRAM_ENGINE`"""
+
+    def _calculate_histogram(self):
+        viewer_state = self._viewer_state
+        x_att = viewer_state.x_att
+        if (
+            x_att is None
+            or viewer_state.hist_x_min is None
+            or viewer_state.hist_x_max is None
+            or viewer_state.hist_n_bin is None
+        ):
+            return super()._calculate_histogram()
+
+        if isinstance(self.layer, Subset):
+            data, subset_state = self.layer.data, self.layer.subset_state
+        else:
+            data, subset_state = self.layer, None
+
+        try:
+            if not isinstance(data, Data) or data.get_kind(x_att) == "datetime":
+                return super()._calculate_histogram()
+            self.bins, self.hist_unscaled = HISTOGRAM_ENGINE.histogram(
+                data,
+                x_att,
+                (viewer_state.hist_x_min, viewer_state.hist_x_max),
+                viewer_state.hist_n_bin,
+                log=bool(viewer_state.x_log),
+                subset_state=subset_state,
+            )
+        except IncompatibleAttribute:
+            self.disable("Could not compute histogram")
+            self.bins = self.hist_unscaled = None
+
+
+class CachedHistogramView(BqplotHistogramView):
+    """The glue-jupyter histogram viewer, using `CachedHistogramLayerArtist`"""
+
+    _data_artist_cls = CachedHistogramLayerArtist
+    _subset_artist_cls = CachedHistogramLayerArtist
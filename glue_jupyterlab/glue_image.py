@@ -0,0 +1,287 @@
+import itertools
+import math
+import weakref
+from collections import OrderedDict
+from typing import Hashable, List, Optional, Tuple
+
+import numpy as np
+from glue.core.component import Component
+from glue.core.data import BaseData
+from glue_jupyter.bqplot.image.layer_artist import BqplotImageLayerArtist
+from glue_jupyter.bqplot.image.viewer import BqplotImageView
+from glue_jupyter.common.state_widgets.layer_image import ImageLayerStateWidget
+
+# Size (in pixels) of the square tiles of the image pyramids
+TILE_SIZE = 512
+
+# Default bound of the memory used by the downsampled tiles
+DEFAULT_TILE_CACHE_SIZE = 256 << 20
+
+
+class TileCache:
+    """LRU cache of the downsampled tiles of the image pyramids, bounded by
+    the memory used by the tiles"""
+
+    def __init__(self, max_size: int = DEFAULT_TILE_CACHE_SIZE):
+        self._max_size = max_size
+        self._tiles: "OrderedDict[Hashable, np.ndarray]" = OrderedDict()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return len(self._tiles)
+
+    @property
+    def size(self) -> int:
+        """Memory (in bytes) used by the cached tiles"""
+        return self._size
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        tile = self._tiles.get(key)
+        if tile is not None:
+            self._tiles.move_to_end(key)
+        return tile
+
+    def put(self, key: Hashable, tile: np.ndarray) -> None:
+        if key in self._tiles:
+            return
+        self._tiles[key] = tile
+        self._size += tile.nbytes
+        while self._size > self._max_size and len(self._tiles) > 1:
+            _, evicted = self._tiles.popitem(last=False)
+            self._size -= evicted.nbytes
+
+    def clear(self) -> None:
+        self._tiles.clear()
+        self._size = 0
+
+
+# Tile cache shared by all the image pyramids of the kernel
+TILE_CACHE = TileCache()
+
+
+class ImagePyramid:
+    """Multi-resolution pyramid of a 2D array
+
+    Each level is half the size of the previous one, the level 0 being the
+    array itself. The levels are split in tiles which are computed on
+    demand, as the mean of 2x2 pixels of the previous level, and kept in a
+    `TileCache`. The tiles of the level 0 are read from the array.
+    """
+
+    _ids = itertools.count()
+
+    def __init__(
+        self,
+        array: np.ndarray,
+        tile_size: int = TILE_SIZE,
+        tile_cache: Optional[TileCache] = None,
+    ):
+        self.array = array
+        self._tile_size = tile_size
+        self._cache = tile_cache if tile_cache is not None else TILE_CACHE
+        self._id = next(self._ids)
+        self._dtype = np.result_type(array.dtype, np.float32)
+
+        self.shapes: List[Tuple[int, int]] = [tuple(array.shape)]
+        while max(self.shapes[-1]) > tile_size:
+            height, width = self.shapes[-1]
+            self.shapes.append((math.ceil(height / 2), math.ceil(width / 2)))
+
+    @property
+    def levels(self) -> int:
+        return len(self.shapes)
+
+    def level_for(self, bounds: List[Tuple[float, float, int]]) -> int:
+        """Get the level matching the resolution of a buffer
+
+        Args:
+            bounds (List[Tuple[float, float, int]]): The (min, max, size) of
+            the buffer along both axes, in pixel coordinates of the array
+
+        Returns:
+            int: The level whose pixels are the closest to (and not
+            bigger than) the pixels of the buffer
+        """
+        steps = [abs(vmax - vmin) / max(size - 1, 1) for vmin, vmax, size in bounds]
+        step = min(steps)
+        if step < 2:
+            return 0
+        return min(int(math.log2(step)), self.levels - 1)
+
+    def buffer(
+        self, bounds: List[Tuple[float, float, int]], level: Optional[int] = None
+    ) -> np.ndarray:
+        """Compute a fixed resolution buffer of the array, reading only the
+        tiles which are visible
+
+        Same as `glue.core.data.Data.compute_fixed_resolution_buffer` for a
+        2D array: the pixel nearest to each point of the buffer is used,
+        NaN outside of the array.
+
+        Args:
+            bounds (List[Tuple[float, float, int]]): The (min, max, size) of
+            the buffer along both axes, in pixel coordinates of the array
+            level (Optional[int]): The pyramid level to read, by default the
+            one matching the buffer resolution
+
+        Returns:
+            np.ndarray: The buffer
+        """
+        if level is None:
+            level = self.level_for(bounds)
+
+        indices = []
+        for (vmin, vmax, size), length in zip(bounds, self.shapes[0]):
+            index = np.round(np.linspace(vmin, vmax, size)).astype(int)
+            index[(index < 0) | (index >= length)] = -1
+            indices.append(index)
+
+        result = np.full([len(index) for index in indices], np.nan, dtype=self._dtype)
+        rows, cols = [np.where(index < 0, -1, index >> level) for index in indices]
+        tile_rows = np.where(rows < 0, -1, rows // self._tile_size)
+        tile_cols = np.where(cols < 0, -1, cols // self._tile_size)
+        for ty in np.unique(tile_rows[tile_rows >= 0]):
+            row_mask = tile_rows == ty
+            tile_row_index = rows[row_mask] - ty * self._tile_size
+            for tx in np.unique(tile_cols[tile_cols >= 0]):
+                col_mask = tile_cols == tx
+                tile = self.tile(level, int(ty), int(tx))
+                result[np.ix_(row_mask, col_mask)] = tile[
+                    np.ix_(tile_row_index, cols[col_mask] - tx * self._tile_size)
+                ]
+        return result
+
+    def tile(self, level: int, ty: int, tx: int) -> np.ndarray:
+        """Get a tile of the pyramid
+
+        Args:
+            level (int): The pyramid level
+            ty (int): Row of the tile
+            tx (int): Column of the tile
+
+        Returns:
+            np.ndarray: The tile, smaller than the tile size on the edges
+        """
+        size = self._tile_size
+        if level == 0:
+            tile = self.array[ty * size : (ty + 1) * size, tx * size : (tx + 1) * size]
+            return np.asarray(tile, dtype=self._dtype)
+
+        key = (self._id, level, ty, tx)
+        tile = self._cache.get(key)
+        if tile is not None:
+            return tile
+
+        child_height, child_width = self.shapes[level - 1]
+        block = np.full((2 * size, 2 * size), np.nan, dtype=self._dtype)
+        for dy in range(2):
+            for dx in range(2):
+                cy, cx = 2 * ty + dy, 2 * tx + dx
+                if cy * size >= child_height or cx * size >= child_width:
+                    continue
+                child = self.tile(level - 1, cy, cx)
+                block[
+                    dy * size : dy * size + child.shape[0],
+                    dx * size : dx * size + child.shape[1],
+                ] = child
+
+        height, width = self.shapes[level]
+        # Mean of the valid pixels of each 2x2 block, faster than `np.nanmean`
+        valid = ~np.isnan(block)
+        np.copyto(block, 0, where=~valid)
+        total = _sum_blocks(block)
+        count = _sum_blocks(valid.astype(np.uint8))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            tile = (total / count).astype(self._dtype)
+        shape = (min(size, height - ty * size), min(size, width - tx * size))
+        if tile.shape != shape:
+            # Copy the edge tiles, not to keep the whole block in the cache
+            tile = tile[: shape[0], : shape[1]].copy()
+        self._cache.put(key, tile)
+        return tile
+
+
+def _sum_blocks(array: np.ndarray) -> np.ndarray:
+    # Sum of the 2x2 blocks, much faster than summing the axes of a reshape
+    rows = array[0::2] + array[1::2]
+    return rows[:, 0::2] + rows[:, 1::2]
+
+
+# Pyramids of the image components, dropped with the components
+_PYRAMIDS: "weakref.WeakKeyDictionary[Component, ImagePyramid]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_pyramid(component: Component) -> ImagePyramid:
+    """Get the pyramid of an image component, built on first use
+
+    Args:
+        component (Component): A 2D numerical component
+
+    Returns:
+        ImagePyramid: The pyramid of the component values
+    """
+    pyramid = _PYRAMIDS.get(component)
+    if pyramid is None or pyramid.array is not component.data:
+        pyramid = ImagePyramid(component.data)
+        _PYRAMIDS[component] = pyramid
+    return pyramid
+
+
+class PyramidImageLayerArtist(BqplotImageLayerArtist):
+    """Image layer artist reading the image pyramid of its component when
+    the view is zoomed out, instead of sampling the full array"""
+
+    def get_image_data(self, bounds=None):
+        image = self._get_pyramid_image(bounds)
+        if image is None:
+            return super().get_image_data(bounds=bounds)
+        return image
+
+    def _get_pyramid_image(self, bounds) -> Optional[np.ndarray]:
+        if bounds is None or self.uuid is None or self.state.attribute is None:
+            return None
+
+        data = self.state.layer
+        viewer_state = self._viewer_state
+        if not isinstance(data, BaseData) or data.ndim != 2:
+            return None
+        # Images reprojected on another dataset are computed by glue
+        if data is not viewer_state.reference_data:
+            return None
+
+        try:
+            component = data.get_component(self.state.attribute)
+        except Exception:
+            return None
+        if type(component) is not Component:
+            return None
+
+        transpose = viewer_state.x_att.axis == 0
+        data_bounds = [bounds[1], bounds[0]] if transpose else list(bounds)
+        pyramid = get_pyramid(component)
+        level = pyramid.level_for(data_bounds)
+        if level == 0:
+            # Full resolution, same as glue
+            return None
+
+        image = pyramid.buffer(data_bounds, level)
+        return image.T if transpose else image
+
+
+class PyramidImageView(BqplotImageView):
+    """The glue-jupyter image viewer, rendering the zoomed out views of
+    large images from their image pyramids"""
+
+    _layer_style_widget_cls = {
+        **BqplotImageView._layer_style_widget_cls,
+        PyramidImageLayerArtist: ImageLayerStateWidget,
+    }
+
+    def get_data_layer_artist(self, layer=None, layer_state=None):
+        if layer.ndim == 1:
+            return super().get_data_layer_artist(layer, layer_state)
+        return self.get_layer_artist(
+            PyramidImageLayerArtist, layer=layer, layer_state=layer_state
+        )
@@ -0,0 +1,208 @@
+import os
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+from glue.core.component import CategoricalComponent, Component
+from glue.core.data import Data
+from glue.core.data_factories.helpers import data_label
+
+CHUNKED_TABLE_READER = "glue_jupyterlab.glue_loaders.read_table_chunked"
+
+# Extensions of the files which can be read by chunks.
+CHUNKED_EXTENSIONS = [".csv", ".tsv", ".txt", ".dat", ".parquet"]
+
+# Files bigger than this size (in bytes) are read by chunks by default.
+DEFAULT_CHUNKED_THRESHOLD = 1 << 30
+
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+
+def read_load_logs(contents: Dict) -> Dict[str, Dict]:
+    """Read the LoadLog entries of a session file
+
+    Args:
+        contents (Dict): The contents of the session file
+
+    Returns:
+        Dict[str, Dict]: The LoadLog of each dataset, keyed by the name of
+        the dataset (the stem of its path)
+    """
+    entries = [contents["LoadLog"]] if "LoadLog" in contents else []
+    idx = 0
+    while f"LoadLog_{idx}" in contents:
+        entries.append(contents[f"LoadLog_{idx}"])
+        idx += 1
+
+    load_logs = {}
+    for load_log in entries:
+        path = Path(load_log["path"])
+        load_logs[path.stem] = dict(load_log, path=str(path))
+    return load_logs
+
+
+def get_data_factory(
+    path: str, load_log: Dict, chunked_threshold: Optional[int]
+) -> Optional[Callable]:
+    """Select the factory used to read a data file of the session
+
+    Args:
+        path (str): Path of the data file
+        load_log (Dict): The serialized LoadLog of the data
+        chunked_threshold (Optional[int]): Size in bytes above which tables
+        are read by chunks, None to disable it
+
+    Returns:
+        Optional[Callable]: The factory, or None for the glue auto-detection
+    """
+    factory = load_log.get("factory", {}).get("function")
+    if factory == CHUNKED_TABLE_READER:
+        return read_table_chunked
+
+    if chunked_threshold is None or Path(path).suffix.lower() not in CHUNKED_EXTENSIONS:
+        return None
+
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return None
+
+    return read_table_chunked if size > chunked_threshold else None
+
+
+def read_table_chunked(
+    path: str, chunk_size: int = DEFAULT_CHUNK_SIZE, **kwargs
+) -> Data:
+    """Read a table by chunks of rows, the numerical columns being spooled
+    to memory-mapped temporary files. Only one chunk of the file is in
+    memory at a time, the columns are paged in by the OS when a viewer
+    reads them. The categorical columns are spooled as codes, then written
+    to memory-mapped files as fixed-width strings.
+
+    Args:
+        path (str): Path to the CSV or Parquet file
+        chunk_size (int, optional): Number of rows per chunk
+        **kwargs: Passed to `pandas.read_csv`
+
+    Returns:
+        Data: The glue dataset
+    """
+    numerical: Dict[str, _ColumnSpool] = {}
+    categorical: Dict[str, _CategorySpool] = {}
+    names: List[str] = []
+
+    for chunk in _iter_chunks(path, chunk_size, **kwargs):
+        for name, column in chunk.items():
+            if name not in numerical and name not in categorical:
+                names.append(name)
+                if _is_numerical(column):
+                    numerical[name] = _ColumnSpool()
+                else:
+                    categorical[name] = _CategorySpool()
+
+            if name in numerical:
+                numerical[name].append(pd.to_numeric(column, errors="coerce"))
+            else:
+                categorical[name].append(column)
+
+    result = Data(label=data_label(path))
+    for name in names:
+        if name in numerical:
+            component = Component(numerical[name].to_array())
+        else:
+            component = CategoricalComponent(categorical[name].to_array(chunk_size))
+        result.add_component(component, _clean_name(name))
+
+    return result
+
+
+class _ColumnSpool:
+    """Append-only column stored in an anonymous temporary file"""
+
+    def __init__(self, dtype: np.dtype = np.float64):
+        self._file = tempfile.TemporaryFile()
+        self._dtype = dtype
+        self._size = 0
+
+    def append(self, values: pd.Series) -> None:
+        array = np.asarray(values, dtype=self._dtype)
+        self._file.write(array.tobytes())
+        self._size += len(array)
+
+    def to_array(self) -> np.ndarray:
+        if self._size == 0:
+            return np.empty(0, dtype=self._dtype)
+        self._file.flush()
+        return np.memmap(self._file, dtype=self._dtype, mode="r", shape=(self._size,))
+
+
+class _CategorySpool:
+    """Append-only column of strings, spooled as the codes of its values
+
+    Same values as the glue pandas reader (missing values are empty
+    strings). The column is written at the end from the codes, as a
+    fixed-width string array memory-mapped like the numerical columns.
+    """
+
+    def __init__(self):
+        self._codes = _ColumnSpool(np.int32)
+        self._values: Dict[str, int] = {}
+
+    def append(self, values: pd.Series) -> None:
+        codes, uniques = pd.factorize(values.fillna("").astype(str))
+        mapping = np.array(
+            [self._values.setdefault(value, len(self._values)) for value in uniques],
+            dtype=np.int32,
+        )
+        self._codes.append(mapping[codes])
+
+    def to_array(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> np.ndarray:
+        values = np.array(list(self._values) or [""], dtype="U")
+        codes = self._codes.to_array()
+        if len(codes) == 0:
+            return np.empty(0, dtype=values.dtype)
+
+        spool = tempfile.TemporaryFile()
+        array = np.memmap(spool, dtype=values.dtype, mode="w+", shape=codes.shape)
+        for start in range(0, len(codes), chunk_size):
+            array[start : start + chunk_size] = values[
+                codes[start : start + chunk_size]
+            ]
+        array.flush()
+        return np.memmap(spool, dtype=values.dtype, mode="r", shape=codes.shape)
+
+
+def _iter_chunks(path: str, chunk_size: int, **kwargs) -> Iterator[pd.DataFrame]:
+    if Path(path).suffix.lower() == ".parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("pyarrow is required to read Parquet files by chunks")
+
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+        return
+
+    if Path(path).suffix.lower() == ".tsv":
+        kwargs.setdefault("sep", "\t")
+    yield from pd.read_csv(path, chunksize=chunk_size, **kwargs)
+
+
+def _is_numerical(column: pd.Series) -> bool:
+    """Same heuristic as the glue pandas reader, a column of strings is
+    numerical if most of its values can be converted"""
+    if column.dtype.kind in "biuf":
+        return True
+    coerced = pd.to_numeric(column, errors="coerce")
+    return coerced.dtype != column.dtype and coerced.isnull().mean() < 0.4
+
+
+def _clean_name(name) -> str:
+    # Same as the glue pandas reader, strip off the leading '#'
+    name = str(name).strip()
+    if name.startswith("#"):
+        name = name[1:].strip()
+    return name
@@ -0,0 +1,198 @@
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterator, List, Optional
+
+# Set this environment variable to a file path to record a trace of the
+# kernel, written to this file when the kernel exits. Only the kernels running
+# glue sessions are traced, see `trace_from_environment`.
+TRACE_FILE_ENV = "GLUE_JUPYTERLAB_TRACE"
+
+# Maximum number of events kept in a trace, the oldest ones are dropped
+MAX_TRACE_EVENTS = 100_000
+
+
+class PerfRecorder:
+    """Timing spans and counters of the kernel side of the glue sessions
+
+    The spans are aggregated by name (count, total and maximum duration).
+    When tracing, each span is also recorded as a complete event of the
+    Chrome trace event format, which can be loaded in chrome://tracing,
+    Perfetto or speedscope.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._origin = time.perf_counter()
+        self._spans: Dict[str, Dict] = {}
+        self._counters: Dict[str, float] = {}
+        self._trace: Optional[Deque[Dict]] = None
+        self._listeners: List[Callable[[], None]] = []
+
+    @property
+    def tracing(self) -> bool:
+        return self._trace is not None
+
+    @contextmanager
+    def span(self, name: str, **args) -> Iterator[None]:
+        """Time a block of code
+
+        Args:
+            name (str): Name of the span, the durations of the spans of the
+            same name are aggregated
+            **args: Details of the span, only kept in the trace
+        """
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self._local.depth = depth
+            self._record(name, start, end, args)
+            if depth == 0:
+                # Top-level span, notify once the whole operation is done
+                for listener in list(self._listeners):
+                    listener()
+
+    def timed(self, name: Optional[str] = None) -> Callable:
+        """Decorator timing each call of a function in a span
+
+        Args:
+            name (Optional[str]): Name of the span, the function name by
+            default
+        """
+
+        def decorator(function: Callable) -> Callable:
+            span_name = name or function.__name__
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def count(self, name: str, value: float = 1) -> None:
+        """Increment a counter
+
+        Args:
+            name (str): Name of the counter
+            value (float, optional): The increment
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def report(self) -> Dict:
+        """Get the aggregated spans and the counters
+
+        Returns:
+            Dict: The "spans" with their "count", "total", "mean" and "max"
+            duration in seconds, and the "counters"
+        """
+        with self._lock:
+            spans = {
+                name: dict(stats, mean=stats["total"] / stats["count"])
+                for name, stats in self._spans.items()
+            }
+            return {"spans": spans, "counters": dict(self._counters)}
+
+    def reset(self) -> None:
+        """Clear the spans and the counters"""
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+
+    def start_trace(self, max_events: int = MAX_TRACE_EVENTS) -> None:
+        """Start recording the spans in a trace, dropping the previous one
+
+        Args:
+            max_events (int, optional): Number of events kept, only the most
+            recent ones are kept past this number
+        """
+        with self._lock:
+            self._trace = deque(maxlen=max_events)
+
+    def stop_trace(self) -> List[Dict]:
+        """Stop recording the trace
+
+        Returns:
+            List[Dict]: The trace events recorded
+        """
+        with self._lock:
+            trace, self._trace = self._trace or [], None
+        return list(trace)
+
+    def dump_trace(self, path: str) -> None:
+        """Write the trace recorded so far to a file, in the Chrome trace
+        event format
+
+        Args:
+            path (str): Path of the JSON file
+        """
+        with self._lock:
+            events = list(self._trace or [])
+        with open(path, "w") as fobj:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, fobj)
+
+    def add_listener(self, listener: Callable[[], None]) -> None:
+        """Call a function each time a top-level span ends, possibly from
+        a worker thread"""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[], None]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _record(self, name: str, start: float, end: float, args: Dict) -> None:
+        duration = end - start
+        with self._lock:
+            stats = self._spans.get(name)
+            if stats is None:
+                stats = self._spans[name] = {"count": 0, "total": 0.0, "max": 0.0}
+            stats["count"] += 1
+            stats["total"] += duration
+            stats["max"] = max(stats["max"], duration)
+            if self._trace is not None:
+                self._trace.append(
+                    {
+                        "name": name,
+                        "ph": "X",
+                        "ts": (start - self._origin) * 1e6,
+                        "dur": duration * 1e6,
+                        "pid": os.getpid(),
+                        "tid": threading.get_ident(),
+                        "args": {key: str(value) for key, value in args.items()},
+                    }
+                )
+
+
+# Recorder shared by the sessions and the documents of the kernel
+PERF = PerfRecorder()
+
+
+_traced_from_environment = False
+
+
+def trace_from_environment() -> None:
+    """Start tracing if the environment asks for it, the trace being written
+    when the process exits
+
+    Called when the glue session module is imported, so that the Jupyter
+    server (which imports this module with the glue documents) is not traced.
+    """
+    global _traced_from_environment
+    path = os.environ.get(TRACE_FILE_ENV)
+    if path and not _traced_from_environment:
+        _traced_from_environment = True
+        PERF.start_trace()
+        atexit.register(PERF.dump_trace, path)
@@ -0,0 +1,129 @@
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+# Default bounds of the pool of detached viewers.
+DEFAULT_POOL_SIZE = 8
+DEFAULT_POOL_MEMORY = 512 << 20
+
+
+class ViewerPool:
+    """Bounded pool of the glue-jupyter viewers removed from a tab.
+
+    Creating a glue-jupyter viewer (and its option panels) is expensive, so
+    the viewers removed from the session are kept detached in this pool and
+    reused when a viewer of the same type showing the same dataset is
+    added again. The least recently released viewers are destroyed when
+    the pool holds more than ``max_size`` viewers or more than
+    ``max_memory`` bytes, as estimated by the caller.
+    """
+
+    def __init__(
+        self, max_size: int = DEFAULT_POOL_SIZE, max_memory: int = DEFAULT_POOL_MEMORY
+    ):
+        self._max_size = max_size
+        self._max_memory = max_memory
+        self._entries: "OrderedDict[int, Tuple[Hashable, Dict, int]]" = OrderedDict()
+        self._counter = 0
+        self._memory = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def memory(self) -> int:
+        """Estimated memory (in bytes) held by the pooled viewers"""
+        return self._memory
+
+    def put(self, key: Hashable, viewer: Dict, memory: int = 0) -> None:
+        """Release a viewer into the pool
+
+        Args:
+            key (Hashable): Key of the viewer, a viewer is only reused for
+            the same key
+            viewer (Dict): The viewer widgets, as stored by the session
+            memory (int, optional): Estimated memory of the viewer in bytes
+        """
+        if memory > self._max_memory or self._max_size <= 0:
+            destroy_viewer(viewer)
+            return
+
+        self._counter += 1
+        self._entries[self._counter] = (key, viewer, memory)
+        self._memory += memory
+        self._evict()
+
+    def take(self, key: Hashable) -> Optional[Dict]:
+        """Take a viewer out of the pool
+
+        Args:
+            key (Hashable): Key of the viewer
+
+        Returns:
+            Optional[Dict]: The most recently released viewer for this key,
+            None if there is none
+        """
+        for index in reversed(self._entries):
+            entry_key, viewer, memory = self._entries[index]
+            if entry_key == key:
+                del self._entries[index]
+                self._memory -= memory
+                return viewer
+        return None
+
+    def clear(self) -> None:
+        """Destroy all the pooled viewers"""
+        viewers: List[Dict] = [viewer for _, viewer, _ in self._entries.values()]
+        self._entries.clear()
+        self._memory = 0
+        for viewer in viewers:
+            destroy_viewer(viewer)
+
+    def _evict(self) -> None:
+        while self._entries and (
+            len(self._entries) > self._max_size or self._memory > self._max_memory
+        ):
+            _, (_, viewer, memory) = self._entries.popitem(last=False)
+            self._memory -= memory
+            destroy_viewer(viewer)
+
+
+def destroy_viewer(viewer: Dict) -> None:
+    """Close the widgets of a viewer
+
+    Args:
+        viewer (Dict): The viewer widgets, as stored by the session
+    """
+    # The error widgets have no layout
+    layout = getattr(viewer.get("widget"), "_layout", None)
+    if layout is not None:
+        layout.__del__()
+    w = viewer.get("viewer_options")
+    if w is not None:
+        w.__del__()
+    layer_options = viewer.get("layer_options")
+    if layer_options is not None:
+        close_layer_options(layer_options)
+
+
+def close_layer_options(widget) -> None:
+    """Close a `LayerOptionsWidget` with its layer panels, and disconnect it
+    from its viewer
+
+    Args:
+        widget (LayerOptionsWidget): The layer options of a viewer
+    """
+    viewer = widget.viewer
+    viewer.session.hub.unsubscribe_all(widget)
+    callback = widget._update_layers_from_glue_state
+    callbacks = viewer._layer_artist_container.change_callbacks
+    if callback in callbacks:
+        callbacks.remove(callback)
+    try:
+        viewer.state.remove_callback("layers", callback)
+    except ValueError:
+        pass
+
+    for panel in widget.widgetCache.cache.values():
+        panel.close()
+    widget.widgetCache.cache.clear()
+    widget.close()
@@ -0,0 +1,121 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from glue.core.data_factories import load_data
+
+from .glue_cache import DataCache
+from .glue_loaders import DEFAULT_CHUNKED_THRESHOLD, get_data_factory, read_load_logs
+from .glue_utils import ensure_plugins, get_references
+
+# Datasets read before the session is created, keyed by the path, the
+# modification time and the size of the file and by the factory
+_PRELOADED: Dict[Tuple, Any] = {}
+_PRELOADED_LOCK = threading.Lock()
+
+
+def _preload_key(path: str, factory: Optional[Callable]) -> Optional[Tuple]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (os.path.realpath(path), stat.st_mtime_ns, stat.st_size, factory)
+
+
+def take_preloaded(path: str, factory: Optional[Callable] = None) -> Optional[Any]:
+    """Take a dataset read by `prewarm`
+
+    The dataset is handed over once, a glue dataset belonging to a single
+    data collection.
+
+    Args:
+        path (str): Path of the data file
+        factory (Optional[Callable]): The factory used to read it
+
+    Returns:
+        Optional[Any]: The result of `load_data`, None if the file has not
+        been read or has changed since
+    """
+    key = _preload_key(path, factory)
+    if key is None:
+        return None
+    with _PRELOADED_LOCK:
+        return _PRELOADED.pop(key, None)
+
+
+def clear_preloaded() -> None:
+    """Drop the datasets read by `prewarm` and not taken by a session
+
+    Run by the server extension when a kernel prepared for a session file is
+    handed over to another one, see `kernel_pool.KernelPool.take`.
+    """
+    with _PRELOADED_LOCK:
+        _PRELOADED.clear()
+
+
+def prewarm(
+    session_path: Optional[str] = None,
+    chunked_threshold: Optional[int] = DEFAULT_CHUNKED_THRESHOLD,
+    max_workers: int = 4,
+) -> Dict:
+    """Prepare the kernel for a glue session
+
+    Run by the server extension in the kernels of its pool, see
+    `kernel_pool.KernelPool`. glue and glue-jupyter are imported and, if a
+    session file is given, the glue plugins it needs are loaded and its
+    datasets are read, to be taken by the `SharedGlueSession` opening it.
+
+    Args:
+        session_path (Optional[str]): Path of the session file to prepare
+        chunked_threshold (Optional[int]): Size in bytes above which tables
+        are read by chunks, see `SharedGlueSession`
+        max_workers (int, optional): Number of files read in parallel
+
+    Returns:
+        Dict: The time spent (in seconds) importing the modules ("import")
+        and reading the datasets ("data"), and the names of the datasets
+        read ("datasets")
+    """
+    start = time.perf_counter()
+    # Imports glue and glue-jupyter
+    from . import glue_session  # noqa: F401
+
+    report = {"import": time.perf_counter() - start, "data": 0.0, "datasets": []}
+    if session_path is None:
+        return report
+
+    start = time.perf_counter()
+    with open(session_path) as fobj:
+        contents = json.load(fobj)
+
+    ensure_plugins(get_references(contents.values()))
+
+    data_cache = DataCache.from_environment()
+    read_file = data_cache.load_data if data_cache is not None else load_data
+
+    def read(data_name: str, load_log: Dict) -> None:
+        path = load_log["path"]
+        factory = get_data_factory(path, load_log, chunked_threshold)
+        key = _preload_key(path, factory)
+        if key is None:
+            return
+        try:
+            result = read_file(path, factory=factory)
+        except Exception as e:
+            print(f"Could not read {path}: {e}")
+            return
+        with _PRELOADED_LOCK:
+            _PRELOADED[key] = result
+        report["datasets"].append(data_name)
+
+    load_logs = read_load_logs(contents)
+    if load_logs:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for data_name, load_log in load_logs.items():
+                executor.submit(read, data_name, load_log)
+
+    report["data"] = time.perf_counter() - start
+    return report
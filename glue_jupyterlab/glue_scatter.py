@@ -0,0 +1,248 @@
+from typing import Dict, Optional
+
+import numpy as np
+from glue.core.data import Subset
+from glue.core.exceptions import IncompatibleAttribute
+from glue.utils import ensure_numerical
+from glue_jupyter.ipyvolume.scatter.layer_artist import IpyvolumeScatterLayerArtist
+from glue_jupyter.ipyvolume.scatter.viewer import IpyvolumeScatterView
+
+# Rendering modes of the scatter layers, as saved in the `points_mode`
+# value of the layer states of the session file.
+POINTS_MODES = ["auto", "markers", "density"]
+
+# Layer state values defining how the points of a scatter layer are rendered
+RENDERING_STATE = ["points_mode", "density_contrast"]
+
+# Same threshold as the 'auto' mode of the glue scatter layers
+AUTO_THRESHOLD = 100_000
+
+# Maximum number of points sent to the browser by a decimated 3D viewer
+DEFAULT_MAX_POINTS = 100_000
+
+LIMITS = ["x_min", "x_max", "y_min", "y_max", "z_min", "z_max"]
+
+
+def apply_rendering_mode(viewer, state: Dict) -> None:
+    """Apply the rendering mode saved in the session file to a viewer
+
+    In the 2D scatter viewers, the 'density' mode (or 'auto' on large
+    datasets) bins the points in the kernel and only sends the density
+    image, refined by glue-jupyter when zooming. The 3D scatter viewers
+    have no density image, they send a level-of-detail sample of the points
+    instead, see `DecimatedScatter3DView`.
+
+    Args:
+        viewer: The glue-jupyter viewer
+        state (Dict): The state of the viewer, merged with its layer state
+    """
+    if state.get("points_mode") not in POINTS_MODES:
+        return
+
+    if isinstance(viewer, DecimatedScatter3DView):
+        viewer.set_points_mode(state["points_mode"])
+        return
+
+    for layer in getattr(viewer, "layers", []):
+        for key in RENDERING_STATE:
+            if key in state and hasattr(layer.state, key):
+                try:
+                    setattr(layer.state, key, state[key])
+                except Exception:
+                    pass
+
+
+def sample_indices(
+    priority: np.ndarray, candidates: np.ndarray, max_points: int
+) -> np.ndarray:
+    """Select the level-of-detail sample of a set of points
+
+    The points with the lowest priority are kept. The priority of each
+    point being fixed, zooming in keeps the points already displayed and
+    adds the ones which were dropped.
+
+    Args:
+        priority (np.ndarray): The priority of all the points
+        candidates (np.ndarray): Indices of the candidate points
+        max_points (int): Maximum size of the sample
+
+    Returns:
+        np.ndarray: The sorted indices of the sampled points
+    """
+    if len(candidates) <= max_points:
+        return candidates
+    keep = np.argpartition(priority[candidates], max_points)[:max_points]
+    return np.sort(candidates[keep])
+
+
+class DecimatedScatter3DLayerArtist(IpyvolumeScatterLayerArtist):
+    """3D scatter layer artist sending at most `max_points` points of the
+    viewer limits to the browser, when the viewer is decimated"""
+
+    def __init__(self, view, viewer_state, layer, layer_state):
+        # Indices of the displayed points, None when all are displayed
+        self._indices: Optional[np.ndarray] = None
+        self._priority: Optional[np.ndarray] = None
+        super().__init__(view, viewer_state, layer, layer_state)
+        for limit in LIMITS:
+            viewer_state.add_callback(limit, self._update_limits)
+
+    def remove(self):
+        for limit in LIMITS:
+            self._viewer_state.remove_callback(limit, self._update_limits)
+        super().remove()
+
+    def _update_limits(self, *args):
+        # Refine the sample on zoom
+        if self._indices is not None:
+            self.update()
+
+    def _sample(self, values: np.ndarray) -> np.ndarray:
+        if self._indices is None:
+            return values
+        return values[self._indices]
+
+    def _select_points(self, *coordinates: np.ndarray) -> Optional[np.ndarray]:
+        size = len(coordinates[0])
+        if not self.view.is_decimated(size):
+            return None
+
+        if self._priority is None or len(self._priority) != size:
+            # Same seed for all the layers, so that the data and its subsets
+            # display the same points.
+            self._priority = np.random.default_rng(0).random(size)
+
+        in_view = np.ones(size, dtype=bool)
+        for values, axis in zip(coordinates, "xyz"):
+            vmin = getattr(self._viewer_state, f"{axis}_min")
+            vmax = getattr(self._viewer_state, f"{axis}_max")
+            if vmin is not None and vmax is not None:
+                in_view &= (values >= vmin) & (values <= vmax)
+
+        return sample_indices(
+            self._priority, np.flatnonzero(in_view), self.view.max_points
+        )
+
+    def update(self):
+        viewer_state = self._viewer_state
+        if viewer_state.x_att is None or viewer_state.y_att is None:
+            return
+        if viewer_state.z_att is None:
+            return
+
+        data = self.layer.data
+        x = ensure_numerical(data[viewer_state.x_att]).ravel()
+        y = ensure_numerical(data[viewer_state.y_att]).ravel()
+        z = ensure_numerical(data[viewer_state.z_att]).ravel()
+        self._indices = self._select_points(x, y, z)
+
+        # Same axes as `IpyvolumeScatterLayerArtist`
+        with self.scatter.hold_sync():
+            self.scatter.z = self._cast_to_float(self._sample(x))
+            self.scatter.y = self._cast_to_float(self._sample(z))
+            self.scatter.x = self._cast_to_float(self._sample(y))
+        self.quiver.x = self.scatter.x
+        self.quiver.z = self.scatter.y
+        self.quiver.y = self.scatter.z
+        if isinstance(self.layer, Subset):
+            try:
+                mask = self.layer.to_mask()
+            except IncompatibleAttribute:
+                self.disable("Could not compute subset")
+                self._clear_selection()
+                return
+
+            selected_indices = np.nonzero(self._sample(mask.ravel()))[0]
+
+            self.scatter.selected = selected_indices
+            self.quiver.selected = selected_indices
+
+        self._update_size()
+        if self.state.color_mode == "Linear":
+            self._update_color()
+        if self.state.vector_visible:
+            self._update_quiver()
+
+    def _update_color(self, ignore=None):
+        if self.state.color_mode != "Linear":
+            super()._update_color(ignore)
+            return
+
+        cmap = self.state.cmap
+        values = self._sample(self.layer.data[self.state.cmap_attribute].ravel())
+        values = values.astype(np.float32)
+        normalized_values = (values - self.state.cmap_vmin) / (
+            self.state.cmap_vmax - self.state.cmap_vmin
+        )
+        self.scatter.color = cmap(normalized_values).astype(np.float32)
+        self.quiver.color = self.scatter.color
+        self.scatter.color_selected = self.scatter.color
+        self.quiver.color_selected = self.quiver.color
+
+    def _update_quiver(self):
+        with self.quiver.hold_sync():
+            self.quiver.vz = self._sample(self.layer.data[self.state.vx_att].ravel())
+            self.quiver.vy = self._sample(self.layer.data[self.state.vz_att].ravel())
+            self.quiver.vx = self._sample(self.layer.data[self.state.vy_att].ravel())
+
+    def _update_size(self):
+        if self.state.size_mode != "Linear":
+            super()._update_size()
+            return
+
+        scale = self.state.size_scaling / 5
+        size = self._sample(self.layer.data[self.state.size_att].ravel())
+        size = (size - self.state.size_vmin) / (
+            self.state.size_vmax - self.state.size_vmin
+        )
+        value = size * 5 * scale
+        if isinstance(self.layer, Subset):
+            self.scatter.size = 0
+        else:
+            self.scatter.size = value
+        self.scatter.size_selected = value
+
+        value = self.state.size * scale * 5
+        if isinstance(self.layer, Subset):
+            self.quiver.size = 0
+        else:
+            self.quiver.size = value
+        self.quiver.size_selected = value
+
+
+class DecimatedScatter3DView(IpyvolumeScatterView):
+    """The glue-jupyter 3D scatter viewer, sending a level-of-detail sample
+    of the points of the large datasets
+
+    In the 'auto' mode, the datasets of more than `AUTO_THRESHOLD` points
+    are decimated, 'density' always decimates and 'markers' never does.
+    """
+
+    _data_artist_cls = DecimatedScatter3DLayerArtist
+    _subset_artist_cls = DecimatedScatter3DLayerArtist
+
+    points_mode = "auto"
+    max_points = DEFAULT_MAX_POINTS
+
+    def is_decimated(self, size: int) -> bool:
+        if self.points_mode == "density":
+            return size > self.max_points
+        if self.points_mode == "auto":
+            return size > max(AUTO_THRESHOLD, self.max_points)
+        return False
+
+    def set_points_mode(self, points_mode: str, max_points: Optional[int] = None):
+        """Change the rendering mode of the viewer
+
+        Args:
+            points_mode (str): One of 'auto', 'markers' or 'density'
+            max_points (Optional[int]): Maximum number of points sent to
+            the browser when decimated
+        """
+        if points_mode not in POINTS_MODES:
+            raise ValueError(f"points_mode should be one of {POINTS_MODES}")
+        self.points_mode = points_mode
+        if max_points is not None:
+            self.max_points = max_points
+        for layer in self.layers:
+            layer.update()
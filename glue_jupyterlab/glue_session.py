@@ -1,9 +1,35 @@
+# ruff: noqa: E402
+import time
+
+# Start measuring the import time of the session dependencies.
+_import_start = time.perf_counter()
+
 import os
 import json
+import threading
+import asyncio
+import operator
 import warnings
+from copy import deepcopy
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack
 from pathlib import Path
-from typing import TYPE_CHECKING, Dict, Optional, Tuple
+from weakref import WeakKeyDictionary
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+from glue.core.data import Data
+from glue.core.data_factories import load_data
 from glue.core.link_helpers import LinkSame
+from glue.core.subset import Subset
 from glue.core.state import GlueSerializer
 import glue_jupyter as gj
 from glue_jupyter.view import IPyWidgetView
@@ -18,8 +44,42 @@ from ipywidgets import Output
 from jupyter_ydoc import ydocs
 from ypywidgets import Widget
 
-from .glue_utils import ErrorWidget
-from .glue_ydoc import COMPONENT_LINK_TYPE, IDENTITY_LINK_FUNCTION
+from .glue_cache import DataCache
+from .glue_events import DEFAULT_EVENT_DELAY, Changes, EventScheduler, tab_changes
+from .glue_histogram import CachedHistogramView
+from .glue_image import PyramidImageView
+from .glue_loaders import (
+    DEFAULT_CHUNKED_THRESHOLD,
+    get_data_factory,
+    read_load_logs,
+)
+from .glue_perf import PERF, trace_from_environment
+from .glue_prewarm import take_preloaded
+from .glue_pool import (
+    DEFAULT_POOL_MEMORY,
+    DEFAULT_POOL_SIZE,
+    ViewerPool,
+    close_layer_options,
+    destroy_viewer,
+)
+from .glue_scatter import DecimatedScatter3DView, apply_rendering_mode
+from .glue_subset import DEFAULT_SUBSET_MASK_CACHE_SIZE, SubsetMaskCache
+from .glue_table import PagedTableViewer
+from .glue_utils import (
+    PLUGIN_LOAD_TIMES,
+    ErrorWidget,
+    deferred_plugins,
+    ensure_plugins,
+    get_references,
+    update_state,
+)
+from .glue_ydoc import (
+    COMPONENT_ID_TYPE,
+    PIXEL_COMPONENT_ID_TYPE,
+    COMPONENT_LINK_TYPE,
+    GROUPED_SUBSET_TYPE,
+    IDENTITY_LINK_FUNCTION,
+)
 
 if TYPE_CHECKING:
     # Import `YGlue` just for type checking.
@@ -27,18 +87,100 @@ if TYPE_CHECKING:
 
 warnings.filterwarnings("ignore")
 
+# Time spent importing this module and its dependencies (glue, glue-jupyter...)
+IMPORT_TIME = time.perf_counter() - _import_start
+
+# The sessions only run in the kernels, which are traced on demand
+trace_from_environment()
+
+# Minimum time (in seconds) between two updates of the performance map
+PERF_MIRROR_INTERVAL = 1.0
+
+# Types of the component ids of the session file
+COMPONENT_ID_TYPES = (COMPONENT_ID_TYPE, PIXEL_COMPONENT_ID_TYPE)
+
 
 class SharedGlueSession:
     """The glue session which lives in the kernel of the
     glue document.
     """
 
-    def __init__(self, path: str):
-        self.app = gj.jglue()
+    def __init__(
+        self,
+        path: str,
+        max_workers: int = 4,
+        chunked_threshold: Optional[int] = DEFAULT_CHUNKED_THRESHOLD,
+        data_cache: Optional[DataCache] = None,
+        viewer_pool_size: int = DEFAULT_POOL_SIZE,
+        viewer_pool_memory: int = DEFAULT_POOL_MEMORY,
+        subset_mask_memory: int = DEFAULT_SUBSET_MASK_CACHE_SIZE,
+        event_delay: float = DEFAULT_EVENT_DELAY,
+    ):
+        init_start = time.perf_counter()
+        # The plugins used by the session are loaded with its contents, see
+        # `_load_plugins`
+        with deferred_plugins():
+            self.app = gj.jglue()
         self._path = path
         self._viewers = {}
         self._data = {}
+        # Paths of the datasets referenced by the session, which are
+        # only read when needed (see `_get_data`).
+        self._data_paths: Dict[str, str] = {}
+        # When running in the kernel event loop, the files are read in
+        # background threads as soon as they are registered.
+        self._max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._data_futures: Dict[str, Future] = {}
+        # Tables bigger than this size are read by chunks into memory-mapped
+        # columns, see `glue_loaders.read_table_chunked`.
+        self._chunked_threshold = chunked_threshold
+        self._data_factories: Dict[str, Callable] = {}
+        self._identity_links: Optional[Dict[Tuple, LinkSame]] = None
+        # The links of the data collection indexed in `_identity_links`
+        self._indexed_links: Tuple = ()
+        # On-disk cache of the parsed datasets, enabled by the environment
+        # when not given.
+        self._data_cache = (
+            data_cache if data_cache is not None else DataCache.from_environment()
+        )
+        # Fully qualified names referenced by the session file, whose glue
+        # plugins have been loaded.
+        self._plugin_references: Set[str] = set()
+        # Removed viewers, kept detached to be reused by new viewers of the
+        # same type and dataset.
+        self._viewer_pool = ViewerPool(viewer_pool_size, viewer_pool_memory)
+        # State of the viewers before the state of the session file is
+        # applied, the pooled viewers are reset to it when reused.
+        self._initial_states: WeakKeyDictionary = WeakKeyDictionary()
+        # Layers of the viewers whose dataset is loading, keyed by the id
+        # of the viewer, see `_restore_layers`.
+        self._pending_layers: Dict[int, Tuple[IPyWidgetView, List[Dict]]] = {}
+        # Masks of the subsets, shared by all the viewers of the session.
+        self._subset_masks = SubsetMaskCache(subset_mask_memory)
+        # Performance report mirrored in the document, see
+        # `mirror_performance`.
+        self._perf_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._perf_mirror_scheduled = False
+        # Document events, processed in batches.
+        self._event_scheduler = EventScheduler(
+            self._process_document_changes, event_delay
+        )
         self._init_ydoc()
+        self._init_time = time.perf_counter() - init_start
+
+    def get_startup_report(self) -> Dict:
+        """Get the time spent (in seconds) to get the session ready
+
+        Returns:
+            Dict: The import time of the session module, the initialization
+            time of the session and the loading time of each glue plugin
+        """
+        return {
+            "import": IMPORT_TIME,
+            "init": self._init_time,
+            "plugins": dict(PLUGIN_LOAD_TIMES),
+        }
 
     def remove_viewer(self, tab_name: str, viewer_id: str) -> None:
         """Remove a viewer
@@ -48,16 +190,25 @@ class SharedGlueSession:
             viewer_id (str): Id of the viewer
         """
         viewer = self._viewers.get(tab_name, {}).pop(viewer_id, {})
+        self._pending_layers.pop(id(viewer.get("widget")), None)
         out: Output = viewer.get("output")
         if out is not None:
             out.clear_output()
-        widget: IPyWidgetView = viewer.get("widget")
-        if widget is not None:
-            widget._layout.__del__()
-        for key in ["viewer_options", "layer_options"]:
-            w = viewer.get(key)
-            if w is not None:
-                w.__del__()
+
+        pool_key = viewer.get("pool_key")
+        if pool_key is None:
+            destroy_viewer(viewer)
+            return
+
+        # The layer options are created again when the config panel is opened
+        self._close_layer_options(viewer)
+        widgets = {
+            key: viewer.get(key)
+            for key in ["widget", "viewer_options", "layer_options"]
+        }
+        self._viewer_pool.put(
+            pool_key, widgets, self._estimate_viewer_memory(pool_key[1])
+        )
 
     def remove_tab(self, tab_name: str) -> None:
         """Remove a tab and all of its viewers
@@ -105,6 +256,7 @@ class SharedGlueSession:
         if display_view:
             display(self._viewers[tab_name][viewer_id]["output"])
 
+    @PERF.timed("render_viewer")
     def render_viewer(self) -> None:
         """Fill the place holder output with glu-jupyter widgets"""
 
@@ -115,84 +267,192 @@ class SharedGlueSession:
                 self.remove_tab(frontend_tab)
 
         for tab_name in all_tabs:
-            document_tab_data = self._document.get_tab_data(tab_name)
-            if document_tab_data is None:
-                continue
+            self._render_tab(tab_name)
 
-            saved_tab_viewers = list(self._viewers.get(tab_name, {}))
-            for saved_viewer_id in saved_tab_viewers:
-                if saved_viewer_id not in document_tab_data:
-                    # Viewer removed from frontend
-                    self.remove_viewer(tab_name, saved_viewer_id)
+    def _render_tab(self, tab_name: str) -> None:
+        """Synchronize the viewers of a tab with the document
 
-            for viewer_id in document_tab_data:
-                saved_viewer = self._viewers.get(tab_name, {}).get(viewer_id)
+        Args:
+            tab_name (str): Name of the tab
+        """
+        document_tab_data = self._document.get_tab_data(tab_name)
+        if document_tab_data is None:
+            return
 
-                view_type, state = self._read_view_state(tab_name, viewer_id)
-                data_name = state.get("layer", None)
-                if data_name is not None:
-                    data = self._data.get(data_name, None)
-                else:
-                    data = None
+        saved_tab_viewers = list(self._viewers.get(tab_name, {}))
+        for saved_viewer_id in saved_tab_viewers:
+            if saved_viewer_id not in document_tab_data:
+                # Viewer removed from frontend
+                self.remove_viewer(tab_name, saved_viewer_id)
 
-                if saved_viewer is not None:
-                    if saved_viewer["widget"] is not None:
-                        continue
-                    output = saved_viewer["output"]
-                    output.clear_output()
-                    with output:
-                        widget = self._viewer_factory(
-                            view_type=view_type, viewer_data=data, viewer_state=state
-                        )
-
-                    saved_viewer["widget"] = widget
-
-                    # This may be the error widget
-                    if widget is None or not hasattr(widget, "viewer_options"):
-                        with output:
-                            display(widget)
-                        return
-
-                    viewer_options = widget.viewer_options
-                    try:
-                        layer_options = LayerOptionsWidget(widget)
-                    except Exception:
-                        layer_options = None
+        for viewer_id in document_tab_data:
+            self._render_single_viewer(tab_name, viewer_id)
 
-                    saved_viewer["viewer_options"] = viewer_options
-                    saved_viewer["layer_options"] = layer_options
+    def _render_single_viewer(self, tab_name: str, viewer_id: str) -> None:
+        """Create the glue-jupyter widget of a viewer if it does not exist yet
 
-                else:
-                    widget = self._viewer_factory(
-                        view_type=view_type,
-                        viewer_data=data,
-                        viewer_state=state,
-                    )
+        Args:
+            tab_name (str): Name of the tab
+            viewer_id (str): Id of the viewer
+        """
+        saved_viewer = self._viewers.get(tab_name, {}).get(viewer_id)
+        if saved_viewer is not None and saved_viewer["widget"] is not None:
+            return
 
-                    # This may be the error widget
-                    if widget is None or not hasattr(widget, "viewer_options"):
-                        return
+        view_type, state = self._read_view_state(tab_name, viewer_id)
+        layer_states = self._read_layer_states(tab_name, viewer_id)
+        data_name = state.get("layer", None)
+        if data_name is not None:
+            self._load_data_in_background(data_name)
+            if self._is_data_loading(data_name):
+                # The viewer is rendered once its data is published.
+                return
+            data = self._get_data(data_name)
+            # Read again, with the component ids of the data
+            view_type, state = self._read_view_state(tab_name, viewer_id, data)
+        else:
+            data = None
 
-                    viewer_options = widget.viewer_options
-                    try:
-                        layer_options = LayerOptionsWidget(widget)
-                    except Exception:
-                        layer_options = None
-                    # No existing viewer, create widget only.
-                    if tab_name in self._viewers:
-                        self._viewers[tab_name][viewer_id] = {
-                            "widget": widget,
-                            "viewer_options": viewer_options,
-                            "layer_options": layer_options,
-                        }
-                    else:
-                        self._viewers[tab_name] = {
-                            viewer_id: {
-                                "widget": widget,
-                                "viewer_options": viewer_options,
-                                "layer_options": layer_options,
-                            }
-                        }
+        if saved_viewer is not None:
+            output = saved_viewer["output"]
+            output.clear_output()
+            with output:
+                viewer = self._create_viewer_widgets(
+                    view_type, data_name, data, state, layer_states
+                )
+
+            saved_viewer.update(viewer)
+
+            # This may be the error widget
+            if "viewer_options" not in viewer:
+                with output:
+                    display(viewer["widget"])
+
+        else:
+            viewer = self._create_viewer_widgets(
+                view_type, data_name, data, state, layer_states
+            )
+
+            # This may be the error widget
+            if "viewer_options" not in viewer:
+                return
+
+            # No existing viewer, create widget only.
+            self._viewers.setdefault(tab_name, {})[viewer_id] = viewer
+
+    def _create_viewer_widgets(
+        self,
+        view_type: str,
+        data_name: Optional[str],
+        data: any,
+        state: dict,
+        layer_states: Optional[List[Dict]] = None,
+    ) -> Dict:
+        """Create the widgets of a viewer, reusing a pooled viewer of the same
+        type and dataset if there is one
+
+        Args:
+            view_type (str): Type of the widget, it is taken from
+            the session file.
+            data_name (Optional[str]): Name of the dataset of the viewer
+            data (any): The data used to create the glue-jupyter widget
+            state (dict): The state of the widget, it is taken from
+            the session file.
+            layer_states (Optional[List[Dict]]): The states of the layers
+            of the viewer, see `_read_layer_states`
+
+        Returns:
+            Dict: The viewer widget, with its option widgets and pool key
+            if it is not an error widget
+        """
+        pool_key = (view_type, data_name) if data_name is not None else None
+        if pool_key is not None:
+            viewer = self._viewer_pool.take(pool_key)
+            if viewer is not None:
+                widget = viewer["widget"]
+                # Back to the viewer as created: the layers are added again,
+                # the options of the previous viewer being reset
+                for layer_data in {layer.layer.data for layer in widget.layers}:
+                    widget.remove_data(layer_data)
+                widget.add_data(data)
+                update_state(
+                    widget.state, {**self._initial_states.get(widget, {}), **state}
+                )
+                apply_rendering_mode(widget, state)
+                self._restore_layers(widget, layer_states)
+                widget.show()
+                PERF.count("viewers_reused")
+                return dict(viewer, pool_key=pool_key)
+
+        view_name = (view_type or "").rsplit(".", 1)[-1]
+        with PERF.span(f"viewer_factory/{view_name}"):
+            widget = self._viewer_factory(
+                view_type=view_type, viewer_data=data, viewer_state=state
+            )
+        PERF.count(f"viewers_created/{view_name}")
+        if widget is None or not hasattr(widget, "viewer_options"):
+            return {"widget": widget}
+        self._restore_layers(widget, layer_states)
+
+        # The layer options are only created when displayed, see `render_config`
+        return {
+            "widget": widget,
+            "viewer_options": widget.viewer_options,
+            "layer_options": None,
+            "pool_key": pool_key,
+        }
+
+    def _estimate_viewer_memory(self, data_name: str) -> int:
+        """Estimate the memory held by a viewer, two float64 values per
+        element of its dataset (the coordinates sent to the browser)"""
+        data = self._data.get(data_name)
+        datasets = data if isinstance(data, list) else [data]
+        return sum(getattr(dataset, "size", 0) for dataset in datasets) * 16
+
+    def _render_pending_viewers(self) -> None:
+        """Create the widgets of the viewers which could not be rendered yet,
+        without touching the viewers already rendered"""
+        tabs = self._document.view("tabs")
+        for tab_name, tab_data in tabs.items():
+            saved_tab_viewers = self._viewers.get(tab_name, {})
+            for viewer_id in tab_data:
+                saved_viewer = saved_tab_viewers.get(viewer_id)
+                if saved_viewer is None or saved_viewer["widget"] is None:
+                    self._render_single_viewer(tab_name, viewer_id)
+
+    def _render_tab_events(self, events: List[Y.YMapEvent]) -> None:
+        """Reconcile only the tabs and viewers modified by the "tabs" events
+
+        Args:
+            events (List[Y.YMapEvent]): Deep events of the tabs map
+        """
+        self._render_tab_changes(tab_changes(events))
+
+    def _render_tab_changes(self, changes: Changes) -> None:
+        """Reconcile only the tabs and viewers modified
+
+        Args:
+            changes (Changes): The changes of the tabs, see
+            `glue_events.tab_changes`
+        """
+        changed_tabs = set()
+        for path, change in changes.items():
+            if len(path) == 1:
+                # A whole tab has been added, replaced or removed
+                changed_tabs.add(path[0])
+                if change["action"] == "delete":
+                    self.remove_tab(path[0])
+                else:
+                    self._render_tab(path[0])
+
+        for path, change in changes.items():
+            if len(path) == 2 and path[0] not in changed_tabs:
+                # A viewer of the tab has changed
+                tab_name, viewer_id = path
+                if change["action"] == "delete":
+                    self.remove_viewer(tab_name, viewer_id)
+                else:
+                    self._render_single_viewer(tab_name, viewer_id)
 
     def render_config(self, config: str, tab_id: str, viewer_id: str):
         """Get the config widgets of a viewer and display it in
@@ -209,10 +469,86 @@ class SharedGlueSession:
             if config == "Viewer":
                 widget = viewer.get("viewer_options")
             elif config == "Layer":
-                widget = viewer.get("layer_options")
+                widget = self._get_layer_options(viewer)
             if widget is not None:
                 display(widget)
 
+    def get_table_page(
+        self,
+        tab_name: str,
+        viewer_id: str,
+        start: int,
+        count: int,
+        sort_by: Optional[str] = None,
+        descending: bool = False,
+        filters: Optional[List[Dict]] = None,
+        columns: Optional[List[str]] = None,
+    ) -> Optional[Dict]:
+        """Get a window of rows of a table viewer, sorted and filtered in
+        the kernel
+
+        Args:
+            tab_name (str): Name of the tab
+            viewer_id (str): Id of the table viewer
+            start (int): Position of the first row
+            count (int): Number of rows
+            sort_by (Optional[str]): Column to sort by
+            descending (bool, optional): Sort in descending order
+            filters (Optional[List[Dict]]): Filters of the rows, dicts with
+            the "column", "op" and "value" to compare the column with
+            columns (Optional[List[str]]): The columns to return, all
+            by default
+
+        Returns:
+            Optional[Dict]: The page, see `glue_table.TablePager.page`, None
+            if the viewer is not a rendered table viewer
+        """
+        viewer = self._viewers.get(tab_name, {}).get(viewer_id, {})
+        widget = viewer.get("widget")
+        if not isinstance(widget, PagedTableViewer):
+            return None
+
+        pager = widget.widget_table.pager
+        if pager is None:
+            return None
+        return pager.page(start, count, sort_by, descending, filters, columns)
+
+    def close_config(self, config: str, tab_id: str, viewer_id: str) -> None:
+        """Tear down the config widgets of a viewer when the config
+        panel is closed
+
+        Args:
+            config (str): Type of the config widget
+            tab_id (str): Id of the tab containing viewer
+            viewer_id (str): Id of the viewer
+        """
+        viewer = self._viewers.get(tab_id, {}).get(viewer_id, None)
+        # The viewer options are part of the viewer layout, they are kept.
+        if viewer is not None and config == "Layer":
+            self._close_layer_options(viewer)
+
+    def _get_layer_options(self, viewer: Dict) -> Optional[LayerOptionsWidget]:
+        """Get the layer options of a viewer, creating them on first use
+
+        Args:
+            viewer (Dict): The viewer widgets
+
+        Returns:
+            Optional[LayerOptionsWidget]: The layer options widget
+        """
+        if viewer.get("layer_options") is None and "viewer_options" in viewer:
+            try:
+                viewer["layer_options"] = LayerOptionsWidget(viewer["widget"])
+            except Exception:
+                return None
+        return viewer.get("layer_options")
+
+    def _close_layer_options(self, viewer: Dict) -> None:
+        layer_options = viewer.get("layer_options")
+        if layer_options is not None:
+            viewer["layer_options"] = None
+            close_layer_options(layer_options)
+
     def _viewer_factory(
         self, view_type: str, viewer_data: any, viewer_state: dict
     ) -> Optional[Widget]:
@@ -233,72 +569,78 @@ class SharedGlueSession:
         if view_type == "glue.viewers.scatter.qt.data_viewer.ScatterViewer":
             try:
                 widget = self.app.scatter2d(data=viewer_data)
-                for key, value in viewer_state.items():
-                    try:
-                        setattr(widget.state, key, value)
-                    except Exception:
-                        pass
+                self._init_viewer_state(widget, viewer_state)
+                apply_rendering_mode(widget, viewer_state)
             except Exception as e:
                 widget = ErrorWidget(e, __file__)
 
         elif view_type == "glue.viewers.image.qt.data_viewer.ImageViewer":
             try:
-                widget = self.app.imshow(data=viewer_data)
+                # Same as `app.imshow`, using the image pyramids when
+                # zoomed out
+                widget = self.app.new_data_viewer(PyramidImageView, data=viewer_data)
+                self._init_viewer_state(widget, {})
             except Exception as e:
                 print(e)
         elif view_type == "glue.viewers.histogram.qt.data_viewer.HistogramViewer":
             try:
-                widget = self.app.histogram1d(data=viewer_data)
-                for key, value in viewer_state.items():
-                    try:
-                        setattr(widget.state, key, value)
-                    except Exception:
-                        pass
+                # Same as `app.histogram1d`, with the histograms computed
+                # from cached sorted columns
+                widget = self.app.new_data_viewer(CachedHistogramView, data=viewer_data)
+                self._init_viewer_state(widget, viewer_state)
             except Exception as e:
                 widget = ErrorWidget(e, __file__)
         elif view_type == "glue.viewers.table.qt.data_viewer.TableViewer":
             try:
-                widget = self.app.table(data=viewer_data)
-                for key, value in viewer_state.items():
-                    try:
-                        setattr(widget.state, key, value)
-                    except Exception:
-                        pass
+                # Same as `app.table`, with the sorting and the subset
+                # masks computed for the displayed page only
+                widget = self.app.new_data_viewer(PagedTableViewer, data=viewer_data)
+                self._init_viewer_state(widget, viewer_state)
             except Exception as e:
                 widget = ErrorWidget(e, __file__)
         elif (
             view_type == "glue_vispy_viewers.scatter.scatter_viewer.VispyScatterViewer"
         ):
             try:
-                widget = self.app.scatter3d(data=viewer_data)
-                for key, value in viewer_state.items():
-                    try:
-                        setattr(widget.state, key, value)
-                    except Exception:
-                        pass
+                # Same as `app.scatter3d`, sending a sample of the points
+                # of the large datasets
+                widget = self.app.new_data_viewer(
+                    DecimatedScatter3DView, data=viewer_data
+                )
+                self._init_viewer_state(widget, viewer_state)
+                apply_rendering_mode(widget, viewer_state)
             except Exception as e:
                 widget = ErrorWidget(e, __file__)
         elif view_type == "glue.viewers.profile.state.ProfileLayerState":
             try:
                 widget = self.app.profile1d(data=viewer_data)
-                for key, value in viewer_state.items():
-                    try:
-                        setattr(widget.state, key, value)
-                    except Exception:
-                        pass
+                self._init_viewer_state(widget, viewer_state)
             except Exception as e:
                 widget = ErrorWidget(e, __file__)
 
         return widget
 
+    def _init_viewer_state(self, widget: IPyWidgetView, viewer_state: Dict) -> None:
+        """Apply the state of the session file to a new viewer, keeping its
+        initial state for the reuse of the viewer, see `_create_viewer_widgets`
+        """
+        self._initial_states[widget] = {
+            key: value
+            for key, value in widget.state.as_dict().items()
+            if key != "layers"
+        }
+        update_state(widget.state, viewer_state)
+
     def _read_view_state(
-        self, tab_name: str, viewer_id: str
+        self, tab_name: str, viewer_id: str, data: Optional[Data] = None
     ) -> Tuple[Optional[str], Dict]:
         """Generate the view state from viewer id and tab name
 
         Args:
             tab_name (str): Name of the tab
             viewer_id (str): Id of the viewer
+            data (Optional[Data]): The data of the viewer, the references to
+            its component ids are resolved if given
 
         Returns:
             Tuple[Optional[str], Dict]: Viewer type and the state of the
@@ -306,33 +648,171 @@ class SharedGlueSession:
         """
         state = {}
         tab_data = self._document.get_tab_data(tab_name)
-        contents = self._document.contents
+        contents = self._document.view("contents")
         if tab_data is None:
             return state
 
+        def decode(value):
+            if isinstance(value, str):
+                if value.startswith("st__"):
+                    return value[4:]
+                if (
+                    data is not None
+                    and contents.get(value, {}).get("_type") in COMPONENT_ID_TYPES
+                ):
+                    try:
+                        return data.id[contents[value]["label"]]
+                    except Exception:
+                        pass
+            return value
+
         viewer_data = tab_data.get(viewer_id, {})
         view_type: str = viewer_data.get("_type")
         state_values = viewer_data.get("state", {}).get("values", {})
         # Extract plot state
         for prop, value in state_values.items():
-            if isinstance(value, str) and value.startswith("st__"):
-                state[prop] = value[4:]
-            else:
-                state[prop] = value
+            state[prop] = decode(value)
 
         # Merging the state with what's specified in "layers"
-        # Only taking the state of the first layer
-        # TODO Support multiple layers??
+        # Only taking the state of the first layer, all the layers are
+        # restored by `_restore_layers`
         layers = viewer_data.get("layers", [])
         if len(layers) > 0 and layers[0].get("state") in contents:
             extra_state = contents.get(layers[0].get("state"), {}).get("values", {})
             for prop, value in extra_state.items():
-                if isinstance(value, str) and value.startswith("st__"):
-                    state[prop] = value[4:]
-                else:
-                    state[prop] = value
+                state[prop] = decode(value)
         return view_type, state
 
+    def _read_layer_states(self, tab_name: str, viewer_id: str) -> List[Dict]:
+        """Read the states of all the layers of a viewer
+
+        Args:
+            tab_name (str): Name of the tab
+            viewer_id (str): Id of the viewer
+
+        Returns:
+            List[Dict]: The serialized state values of each layer, the
+            "layer" value being the name of its dataset or subset
+        """
+        tab_data = self._document.get_tab_data(tab_name)
+        if tab_data is None:
+            return []
+
+        contents = self._document.view("contents")
+        layer_states = []
+        for layer in tab_data.get(viewer_id, {}).get("layers", []):
+            values = contents.get(layer.get("state"), {}).get("values")
+            if values is not None and values.get("layer") is not None:
+                layer_states.append(values)
+        return layer_states
+
+    @PERF.timed("restore_layers")
+    def _restore_layers(self, widget: IPyWidgetView, layer_states: List[Dict]) -> None:
+        """Add the layers of a viewer and restore their states in one batch
+
+        The datasets are added first (with their subsets), then the state of
+        every layer is set with its callbacks delayed, while the figure
+        messages are held, so that the viewer is redrawn once and not once
+        per layer and per value.
+
+        Args:
+            widget (IPyWidgetView): The glue-jupyter viewer
+            layer_states (List[Dict]): The serialized layer states, see
+            `_read_layer_states`
+        """
+        if not layer_states or not hasattr(widget, "layers"):
+            return
+
+        contents = self._document.view("contents")
+        figure = getattr(widget, "figure", None)
+        with ExitStack() as stack:
+            if hasattr(figure, "hold_sync"):
+                stack.enter_context(figure.hold_sync())
+
+            for values in layer_states:
+                name = values["layer"]
+                if contents.get(name, {}).get("_type") == GROUPED_SUBSET_TYPE:
+                    continue
+                if self._is_data_loading(name):
+                    # Restored once the dataset is published, see
+                    # `_on_data_read`
+                    _, pending = self._pending_layers.setdefault(
+                        id(widget), (widget, [])
+                    )
+                    pending.append(values)
+                    continue
+                try:
+                    data = self._get_data(name)
+                except Exception:
+                    continue
+                if isinstance(data, Data) and not any(
+                    layer.layer is data for layer in widget.layers
+                ):
+                    try:
+                        widget.add_data(data)
+                    except Exception as e:
+                        print(f"Could not add {name} to the viewer: {e}")
+
+            restored = set()
+            for values in layer_states:
+                artist = self._find_layer_artist(widget, values["layer"], restored)
+                if artist is None:
+                    continue
+                restored.add(artist)
+                update_state(
+                    artist.state,
+                    self._decode_layer_state(values, artist.layer.data, contents),
+                )
+
+    def _find_layer_artist(
+        self, widget: IPyWidgetView, name: str, excluded: Set
+    ) -> Optional[Any]:
+        """Find the layer artist of a dataset or subset of the session file"""
+        contents = self._document.view("contents")
+        entry = contents.get(name, {})
+        if entry.get("_type") == GROUPED_SUBSET_TYPE:
+            label = contents.get(entry.get("group"), {}).get("label")
+            for artist in widget.layers:
+                layer = artist.layer
+                if (
+                    artist not in excluded
+                    and isinstance(layer, Subset)
+                    and layer.label == label
+                ):
+                    return artist
+            return None
+
+        data = self._data.get(name)
+        for artist in widget.layers:
+            if artist not in excluded and artist.layer is data:
+                return artist
+        return None
+
+    @staticmethod
+    def _decode_layer_state(values: Dict, data: Data, contents: Dict) -> Dict:
+        """Decode the serialized values of a layer state
+
+        The strings are references to other objects of the session file,
+        unless prefixed with "st__". Only the references to component ids are
+        resolved (against the layer data), the other ones are ignored.
+        """
+        state = {}
+        for prop, value in values.items():
+            if prop == "layer":
+                continue
+            if isinstance(value, str):
+                if value.startswith("st__"):
+                    value = value[4:]
+                elif contents.get(value, {}).get("_type") in COMPONENT_ID_TYPES:
+                    try:
+                        value = data.id[contents[value]["label"]]
+                    except Exception:
+                        continue
+                else:
+                    continue
+            state[prop] = value
+        return state
+
     def _init_ydoc(self) -> None:
         """Initialize the `YGlue` document and populate its contents
         by using the `ypywidgets.Widget`
@@ -356,133 +836,426 @@ class SharedGlueSession:
         )
         if not viewer:
             return
-        data = self._data[data_name]
-        viewer.add_data(data)
+        self._restore_layers(viewer, [{"layer": data_name}])
 
+    @PERF.timed("add_data")
     def add_data(self, file_path: str) -> None:
         """Add a new data file to the session"""
         relative_path = Path(file_path).relative_to(Path(self._path).parent)
         assert os.path.exists(relative_path)
 
-        data = self.app.load_data(str(relative_path))
-
-        # Serialize the data on its own (without other context).
-        data_serializer = GlueSerializer(data)
-        data_serializer.dumpo()
+        # The data factories of all the plugins are candidates
+        ensure_plugins()
+        factory = get_data_factory(str(relative_path), {}, self._chunked_threshold)
+        data = load_data(str(relative_path), factory=factory)
+        self._add_datasets([data])
+
+        contents = self._document.view("contents")
+
+        # Serialize the new data only, the names already used in the document
+        # are reserved so that the new objects do not collide with them.
+        data_serializer = GlueSerializer([data])
+        data_serializer._objs.update(dict.fromkeys(contents))
+        data_name = data_serializer.id(data)
+        serialized_data = {
+            key: value
+            for key, value in data_serializer.dumpo().items()
+            if key != "__main__" and key not in contents
+        }
+        serialized_data = json.loads(
+            json.dumps(serialized_data, default=GlueSerializer.json_default)
+        )
+        components = serialized_data[data_name]["components"]
 
-        # Serialize the previous data without the new one to create a context.
-        previous_data_serializer = GlueSerializer(self._data)
-        previous_data_serializer.dumpo()
+        # Inject the label in the data collection
+        data_collection_name: str = contents.get("__main__", {}).get("data", "")
+        data_collection = deepcopy(contents[data_collection_name])
+        data_collection["data"].append(data_name)
+        data_collection["cids"].extend(cid for cid, comp in components)
+        data_collection["components"].extend(comp for cid, comp in components)
+        serialized_data[data_collection_name] = data_collection
 
-        # We generate the data representation in the previous data context.
-        serialized_data = [
-            (previous_data_serializer.id(obj), previous_data_serializer.do(obj))
-            for oid, obj in list(data_serializer._objs.items())
-        ]
-        serialized_data = dict(serialized_data)
+        attributes = {
+            attribute: serialized_data[attribute]
+            for attribute in serialized_data[data_name].get("primary_owner", [])
+        }
 
-        contents = self._document.contents
+        self._data[data.label] = data
+        self._document.add_data(
+            serialized_data, {data_name: serialized_data[data_name]}, attributes
+        )
+        self._update_loading_progress()
 
-        # Inject all components
-        for key, value in serialized_data.items():
-            if key != "__main__":
-                contents[key] = value
+    @PERF.timed("load_data")
+    def _load_data(self) -> None:
+        """Register the data defined in the glue session. The files are only
+        read when a viewer or a link needs them, see `_get_data`. The files
+        of the datasets used by the viewers and the links of the document
+        are read in background, see `_load_data_in_background`."""
+        load_logs = read_load_logs(self._document.view("contents"))
+
+        registered = []
+        for data_name, load_log in load_logs.items():
+            if data_name not in self._data and data_name not in self._data_paths:
+                data_path = load_log["path"]
+                self._data_paths[data_name] = data_path
+                factory = get_data_factory(data_path, load_log, self._chunked_threshold)
+                if factory is not None:
+                    self._data_factories[data_name] = factory
+                registered.append(data_name)
+
+        if registered:
+            used = self._get_used_data()
+            for data_name in registered:
+                if data_name in used:
+                    self._load_data_in_background(data_name)
+            self._update_loading_progress()
+
+    def _get_used_data(self) -> Set[str]:
+        """Get the names of the datasets used by the viewers of all the tabs
+        and by the links of the document"""
+        used = set()
+        for tab_name in self._document.get_tab_names():
+            for viewer_id in self._document.get_tab_data(tab_name) or {}:
+                used.update(
+                    values["layer"]
+                    for values in self._read_layer_states(tab_name, viewer_id)
+                )
+        for link in self._document.view("links").values():
+            used.update((link.get("data1"), link.get("data2")))
+        return used
+
+    def _load_data_in_background(self, data_name: str) -> None:
+        """Read a data file in the thread pool if the session runs in an
+        event loop, the dataset is published in the loop once ready."""
+        if (
+            data_name in self._data
+            or data_name in self._data_futures
+            or data_name not in self._data_paths
+        ):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
 
-        # Inject the label in the data collection
-        data_collection_name: str = contents.get("__main__", {}).get("data", "")
-        contents[data_collection_name]["data"].append(data.label)
-        contents[data_collection_name]["cids"].extend(
-            cid for cid, comp in serialized_data[data.label]["components"]
-        )
-        contents[data_collection_name]["components"].extend(
-            comp for cid, comp in serialized_data[data.label]["components"]
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers)
+        future = self._executor.submit(self._read_data_file, data_name)
+        self._data_futures[data_name] = future
+        future.add_done_callback(
+            lambda f: loop.call_soon_threadsafe(self._on_data_read, data_name)
         )
 
-        self._data[data.label] = data
-        self._document.set(json.dumps(contents))
+    def _read_data_file(self, data_name: str):
+        """Read a data file, this does not touch the glue application
+        and can run in a worker thread"""
+        path = self._data_paths[data_name]
+        factory = self._data_factories.get(data_name)
+        with PERF.span("read_data", path=path):
+            preloaded = take_preloaded(path, factory)
+            if preloaded is not None:
+                # Read by the server extension before the session was opened
+                PERF.count("datasets_preloaded")
+                return preloaded
+            if os.path.isfile(path):
+                PERF.count("bytes_read", os.path.getsize(path))
+            if self._data_cache is not None:
+                return self._data_cache.load_data(path, factory=factory)
+            return load_data(path, factory=factory)
+
+    def _is_data_loading(self, data_name: str) -> bool:
+        return data_name in self._data_futures and data_name not in self._data
+
+    def _on_data_read(self, data_name: str) -> None:
+        """Publish a dataset read in background and render the viewers
+        waiting for it"""
+        if data_name in self._data:
+            return
+        try:
+            self._get_data(data_name)
+        except Exception as e:
+            print(f"Could not load {data_name}: {e}")
+            return
+        self._render_pending_viewers()
+        self._restore_pending_layers(data_name)
+
+    def _restore_pending_layers(self, data_name: str) -> None:
+        """Add the layers of a dataset which were skipped while it was
+        loading to the viewers already rendered"""
+        for key, (widget, layer_states) in list(self._pending_layers.items()):
+            ready = [values for values in layer_states if values["layer"] == data_name]
+            if not ready:
+                continue
+            remaining = [values for values in layer_states if values not in ready]
+            if remaining:
+                self._pending_layers[key] = (widget, remaining)
+            else:
+                del self._pending_layers[key]
+            self._restore_layers(widget, ready)
 
-    def _load_data(self) -> None:
-        """Load data defined in the glue session"""
-        data_paths = {}
-        contents = self._document.contents
-        if "LoadLog" in contents:
-            path = Path(contents["LoadLog"]["path"])
-            data_paths[path.stem] = str(path)
-        idx = 0
-        while True:
-            load_log = f"LoadLog_{idx}"
-            if load_log not in contents:
-                break
-            path = Path(contents[load_log]["path"])
-            data_paths[path.stem] = str(path)
-            idx += 1
-
-        for data_name, data_path in data_paths.items():
-            if data_name not in self._data:
-                self._data[data_name] = self.app.load_data(data_path)
+    def _get_data(self, data_name: str) -> Optional[Data]:
+        """Get a dataset of the session, reading its file on first access
 
+        Args:
+            data_name (str): Name of the dataset
+
+        Returns:
+            Optional[Data]: The dataset, or None if the session does not
+            reference it
+        """
+        data = self._data.get(data_name)
+        if data is None and data_name in self._data_paths:
+            future = self._data_futures.pop(data_name, None)
+            if future is not None:
+                # Wait for the background reading if it is not done yet.
+                result = future.result()
+            else:
+                result = self._read_data_file(data_name)
+
+            datasets = result if isinstance(result, list) else [result]
+            self._add_datasets(datasets)
+            data = datasets[0] if len(datasets) == 1 else datasets
+            self._data[data_name] = data
+            self._update_loading_progress()
+        return data
+
+    def _add_datasets(self, datasets: List[Data]) -> None:
+        """Add datasets to the glue application, their subset masks being
+        computed with the session cache"""
+        for data in datasets:
+            self._subset_masks.install(data)
+        self.app.add_datasets(datasets)
+
+    def load_all_data(self) -> None:
+        """Read all the datasets referenced by the session"""
+        for data_name in list(self._data_paths):
+            self._get_data(data_name)
+
+    def get_loading_progress(self) -> Dict:
+        """Get the loading status of the datasets referenced by the session
+
+        Returns:
+            Dict: The number of datasets referenced and loaded, and the names
+            of the datasets which are not loaded yet
+        """
+        names = set(self._data_paths) | set(self._data)
+        pending = sorted(name for name in names if name not in self._data)
+        return {
+            "total": len(names),
+            "loaded": len(names) - len(pending),
+            "pending": pending,
+        }
+
+    def _update_loading_progress(self) -> None:
+        """Share the loading status with the frontend"""
+        self._document.set_loading_progress(self.get_loading_progress())
+
+    @PERF.timed("update_links")
     def _update_links(self, changes: Dict) -> None:
-        for change in changes.values():
-            if change["action"] == "add":
-                link_desc = change["newValue"]
-                if (
-                    link_desc.get("_type", "") == COMPONENT_LINK_TYPE
-                    and link_desc.get("using", {}).get("function", None)
-                    == IDENTITY_LINK_FUNCTION
-                ):
-                    if not self._get_identity_link(link_desc):
-                        self._add_identity_link(link_desc)
-            if change["action"] == "delete":
-                link_desc = change["oldValue"]
-                if (
-                    link_desc.get("_type", "") == COMPONENT_LINK_TYPE
-                    and link_desc.get("using", {}).get("function", None)
-                    == IDENTITY_LINK_FUNCTION
-                ):
-                    link = self._get_identity_link(link_desc)
-                    if link:
-                        self.app.data_collection.remove_link(link)
-
-    def _get_identity_link(self, link_desc: Dict) -> Optional[LinkSame]:
-        # Build a list of elements to compare (datasets names and attributes names).
-        # The order of the list allows to easily compare a reversed link, which is
-        # the same link in the case of identity links.
-        desc_lst = [
+        # The index is checked against the links of the data collection once
+        # per batch, then kept in sync with the links added and removed here.
+        index = self._get_identity_link_index()
+        try:
+            for change in changes.values():
+                # An "update" is a link edited in the document, or deleted then
+                # added again in the same event window (see
+                # `glue_events.merge_change`): the previous link is replaced.
+                if change["action"] in ("delete", "update"):
+                    link_desc = change["oldValue"]
+                    if self._is_identity_link(link_desc):
+                        link = self._get_identity_link(link_desc, index)
+                        if link:
+                            self._remove_identity_link(link, index)
+                if change["action"] in ("add", "update"):
+                    link_desc = change["newValue"]
+                    if self._is_identity_link(link_desc):
+                        if not self._get_identity_link(link_desc, index):
+                            self._add_identity_link(link_desc, index)
+        finally:
+            self._indexed_links = self.app.data_collection.external_links
+
+    @staticmethod
+    def _is_identity_link(link_desc: Dict) -> bool:
+        return (
+            link_desc.get("_type", "") == COMPONENT_LINK_TYPE
+            and link_desc.get("using", {}).get("function", None)
+            == IDENTITY_LINK_FUNCTION
+        )
+
+    def _get_identity_link(
+        self, link_desc: Dict, index: Optional[Dict[Tuple, LinkSame]] = None
+    ) -> Optional[LinkSame]:
+        if index is None:
+            index = self._get_identity_link_index()
+        key = self._identity_link_key(
             link_desc["data1"],
             link_desc["cids1_labels"],
             link_desc["cids2_labels"],
             link_desc["data2"],
-        ]
+        )
+        return index.get(key)
+
+    @staticmethod
+    def _identity_link_key(
+        data1: str, labels1: List[str], labels2: List[str], data2: str
+    ) -> Tuple:
+        # A reversed link is the same link in the case of identity links, both
+        # directions have the same key.
+        key = (data1, tuple(labels1), tuple(labels2), data2)
+        return min(key, key[::-1])
+
+    def _get_identity_link_index(self) -> Dict[Tuple, LinkSame]:
+        """Get the index of the identity links of the data collection
+
+        It is kept in sync by the session (see `_update_links`), and built
+        again when the links of the data collection have been changed by glue
+        directly.
+        """
         links = self.app.data_collection.external_links
-        for link in links:
-            if not link.display == "identity link":
-                continue
-            link_lst = [
-                link.data1.label,
-                [str(id) for id in link.cids1],
-                [str(id) for id in link.cids2],
-                link.data2.label,
-            ]
-            if desc_lst == link_lst or desc_lst == link_lst[::-1]:
-                return link
-        return None
+        if (
+            self._identity_links is None
+            or len(links) != len(self._indexed_links)
+            or any(map(operator.is_not, links, self._indexed_links))
+        ):
+            self._identity_links = {}
+            for link in links:
+                if not link.display == "identity link":
+                    continue
+                self._identity_links.setdefault(self._get_link_key(link), link)
+            self._indexed_links = links
+        return self._identity_links
+
+    def _get_link_key(self, link: LinkSame) -> Tuple:
+        return self._identity_link_key(
+            link.data1.label,
+            [str(id) for id in link.cids1],
+            [str(id) for id in link.cids2],
+            link.data2.label,
+        )
 
-    def _add_identity_link(self, link_desc: Dict) -> None:
-        data1 = self._data[link_desc["data1"]]
-        data2 = self._data[link_desc["data2"]]
+    def _add_identity_link(self, link_desc: Dict, index: Dict[Tuple, LinkSame]) -> None:
+        data1 = self._get_data(link_desc["data1"])
+        data2 = self._get_data(link_desc["data2"])
         attributes1 = data1.id[link_desc["cids1_labels"][0]]
         attributes2 = data2.id[link_desc["cids2_labels"][0]]
         link = LinkSame(attributes1, attributes2)
         self.app.data_collection.add_link(link)
+        index[self._get_link_key(link)] = link
+
+    def _remove_identity_link(
+        self, link: LinkSame, index: Dict[Tuple, LinkSame]
+    ) -> None:
+        self.app.data_collection.remove_link(link)
+        index.pop(self._get_link_key(link), None)
+
+    def _load_plugins(self, entries: Iterable[Dict]) -> None:
+        """Load the glue plugins providing the objects referenced by entries
+        of the session file (link functions, viewers, data factories...)"""
+        references = get_references(entries) - self._plugin_references
+        if references:
+            self._plugin_references |= references
+            ensure_plugins(references)
 
     def _on_document_change(self, target, event):
-        """Callback on ydoc changed event."""
-        if target == "contents":
-            self._load_data()
-        elif target == "tabs":
-            self._load_data()
-            self.render_viewer()
-        elif target == "links":
-            self._load_data()
-            self._update_links(event.keys)
-            self.render_viewer()
+        """Callback on ydoc changed event, the events are coalesced and
+        processed by `_process_document_changes`."""
+        if target in ("contents", "tabs", "links"):
+            self._event_scheduler.push(target, event)
+
+    @PERF.timed("document_changes")
+    def _process_document_changes(self, changes: Dict[str, Changes]) -> None:
+        """Reconcile the session with a batch of changes of the document
+
+        Args:
+            changes (Dict[str, Changes]): The merged changes of each root
+            map, see `glue_events.EventScheduler`
+        """
+        for target, target_changes in changes.items():
+            PERF.count(f"document_changes/{target}", len(target_changes))
+
+        contents = changes.get("contents")
+        if contents:
+            self._load_plugins(
+                change["newValue"]
+                for change in contents.values()
+                if change["action"] != "delete"
+            )
+        self._load_data()
+
+        links = changes.get("links")
+        if links:
+            self._update_links({path[0]: change for path, change in links.items()})
+        if "tabs" in changes:
+            self._render_tab_changes(changes["tabs"])
+        if links:
+            self._render_pending_viewers()
+
+    def get_performance_report(self) -> Dict:
+        """Get the timings and counters of the kernel side of the session
+
+        Returns:
+            Dict: The "startup" report (see `get_startup_report`), the
+            "spans" and "counters" of `glue_perf.PERF` and the "events"
+            metrics (see `get_event_metrics`)
+        """
+        return {
+            "startup": self.get_startup_report(),
+            **PERF.report(),
+            "events": self.get_event_metrics(),
+        }
+
+    def mirror_performance(self, enabled: bool = True) -> None:
+        """Mirror the performance report into the "performance" map of the
+        session document, for the frontend
+
+        The map is updated at most once per `PERF_MIRROR_INTERVAL` seconds,
+        after the operations of the session.
+
+        Args:
+            enabled (bool, optional): Enable or disable the mirroring
+        """
+        PERF.remove_listener(self._schedule_performance_mirror)
+        self._perf_loop = None
+        if not enabled:
+            return
+        try:
+            self._perf_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        PERF.add_listener(self._schedule_performance_mirror)
+        self._write_performance_mirror()
+
+    def _schedule_performance_mirror(self) -> None:
+        # Called at the end of the top-level spans, possibly in a worker thread
+        if self._perf_loop is None:
+            # The Y document cannot be used from another thread
+            if threading.current_thread() is threading.main_thread():
+                self._write_performance_mirror()
+        elif not self._perf_mirror_scheduled:
+            self._perf_mirror_scheduled = True
+            self._perf_loop.call_soon_threadsafe(
+                self._perf_loop.call_later,
+                PERF_MIRROR_INTERVAL,
+                self._write_performance_mirror,
+            )
+
+    def _write_performance_mirror(self) -> None:
+        self._perf_mirror_scheduled = False
+        report = json.loads(json.dumps(self.get_performance_report()))
+        try:
+            ymap = self._sessionYDoc.get_map("performance")
+            with self._sessionYDoc.begin_transaction() as t:
+                for key, value in report.items():
+                    ymap.set(t, key, value)
+        except Exception:
+            # The document cannot be modified while its observers run
+            pass
+
+    def get_event_metrics(self) -> Dict:
+        """Get the metrics of the processing of the document events
+
+        Returns:
+            Dict: See `glue_events.EventScheduler.metrics`
+        """
+        return self._event_scheduler.metrics
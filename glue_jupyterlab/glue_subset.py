@@ -0,0 +1,246 @@
+import pickle
+from collections import OrderedDict
+from functools import partial, reduce
+from typing import Callable, Hashable, Optional, Tuple
+
+import numpy as np
+from glue.core.data import Data
+from glue.core.exceptions import IncompatibleAttribute
+from glue.core.subset import (
+    AndState,
+    InequalitySubsetState,
+    InvertState,
+    MultiOrState,
+    OrState,
+    RangeSubsetState,
+    RoiSubsetState,
+    SubsetState,
+    XorState,
+)
+
+# Default bound of the memory used by the packed subset masks
+DEFAULT_SUBSET_MASK_CACHE_SIZE = 256 << 20
+
+# Bitwise operations combining the packed masks of the compound subsets
+COMPOSITE_OPERATORS = {
+    AndState: np.bitwise_and,
+    OrState: np.bitwise_or,
+    XorState: np.bitwise_xor,
+}
+
+
+def data_version(data: Data) -> Tuple:
+    """Get the version of the values of a dataset
+
+    Args:
+        data (Data): The dataset
+
+    Returns:
+        Tuple: The arrays of the main components, which are replaced
+        (and not modified in place) when the dataset is updated
+    """
+    return tuple(
+        getattr(data.get_component(cid), "_data", None) for cid in data.main_components
+    )
+
+
+def links_version(data: Data) -> Tuple:
+    """Get the version of the links of a dataset
+
+    Args:
+        data (Data): The dataset
+
+    Returns:
+        Tuple: The components derived from the other datasets through links,
+        which are replaced by glue when the links of the data collection
+        change
+    """
+    return (getattr(data, "_externally_derivable_components", None),)
+
+
+def state_key(subset_state: SubsetState) -> Tuple[Hashable, Tuple]:
+    """Get the cache key of the mask of a subset state
+
+    The key of the common subset states is computed from their definition,
+    so that their copies (the compound subset states copy their operands)
+    share the same mask. The other subset states are identified by identity.
+
+    Args:
+        subset_state (SubsetState): The subset state
+
+    Returns:
+        Tuple[Hashable, Tuple]: The key, and the objects whose identity is
+        part of the key
+    """
+    state_type = type(subset_state)
+    operands = None
+    if state_type in COMPOSITE_OPERATORS:
+        operands = [subset_state.state1, subset_state.state2]
+    elif state_type is InvertState:
+        operands = [subset_state.state1]
+    elif state_type is MultiOrState:
+        operands = subset_state.states
+    if operands is not None:
+        keys, references = zip(*[state_key(operand) for operand in operands])
+        return (state_type,) + keys, sum(references, ())
+
+    if state_type is InequalitySubsetState:
+        left, right = subset_state.left, subset_state.right
+        return (state_type, id(left), id(right), subset_state.operator), (left, right)
+    if state_type is RangeSubsetState:
+        att = subset_state.att
+        return (state_type, subset_state.lo, subset_state.hi, id(att)), (att,)
+    if state_type is RoiSubsetState:
+        references = (subset_state.xatt, subset_state.yatt, subset_state.pretransform)
+        try:
+            # The ROIs are moved in place
+            roi = pickle.dumps(subset_state.roi)
+        except Exception:
+            pass
+        else:
+            return (state_type, roi) + tuple(map(id, references)), references
+
+    return (state_type, id(subset_state)), (subset_state,)
+
+
+class SubsetMaskCache:
+    """Masks of the subsets, computed once and shared by all the viewers
+
+    The masks are stored as packed bitsets (one bit per element) keyed by
+    subset state (see `state_key`) and dataset, and dropped when the values
+    or the links of the dataset are replaced. The masks of the compound
+    subsets (and, or, xor, invert) are combined from the cached masks of
+    their operands with bitwise operations. The cache is bounded by the
+    memory of the bitsets, the least recently used being dropped first.
+
+    The datasets are connected to the cache with `install`, so that all the
+    masks computed by glue (subset layers, histograms, image buffers...)
+    go through it.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_SUBSET_MASK_CACHE_SIZE):
+        self._max_size = max_size
+        self._entries: "OrderedDict[Hashable, Tuple[Tuple, np.ndarray]]" = OrderedDict()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        """Memory (in bytes) used by the cached bitsets"""
+        return self._size
+
+    def install(self, data: Data) -> None:
+        """Compute the masks of a dataset with this cache
+
+        Args:
+            data (Data): The dataset
+        """
+        if isinstance(data, Data) and "get_mask" not in vars(data):
+            # The method of the dataset class computes the masks the cache
+            # cannot, see `get_mask`
+            data.get_mask = partial(self.get_mask, data, fallback=data.get_mask)
+
+    def get_mask(
+        self,
+        data: Data,
+        subset_state: SubsetState,
+        view: Optional[any] = None,
+        fallback: Optional[Callable] = None,
+    ) -> np.ndarray:
+        """Get the boolean mask of a subset, same as `Data.get_mask`
+
+        Args:
+            data (Data): The dataset
+            subset_state (SubsetState): The subset state
+            view (Optional[any]): The view on the mask, any valid NumPy index
+            fallback (Optional[Callable]): The `get_mask` method of the
+            dataset, `Data.get_mask` by default
+
+        Returns:
+            np.ndarray: The mask
+        """
+        try:
+            packed = self.packed_mask(data, subset_state)
+        except IncompatibleAttribute:
+            # The subsets defined through key joins are computed by glue
+            if fallback is None:
+                fallback = partial(Data.get_mask, data)
+            return fallback(subset_state, view=view)
+
+        if view is not None and data.ndim == 1:
+            index = np.asarray(view) if isinstance(view, list) else view
+            if isinstance(index, np.ndarray) and index.dtype.kind in "iu":
+                # Only read the bits of the requested elements
+                index = np.where(index < 0, index + data.size, index)
+                return ((packed[index >> 3] >> (7 - (index & 7))) & 1).astype(bool)
+
+        mask = np.unpackbits(packed, count=data.size).view(bool).reshape(data.shape)
+        return mask if view is None else mask[view]
+
+    def packed_mask(self, data: Data, subset_state: SubsetState) -> np.ndarray:
+        """Get the packed bitset of a subset
+
+        Args:
+            data (Data): The dataset
+            subset_state (SubsetState): The subset state
+
+        Returns:
+            np.ndarray: The mask of the flattened dataset, packed with
+            `np.packbits`
+        """
+        # The objects referenced by the key are compared by identity, see `_get`
+        key, references = state_key(subset_state)
+        key = (data.uuid, key)
+        dependencies = references + data_version(data) + links_version(data)
+        packed = self._get(key, dependencies)
+        if packed is not None:
+            return packed
+
+        state_type = type(subset_state)
+        if state_type in COMPOSITE_OPERATORS:
+            packed = COMPOSITE_OPERATORS[state_type](
+                self.packed_mask(data, subset_state.state1),
+                self.packed_mask(data, subset_state.state2),
+            )
+        elif state_type is InvertState:
+            # The padding bits are ignored when unpacking
+            packed = np.invert(self.packed_mask(data, subset_state.state1))
+        elif state_type is MultiOrState:
+            packed = reduce(
+                np.bitwise_or,
+                [self.packed_mask(data, state) for state in subset_state.states],
+            )
+        else:
+            mask = subset_state.to_mask(data)
+            packed = np.packbits(np.asarray(mask, dtype=bool).ravel())
+
+        self._put(key, dependencies, packed)
+        return packed
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._size = 0
+
+    def _get(self, key: Hashable, dependencies: Tuple) -> Optional[np.ndarray]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        cached_dependencies, packed = entry
+        if len(cached_dependencies) != len(dependencies) or any(
+            a is not b for a, b in zip(cached_dependencies, dependencies)
+        ):
+            return None
+        self._entries.move_to_end(key)
+        return packed
+
+    def _put(self, key: Hashable, dependencies: Tuple, packed: np.ndarray) -> None:
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= previous[1].nbytes
+        self._entries[key] = (dependencies, packed)
+        self._size += packed.nbytes
+        while self._size > self._max_size and len(self._entries) > 1:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._size -= evicted.nbytes
@@ -0,0 +1,280 @@
+import json
+import operator
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from glue.core.data import Data
+from glue.core.exceptions import IncompatibleAttribute
+from glue_jupyter.table.viewer import TableGlue, TableViewer
+from glue_jupyter.view import IPyWidgetView
+
+from .glue_subset import data_version
+
+FILTER_OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+# Number of (sort, filters) row orders kept by a pager
+DEFAULT_ORDER_CACHE_SIZE = 8
+
+
+class TablePager:
+    """Kernel-side paging of a glue dataset, sorted and filtered with NumPy
+
+    The sorting permutation of each column is computed once and cached, as
+    well as the row orders of the last sort and filter combinations, so
+    that fetching a page only reads the rows of the page. The caches are
+    keyed by the components of the columns and the version of the dataset
+    (see `glue_subset.data_version`), the derived columns are not computed
+    again while the dataset is unchanged.
+    """
+
+    def __init__(self, data: Data, order_cache_size: int = DEFAULT_ORDER_CACHE_SIZE):
+        self.data = data
+        self._order_cache_size = order_cache_size
+        self._sorted: Dict[str, Tuple[Tuple, np.ndarray]] = {}
+        self._orders: "OrderedDict[str, Tuple[Tuple, np.ndarray]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        if self.data is None or len(self.data.shape) == 0:
+            return 0
+        return self.data.shape[0]
+
+    def columns(self) -> List[str]:
+        """Names of the columns of the table"""
+        return [
+            str(cid) for cid in self.data.main_components + self.data.derived_components
+        ]
+
+    def sorted_indices(self, column: str, descending: bool = False) -> np.ndarray:
+        """Get the permutation sorting the table by a column
+
+        Args:
+            column (str): Name of the column
+            descending (bool, optional): Sort in descending order
+
+        Returns:
+            np.ndarray: The row indices in sorted order
+        """
+        version = self._version([column])
+        cached = self._sorted.get(column)
+        if cached is None or not _same_version(cached[0], version):
+            values = self._values(column)
+            cached = (version, np.argsort(values, kind="stable"))
+            self._sorted[column] = cached
+        indices = cached[1]
+        return indices[::-1] if descending else indices
+
+    def filter_mask(self, filters: List[Dict]) -> np.ndarray:
+        """Compute the rows matching all the filters
+
+        Args:
+            filters (List[Dict]): The filters, each one a dict with the
+            "column" name, the "op" (one of `FILTER_OPERATORS`) and the
+            "value" to compare the column with
+
+        Returns:
+            np.ndarray: The boolean mask of the rows
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for spec in filters:
+            op = FILTER_OPERATORS.get(spec.get("op", "=="))
+            if op is None:
+                raise ValueError(f"Unknown filter operator {spec.get('op')}")
+            values = self._values(spec["column"])
+            mask &= np.asarray(op(values, spec["value"]), dtype=bool)
+        return mask
+
+    def order(
+        self,
+        sort_by: Optional[str] = None,
+        descending: bool = False,
+        filters: Optional[List[Dict]] = None,
+    ) -> np.ndarray:
+        """Get the indices of the rows to display, in display order
+
+        Args:
+            sort_by (Optional[str]): Column to sort by
+            descending (bool, optional): Sort in descending order
+            filters (Optional[List[Dict]]): The filters, see `filter_mask`
+
+        Returns:
+            np.ndarray: The row indices
+        """
+        if not sort_by and not filters:
+            return np.arange(len(self))
+        if not filters:
+            return self.sorted_indices(sort_by, descending)
+
+        key = json.dumps([sort_by, descending, filters], sort_keys=True, default=str)
+        columns = [spec["column"] for spec in filters]
+        if sort_by:
+            columns.append(sort_by)
+        version = self._version(columns)
+
+        cached = self._orders.get(key)
+        if cached is not None and _same_version(cached[0], version):
+            self._orders.move_to_end(key)
+            return cached[1]
+
+        mask = self.filter_mask(filters)
+        if sort_by:
+            indices = self.sorted_indices(sort_by, descending)
+            order = indices[mask[indices]]
+        else:
+            order = np.flatnonzero(mask)
+
+        self._orders[key] = (version, order)
+        while len(self._orders) > self._order_cache_size:
+            self._orders.popitem(last=False)
+        return order
+
+    def page(
+        self,
+        start: int,
+        count: int,
+        sort_by: Optional[str] = None,
+        descending: bool = False,
+        filters: Optional[List[Dict]] = None,
+        columns: Optional[List[str]] = None,
+    ) -> Dict:
+        """Get a window of rows of the table
+
+        Args:
+            start (int): Position of the first row in the sorted and
+            filtered table
+            count (int): Number of rows
+            sort_by (Optional[str]): Column to sort by
+            descending (bool, optional): Sort in descending order
+            filters (Optional[List[Dict]]): The filters, see `filter_mask`
+            columns (Optional[List[str]]): The columns to return, all
+            by default
+
+        Returns:
+            Dict: The number of rows matching the filters ("total"), the
+            position of the first row ("start"), the column names ("columns")
+            and the rows ("rows") with their row index ("__row__")
+        """
+        order = self.order(sort_by, descending, filters)
+        indices = order[max(start, 0) : max(start, 0) + max(count, 0)]
+        columns = self.columns() if columns is None else columns
+
+        values = {column: self._values(column)[indices] for column in columns}
+        rows = []
+        for i, row in enumerate(indices):
+            item = {"__row__": int(row)}
+            for column in columns:
+                item[column] = _to_json(values[column][i])
+            rows.append(item)
+
+        return {
+            "total": len(order),
+            "start": start,
+            "columns": columns,
+            "rows": rows,
+        }
+
+    def _values(self, column: str) -> np.ndarray:
+        return self.data[self._component_id(column)]
+
+    def _component_id(self, column: str):
+        for cid in self.data.main_components + self.data.derived_components:
+            if str(cid) == column:
+                return cid
+        raise IncompatibleAttribute(column)
+
+    def _version(self, columns: List[str]) -> Tuple:
+        """The components of the columns and the version of the dataset,
+        replaced when the values of a column may have changed"""
+        components = tuple(
+            self.data.get_component(self._component_id(column)) for column in columns
+        )
+        return components + data_version(self.data)
+
+
+def _same_version(version: Tuple, other: Tuple) -> bool:
+    return len(version) == len(other) and all(map(operator.is_, version, other))
+
+
+def _to_json(value: Any) -> Any:
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+class PagedTableGlue(TableGlue):
+    """The glue-jupyter table widget, sorting with the cached permutations
+    of a `TablePager` and computing the subset masks of the displayed rows
+    only"""
+
+    _pager: Optional[TablePager] = None
+
+    @property
+    def pager(self) -> Optional[TablePager]:
+        if self.data is None:
+            return None
+        if self._pager is None or self._pager.data is not self.data:
+            self._pager = TablePager(self.data)
+        return self._pager
+
+    def _get_sorted_indices(self):
+        sort_by = self.options.get("sortBy")
+        sort_column = sort_by[0] if isinstance(sort_by, list) and sort_by else sort_by
+        if not sort_column or sort_column not in [
+            str(c) for c in self.get_visible_components()
+        ]:
+            return np.arange(len(self))
+
+        sort_desc = self.options.get("sortDesc", self.options.get("descending", False))
+        if isinstance(sort_desc, list):
+            sort_desc = sort_desc[0] if sort_desc else False
+        return self.pager.sorted_indices(sort_column, bool(sort_desc))
+
+    def _get_items(self):
+        if self.data is None:
+            return []
+        page = self.options["page"] - 1
+        page_size = self.options["itemsPerPage"]
+        i1 = page * page_size
+        i2 = min(len(self), (page + 1) * page_size)
+        page_indices = self._get_sorted_indices()[i1:i2]
+
+        masks = {}
+        for subset in self.data.subsets:
+            try:
+                masks[subset.label] = subset.to_mask(view=page_indices)
+            except IncompatibleAttribute:
+                masks[subset.label] = np.zeros(len(page_indices), dtype=bool)
+
+        components = self.get_visible_components()
+        values = {str(c): self.data[c][page_indices] for c in components}
+        items = []
+        for i, orig_idx in enumerate(page_indices):
+            item = {"__row__": int(orig_idx)}
+            for selection in self.selections:
+                item[selection] = bool(masks[selection][i])
+            for component in components:
+                item[str(component)] = self.format(values[str(component)][i])
+            items.append(item)
+        return items
+
+
+class PagedTableViewer(TableViewer):
+    """The glue-jupyter table viewer, using `PagedTableGlue`"""
+
+    def __init__(self, session, state=None):
+        IPyWidgetView.__init__(self, session, state=state)
+        self.widget_table = PagedTableGlue(
+            data=None, apply_filter=self.apply_filter, state=self.state
+        )
+        self.create_layout()
+        self.state.add_callback("hidden_components", self._update_hidden)
+        self.state.add_callback("editable_components", self._update_editable)
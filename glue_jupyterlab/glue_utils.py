@@ -1,13 +1,154 @@
 import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import partial
+from importlib import import_module
 from inspect import getfullargspec
-from typing import Dict, List
+from typing import Dict, Iterable, Iterator, List, Optional, Set
 
+from echo import delay_callback
 from glue.config import link_function, link_helper
-from glue.main import load_plugins
 from IPython.display import display
 from ipywidgets import HTML
 
-load_plugins()
+# Loading time (in seconds) of the glue plugins loaded so far.
+PLUGIN_LOAD_TIMES: Dict[str, float] = {}
+
+
+def ensure_plugins(references: Optional[Iterable[str]] = None) -> None:
+    """Load the glue plugins on demand.
+
+    Same as `glue.main.load_plugins`, but only the plugins providing the
+    given objects are loaded.
+
+    Args:
+        references (Optional[Iterable[str]]): Fully qualified names of the
+        objects needed (link functions, viewers, loaders...), only the plugins
+        providing them are loaded. All the plugins are loaded if None.
+    """
+    from glue._plugin_helpers import PluginConfig, iter_plugin_entry_points
+
+    # glue has no public API to load some of the plugins only (the other ones
+    # are imported as well by `load_plugins(plugins_to_load=...)`), the
+    # registries of the loaded plugins are updated the same way it does.
+    from glue.main import REQUIRED_PLUGINS, _installed_plugins, _loaded_plugins
+
+    if references is not None:
+        references = set(references)
+
+    config = None
+    loaded = False
+    for item in iter_plugin_entry_points():
+        if item.module in _loaded_plugins:
+            continue
+        if references is not None and not any(
+            ref == item.module or ref.startswith(f"{item.module}.")
+            for ref in references
+        ):
+            continue
+
+        if config is None:
+            config = PluginConfig.load()
+        _installed_plugins.add(item.name)
+        if not config.plugins[item.name]:
+            continue
+
+        start = time.perf_counter()
+        try:
+            module = import_module(item.module)
+            getattr(module, item.attr)()
+        except Exception as e:
+            if item.module in REQUIRED_PLUGINS:
+                raise
+            print(f"The glue plugin {item.name} could not be loaded\n{e.args}")
+        else:
+            _loaded_plugins.add(item.module)
+            loaded = True
+        PLUGIN_LOAD_TIMES[item.name] = time.perf_counter() - start
+
+    if config is not None:
+        # The plugins seen for the first time are added to the configuration
+        try:
+            config.save()
+        except Exception as e:
+            print(f"The glue plugin configuration could not be saved\n{e.args}")
+
+    if loaded:
+        # Some plugins add settings, which are read once they are loaded
+        from glue._settings_helpers import load_settings
+
+        load_settings()
+
+
+@contextmanager
+def deferred_plugins() -> Iterator[None]:
+    """Create glue applications without loading all the glue plugins.
+
+    `JupyterApplication` loads all the installed plugins, only the plugins
+    required by glue are loaded instead, the other ones being loaded on
+    demand with `ensure_plugins`.
+    """
+    import glue_jupyter.app
+    from glue.main import REQUIRED_PLUGINS
+
+    load_plugins = glue_jupyter.app.load_plugins
+    glue_jupyter.app.load_plugins = partial(ensure_plugins, REQUIRED_PLUGINS)
+    try:
+        yield
+    finally:
+        glue_jupyter.app.load_plugins = load_plugins
+
+
+def get_references(entries: Iterable[Dict]) -> Set[str]:
+    """Get the fully qualified names referenced by entries of a session file
+
+    Args:
+        entries (Iterable[Dict]): The entries of the session file
+
+    Returns:
+        Set[str]: The types and the functions (link functions, data
+        factories...) referenced
+    """
+    references = set()
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        references.add(entry.get("_type", ""))
+        for value in entry.values():
+            if isinstance(value, dict) and "function" in value:
+                references.add(value["function"])
+    return references
+
+
+def update_state(state, values: Dict) -> None:
+    """Set the values of a glue state in a few batches of delayed callbacks.
+
+    Same as `State.update_from_dict`, the values being grouped by update
+    priority so that the callbacks run once per group instead of once per
+    value, but the values which cannot be set are ignored.
+
+    Args:
+        state (State): The glue state (of a viewer or a layer)
+        values (Dict): The values to set
+    """
+    groups = defaultdict(list)
+    for key in values:
+        if state.is_callback_property(key):
+            groups[state._update_priority(key)].append(key)
+        else:
+            try:
+                setattr(state, key, values[key])
+            except Exception:
+                pass
+
+    for priority in sorted(groups, reverse=True):
+        with delay_callback(state, *groups[priority]):
+            for key in groups[priority]:
+                try:
+                    setattr(state, key, values[key])
+                except Exception:
+                    pass
 
 
 class ErrorWidget:
@@ -48,6 +189,7 @@ def get_function_info(function_or_helper):
 
 
 def get_advanced_links():
+    ensure_plugins()
     advanced_links: Dict[str, List] = {}
 
     for function in link_function.members:
@@ -1,15 +1,43 @@
 import json
 from copy import deepcopy
-from typing import Dict, List, Any, Callable, Optional
+from typing import Dict, Iterator, List, Any, Callable, Optional, Set, Tuple
 from functools import partial
 from jupyter_ydoc.ybasedoc import YBaseDoc
 import y_py as Y
 
+from .glue_perf import PERF
+
 COMPONENT_LINK_TYPE = "glue.core.component_link.ComponentLink"
+COMPONENT_ID_TYPE = "glue.core.component_id.ComponentID"
+PIXEL_COMPONENT_ID_TYPE = "glue.core.component_id.PixelComponentID"
+GROUPED_SUBSET_TYPE = "glue.core.subset_group.GroupedSubset"
 IDENTITY_LINK_FUNCTION = "glue.core.link_helpers.identity"
 
+ROOT_MAPS = ["contents", "attributes", "dataset", "links", "tabs"]
+
+
+def _normalize(value: Any) -> Any:
+    """Convert a value read from a Y structure to the value that
+    ``json.loads(ymap.to_json())`` would produce.
+
+    Y structures return every number as a float, while their JSON
+    export writes integral numbers as integers.
+    """
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_normalize(v) for v in value]
+    if hasattr(value, "to_json"):
+        return json.loads(value.to_json())
+    return value
+
 
 class YGlue(YBaseDoc):
+    # Write the session file without indentation, for very large sessions.
+    compact = False
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._yprivate_messages = self._ydoc.get_map("private_messages")
@@ -19,9 +47,23 @@ class YGlue(YBaseDoc):
         self._ydataset = self._ydoc.get_map("dataset")
         self._ylinks = self._ydoc.get_map("links")
         self._ytabs = self._ydoc.get_map("tabs")
+        # Kernel-side loading status, not saved in the session file.
+        self._yloading = self._ydoc.get_map("loading")
 
         self._data_collection_name = ""
 
+        # Materialized views of the root maps, parsed on first access and
+        # then patched from the Y events.
+        self._cache: Dict[str, Dict] = {}
+        self._cache_subscriptions: Dict[str, int] = {}
+        for name in ROOT_MAPS:
+            ymap = self._get_ymap(name)
+            if name == "tabs":
+                callback = ymap.observe_deep(partial(self._patch_deep_cache, name))
+            else:
+                callback = ymap.observe(partial(self._patch_cache, name))
+            self._cache_subscriptions[name] = callback
+
     @property
     def version(self) -> str:
         """
@@ -33,64 +75,187 @@ class YGlue(YBaseDoc):
 
     @property
     def contents(self) -> Dict:
-        return json.loads(self._ycontents.to_json())
+        return deepcopy(self.view("contents"))
 
     @property
     def attributes(self) -> Dict:
-        return json.loads(self._yattributes.to_json())
+        return deepcopy(self.view("attributes"))
 
     @property
     def dataset(self) -> Dict:
-        return json.loads(self._ydataset.to_json())
+        return deepcopy(self.view("dataset"))
 
     @property
     def links(self) -> Dict:
-        return json.loads(self._ylinks.to_json())
+        return deepcopy(self.view("links"))
 
     @property
     def tabs(self) -> Dict:
-        return json.loads(self._ytabs.to_json())
+        return deepcopy(self.view("tabs"))
+
+    def view(self, name: str) -> Dict:
+        """
+        Returns the cached content of a root map, without copying it.
+        The returned structure is shared and must not be mutated, use the
+        corresponding property to get a mutable copy.
+        :param name: The name of the root map (one of ``ROOT_MAPS``).
+        :return: The content of the map.
+        :rtype: Dict
+        """
+        cached = self._cache.get(name)
+        if cached is None:
+            cached = json.loads(self._get_ymap(name).to_json())
+            self._cache[name] = cached
+        return cached
+
+    def _get_ymap(self, name: str) -> Y.YMap:
+        return getattr(self, f"_y{name}")
+
+    def _patch_cache(self, name: str, event: Y.YMapEvent) -> None:
+        cached = self._cache.get(name)
+        if cached is None:
+            return
+        for key, change in event.keys.items():
+            if change["action"] == "delete":
+                cached.pop(key, None)
+            else:
+                cached[key] = _normalize(change["newValue"])
+
+    def _patch_deep_cache(self, name: str, events: List[Y.YMapEvent]) -> None:
+        cached = self._cache.get(name)
+        if cached is None:
+            return
+        ymap = self._get_ymap(name)
+        for event in events:
+            path = event.path()
+            if len(path) == 0:
+                self._patch_cache(name, event)
+                continue
+            # A nested map changed, only parse the top-level entry containing it.
+            key = path[0]
+            item = ymap.get(key)
+            if item is None:
+                cached.pop(key, None)
+            else:
+                cached[key] = _normalize(item)
 
+    @PERF.timed("ydoc.get")
     def get(self) -> str:
         """
         Returns the content of the document.
         :return: Document's content.
         :rtype: Any
         """
-        contents = json.loads(self._ycontents.to_json())
-        json.loads(self._yattributes.to_json())
-        dataset = json.loads(self._ydataset.to_json())
-        links = json.loads(self._ylinks.to_json())
-        tabs = json.loads(self._ytabs.to_json())
-        contents.setdefault("__main__", {})
+        return "".join(self.iter_source(compact=self.compact))
 
-        tab_names = sorted(list(tabs.keys()))
-        contents["__main__"]["tab_names"] = tab_names
+    def iter_source(self, compact: bool = False) -> Iterator[str]:
+        """
+        Yields the content of the document by chunks, one per entry of the
+        session file, without building the merged content in memory.
+        :param compact: Whether to write compact JSON instead of the indented
+            output of ``json.dumps(..., indent=2, sort_keys=True)``.
+        :return: An iterator over the chunks of the document's content.
+        :rtype: Iterator[str]
+        """
+        contents = self.view("contents")
+        overrides, removed = self._get_contents_overrides(contents)
+        keys = sorted(
+            k
+            for k in set(contents) | set(overrides)
+            if k in overrides or k not in removed
+        )
+
+        if compact:
+            separator, key_separator, indent = ",", ":", None
+            start, end = "{", "}"
+        else:
+            separator, key_separator, indent = ",\n  ", ": ", 2
+            start, end = "{\n  ", "\n}"
+        if len(keys) == 0:
+            yield "{}"
+            return
+
+        yield start
+        for idx, key in enumerate(keys):
+            value = overrides[key] if key in overrides else contents[key]
+            dumped = json.dumps(
+                value,
+                indent=indent,
+                separators=(",", ":") if compact else None,
+                sort_keys=True,
+            )
+            if not compact:
+                dumped = dumped.replace("\n", "\n  ")
+            yield f"{separator if idx else ''}{json.dumps(key)}{key_separator}{dumped}"
+        yield end
+
+    def _get_contents_overrides(self, contents: Dict) -> Tuple[Dict, Set[str]]:
+        """
+        Computes the entries of the session file which differ from the
+        contents map, from the tabs, dataset and links maps.
+        :return: The new values of the modified entries, and the removed keys.
+        """
+        overrides: Dict[str, Any] = {}
+        removed: Set[str] = set()
+
+        def lookup(key: str) -> Any:
+            if key in overrides:
+                return overrides[key]
+            if key in removed:
+                return None
+            return contents.get(key)
+
+        def pop(key: Optional[str]) -> Dict:
+            value = lookup(key)
+            overrides.pop(key, None)
+            if key in contents:
+                removed.add(key)
+            return value if value is not None else {}
+
+        tabs = self.view("tabs")
+        main = dict(contents.get("__main__", {}))
+        overrides["__main__"] = main
 
-        contents["__main__"].setdefault("viewers", [])
+        tab_names = sorted(list(tabs.keys()))
+        main["tab_names"] = tab_names
 
-        contents["__main__"]["viewers"] = []
+        main["viewers"] = []
         for tab in tab_names:
             viewers = tabs.get(tab, {})
             viewer_names = sorted(list(viewers.keys()))
 
-            contents["__main__"]["viewers"].append(viewer_names)
+            main["viewers"].append(viewer_names)
             for viewer in viewer_names:
-                contents[viewer] = viewers[viewer]
+                overrides[viewer] = viewers[viewer]
 
         if self._data_collection_name:
+            dataset = self.view("dataset")
+            links = self.view("links")
             data_names = sorted(list(dataset.keys()))
             link_names = sorted(list(links.keys()))
 
-            contents[self._data_collection_name]["data"] = data_names
-            contents[self._data_collection_name]["links"] = link_names
+            data_collection = dict(lookup(self._data_collection_name))
+            data_collection["data"] = data_names
+            data_collection["links"] = link_names
+            overrides[self._data_collection_name] = data_collection
 
             for data_name in data_names:
-                contents[data_name] = dataset[data_name]
+                overrides[data_name] = dataset[data_name]
+
+            # Delete former links and attributes lists.
+            for link_name in link_names:
+                link = pop(link_name)
+                if link.get("_type", "") != COMPONENT_LINK_TYPE:
+                    pop(link.get("cids1", None))
+                    pop(link.get("cids2", None))
 
-            self.add_links_to_contents(links, contents)
-        return json.dumps(contents, indent=2, sort_keys=True)
+            for key, value in self._links_to_contents(links).items():
+                overrides[key] = value
+                removed.discard(key)
 
+        return overrides, removed
+
+    @PERF.timed("ydoc.set")
     def set(self, value: str) -> None:
         """
         Sets the content of the document.
@@ -101,12 +266,12 @@ class YGlue(YBaseDoc):
 
         tab_names: List[str] = contents.get("__main__", {}).get("tab_names", [])
         viewers = contents.get("__main__", {}).get("viewers", [])
-        tabs: Dict[str, Y.YMap] = {}
+        tabs: Dict[str, Dict] = {}
         for idx, tab in enumerate(tab_names):
-            items: Dict[str, Y.YMap] = {}
+            items: Dict[str, Dict] = {}
             for viewer in viewers[idx]:
                 items[viewer] = contents.get(viewer, {})
-            tabs[tab] = Y.YMap(items)
+            tabs[tab] = items
 
         self._data_collection_name: str = contents.get("__main__", {}).get("data", "")
         data_names: List[str] = []
@@ -124,12 +289,73 @@ class YGlue(YBaseDoc):
 
         links = self.extract_links_from_file(link_names, contents, dataset, attributes)
 
+        # Only apply the differences with the current state, so that the
+        # observers and the peers only receive what actually changed.
+        new_values = {
+            "contents": contents,
+            "attributes": attributes,
+            "dataset": dataset,
+            "links": links,
+        }
+        changes = {
+            name: self._diff(self.view(name), value)
+            for name, value in new_values.items()
+        }
+        tab_changes = self._diff_tabs(tabs)
+        if not any(changes.values()) and not tab_changes:
+            return
+
         with self._ydoc.begin_transaction() as t:
-            self._ycontents.update(t, contents.items())
-            self._yattributes.update(t, attributes.items())
-            self._ydataset.update(t, dataset.items())
-            self._ylinks.update(t, links.items())
-            self._ytabs.update(t, tabs.items())
+            for name, diff in changes.items():
+                if diff is not None:
+                    self._apply_diff(t, self._get_ymap(name), *diff)
+            for tab_name, diff in tab_changes.items():
+                if diff is None:
+                    self._ytabs.pop(t, tab_name)
+                elif isinstance(diff, Y.YMap):
+                    self._ytabs.set(t, tab_name, diff)
+                else:
+                    self._apply_diff(t, self._ytabs[tab_name], *diff)
+
+    @staticmethod
+    def _diff(current: Dict, new: Dict) -> Optional[Tuple[Dict, List[str]]]:
+        """
+        Computes the entries to set and the keys to delete to go from the
+        current content of a map to the new one, None if they are equal.
+        The values of the maps are plain JSON values, which Yjs replaces as a
+        whole: the diff stops at the keys of the map (the tabs, whose viewers
+        are nested maps, are diffed one level deeper by ``_diff_tabs``).
+        """
+        updated = {k: v for k, v in new.items() if k not in current or current[k] != v}
+        deleted = [k for k in current if k not in new]
+        if not updated and not deleted:
+            return None
+        return updated, deleted
+
+    def _diff_tabs(self, tabs: Dict[str, Dict]) -> Dict:
+        """
+        Computes the changes of the tabs map. A removed tab maps to None, a new
+        tab to its ``Y.YMap`` and a modified tab to the diff of its viewers.
+        """
+        current = self.view("tabs")
+        changes = {k: None for k in current if k not in tabs}
+        for tab_name, items in tabs.items():
+            if not isinstance(self._ytabs.get(tab_name), Y.YMap):
+                changes[tab_name] = Y.YMap(items)
+                continue
+            diff = self._diff(current.get(tab_name, {}), items)
+            if diff is not None:
+                changes[tab_name] = diff
+        return changes
+
+    @staticmethod
+    def _apply_diff(
+        t: Y.YTransaction, ymap: Y.YMap, updated: Dict, deleted: List[str]
+    ) -> None:
+        for key in deleted:
+            ymap.pop(t, key)
+        if updated:
+            ymap.update(t, updated.items())
 
     def observe(self, callback: Callable[[str, Any], None]):
         self.unobserve()
@@ -142,7 +368,7 @@ class YGlue(YBaseDoc):
         self._subscriptions[self._ycontents] = self._ycontents.observe(
             partial(callback, "contents")
         )
-        self._subscriptions[self._yattributes] = self._ycontents.observe(
+        self._subscriptions[self._yattributes] = self._yattributes.observe(
             partial(callback, "attributes")
         )
         self._subscriptions[self._ydataset] = self._ydataset.observe(
@@ -158,13 +384,33 @@ class YGlue(YBaseDoc):
             self._yprivate_messages.observe_deep(partial(callback, "private_messages"))
         )
 
+    def add_data(
+        self, contents: Dict[str, Dict], dataset: Dict[str, Dict], attributes: Dict
+    ) -> None:
+        """
+        Inserts the serialized objects of new datasets in one transaction,
+        leaving the other entries of the document untouched.
+        :param contents: The new (or updated) entries of the contents.
+        :param dataset: The new datasets.
+        :param attributes: The attributes of the new datasets.
+        """
+        with self._ydoc.begin_transaction() as t:
+            self._ycontents.update(t, contents.items())
+            self._ydataset.update(t, dataset.items())
+            self._yattributes.update(t, attributes.items())
+
+    def set_loading_progress(self, progress: Dict) -> None:
+        with self._ydoc.begin_transaction() as t:
+            self._yloading.update(t, progress.items())
+
     def get_tab_names(self) -> List[str]:
         return list(self._ytabs.keys())
 
     def get_tab_data(self, tab_name: str) -> Optional[Dict]:
-        tab = self._ytabs.get(tab_name)
-        if tab is not None:
-            return json.loads(tab.to_json())
+        """
+        Returns the cached content of a tab, which must not be mutated.
+        """
+        return self.view("tabs").get(tab_name)
 
     def remove_tab_viewer(self, tab_name: str, viewer_id: str) -> None:
         tab = self._ytabs.get(tab_name)
@@ -180,26 +426,20 @@ class YGlue(YBaseDoc):
         attributes: Dict[str, Dict],
     ) -> Dict[str, Dict]:
         links: Dict[str, Dict] = {}
+
+        # Index the dataset owning each attribute, the first one wins.
+        owners: Dict[str, str] = {}
+        for data_name, data in dataset.items():
+            for attribute in data.get("primary_owner", []):
+                owners.setdefault(attribute, data_name)
+
         for link_name in link_names:
-            link: Dict = deepcopy(contents.get(link_name, {}))
+            # The link is only read, a shallow copy is enough to pop its keys.
+            link: Dict = dict(contents.get(link_name, {}))
             uniform_link = {"_type": link.pop("_type")}
             if uniform_link["_type"] == COMPONENT_LINK_TYPE:
-                uniform_link["data1"] = next(
-                    (
-                        k
-                        for k, v in dataset.items()
-                        if link["frm"][0] in v["primary_owner"]
-                    ),
-                    None,
-                )
-                uniform_link["data2"] = next(
-                    (
-                        k
-                        for k, v in dataset.items()
-                        if link["to"][0] in v["primary_owner"]
-                    ),
-                    None,
-                )
+                uniform_link["data1"] = owners.get(link["frm"][0])
+                uniform_link["data2"] = owners.get(link["to"][0])
                 uniform_link["cids1"] = link.pop("frm")
                 uniform_link["cids2"] = link.pop("to")
                 for i in [1, 2]:
@@ -231,11 +471,21 @@ class YGlue(YBaseDoc):
             if link.get("_type", "") != COMPONENT_LINK_TYPE:
                 contents.pop(link.get("cids1", None), None)
                 contents.pop(link.get("cids2", None), None)
-        contents[self._data_collection_name]["links"] = []
 
         # Create the new links and attribute lists if necessary.
+        contents.update(self._links_to_contents(links))
+        contents[self._data_collection_name]["links"] = sorted(links.keys())
+
+    @staticmethod
+    def _links_to_contents(links: Dict[str, Dict]) -> Dict[str, Dict]:
+        """
+        Converts the links to their representation in the session file,
+        with the attribute lists of the advanced links.
+        """
+        entries: Dict[str, Dict] = {}
         lists_count = -1
         for link_name, link in links.items():
+            link = dict(link)
             if link["_type"] == COMPONENT_LINK_TYPE:
                 link["frm"] = link.pop("cids1", [])
                 link["to"] = link.pop("cids2", [])
@@ -251,8 +501,7 @@ class YGlue(YBaseDoc):
                         "_type": "builtins.list",
                         "contents": link.pop(f"cids{i}", []),
                     }
-                    contents[list_name] = attr_list
+                    entries[list_name] = attr_list
                     link[f"cids{i}"] = list_name
-            contents[link_name] = link
-            contents[self._data_collection_name]["links"].append(link_name)
-        contents[self._data_collection_name]["links"].sort()
+            entries[link_name] = link
+        return entries
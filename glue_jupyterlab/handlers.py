@@ -1,4 +1,7 @@
+import hashlib
 import json
+from functools import lru_cache
+from typing import Tuple
 
 from jupyter_server.base.handlers import APIHandler
 from jupyter_server.utils import url_path_join
@@ -9,10 +12,50 @@ from .glue_utils import get_advanced_links
 """The handler to get the advanced links."""
 
 
+@lru_cache(maxsize=1)
+def get_advanced_links_payload() -> Tuple[str, str]:
+    """Compute the response body of the advanced links once, with its ETag
+
+    All the glue plugins are loaded to list the links, the server never
+    loads other plugins afterwards: the body is kept for the lifetime of the
+    server.
+    """
+    body = json.dumps({"data": get_advanced_links()})
+    etag = f'"{hashlib.sha1(body.encode()).hexdigest()}"'
+    return body, etag
+
+
 class AdvancedLinkHandler(APIHandler):
     @tornado.web.authenticated
     def get(self):
-        self.finish(json.dumps({"data": get_advanced_links()}))
+        body, etag = get_advanced_links_payload()
+        # Clients must revalidate, which is answered with a 304 while the
+        # links did not change.
+        self.set_header("Cache-Control", "no-cache")
+        self.set_header("Etag", etag)
+        if self.check_etag_header():
+            self.set_status(304)
+            self.finish()
+            return
+        self.finish(body)
+
+
+class WarmKernelHandler(APIHandler):
+    """Hand over a kernel of the pool to a glue session being opened, see
+    `kernel_pool.KernelPool`"""
+
+    @tornado.web.authenticated
+    async def post(self):
+        path = self.get_json_body().get("path")
+        if not isinstance(path, str):
+            raise tornado.web.HTTPError(400, "Missing session path")
+
+        pool = self.settings.get("glue_jupyterlab_kernel_pool")
+        kernel = None
+        # An opened session keeps its kernel
+        if pool is not None and not await self.session_manager.session_exists(path):
+            kernel = pool.take(path)
+        self.finish(json.dumps(kernel or {"kernel_id": None, "directory": None}))
 
 
 def setup_handlers(web_app):
@@ -20,5 +63,9 @@ def setup_handlers(web_app):
 
     base_url = web_app.settings["base_url"]
     route_pattern = url_path_join(base_url, "glue-jupyterlab", "advanced-links")
-    handlers = [(route_pattern, AdvancedLinkHandler)]
+    warm_kernel_pattern = url_path_join(base_url, "glue-jupyterlab", "warm-kernel")
+    handlers = [
+        (route_pattern, AdvancedLinkHandler),
+        (warm_kernel_pattern, WarmKernelHandler),
+    ]
     web_app.add_handlers(host_pattern, handlers)
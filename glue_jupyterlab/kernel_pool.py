@@ -0,0 +1,249 @@
+import asyncio
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from jupyter_core.paths import jupyter_data_dir
+from jupyter_core.utils import ensure_async
+from tornado.ioloop import IOLoop
+
+# Set this environment variable to a number of kernels to keep ready for the
+# glue sessions, the pool is disabled by default.
+KERNEL_POOL_SIZE_ENV = "GLUE_JUPYTERLAB_KERNEL_POOL"
+
+# Set this environment variable to a number of recently opened session files
+# whose datasets are read in the kernels of the pool.
+PRELOAD_RECENT_ENV = "GLUE_JUPYTERLAB_PRELOAD_RECENT"
+
+# Number of recently opened session files remembered
+MAX_RECENT = 10
+
+# Time (in seconds) to wait for a new kernel to answer
+KERNEL_READY_TIMEOUT = 60
+
+
+class KernelPool:
+    """Kernels with glue and glue-jupyter already imported, handed over to
+    the glue sessions when they are opened
+
+    Some kernels are prepared for the recently opened session files: the
+    glue plugins used by the session are loaded and its datasets are read
+    (see `glue_prewarm.prewarm`), and the kernel runs in the directory of the
+    session. The other ones only have the modules imported. A new kernel is
+    started each time one is handed over. The datasets read for another
+    session are dropped from a kernel handed over, not to be kept in memory
+    for its whole life.
+    """
+
+    def __init__(
+        self,
+        kernel_manager,
+        root_dir: str,
+        size: int,
+        preload_recent: int = 0,
+        recent_file: Optional[str] = None,
+        kernel_name: Optional[str] = None,
+        log=None,
+    ):
+        self._kernel_manager = kernel_manager
+        self._root_dir = Path(root_dir).resolve()
+        self._size = size
+        self._preload_recent = preload_recent
+        self._recent_file = Path(
+            recent_file
+            or Path(jupyter_data_dir()) / "glue_jupyterlab" / "recent_sessions.json"
+        )
+        self._kernel_name = kernel_name
+        self._log = log
+        # The kernels of the pool, with the session file they are prepared
+        # for ("path", None for the other ones) and the task preparing them
+        self._kernels: List[Dict] = []
+        self._recent = self._read_recent()
+        self._fill_task: Optional[asyncio.Task] = None
+        # The tasks dropping the datasets of the kernels handed over to
+        # another session than the one they are prepared for
+        self._release_tasks: Set[asyncio.Future] = set()
+
+    @property
+    def recent(self) -> List[str]:
+        """Session files opened recently, the most recent first"""
+        return list(self._recent)
+
+    @property
+    def kernels(self) -> List[Dict]:
+        return [
+            {"id": kernel["id"], "path": kernel["path"]} for kernel in self._kernels
+        ]
+
+    def start(self) -> None:
+        """Start the missing kernels in the background"""
+        if self._fill_task is None or self._fill_task.done():
+            self._fill_task = asyncio.ensure_future(self.fill())
+
+    async def fill(self) -> None:
+        """Start the missing kernels"""
+        self._kernels = [
+            kernel for kernel in self._kernels if kernel["id"] in self._kernel_manager
+        ]
+        while len(self._kernels) < self._size:
+            try:
+                self._kernels.append(await self._start_kernel(self._next_path()))
+            except Exception as e:
+                self._log_warning(
+                    f"Could not start a kernel for the glue sessions: {e}"
+                )
+                return
+
+    async def wait_ready(self) -> None:
+        """Wait for the kernels of the pool to be prepared, and for the
+        kernels handed over to be released"""
+        if self._fill_task is not None:
+            await self._fill_task
+        await asyncio.gather(
+            *(kernel["ready"] for kernel in self._kernels), *self._release_tasks
+        )
+
+    def take(self, path: str) -> Optional[Dict]:
+        """Take a kernel of the pool for a session file
+
+        Args:
+            path (str): Path of the session file, relative to the root
+            directory of the server
+
+        Returns:
+            Optional[Dict]: The "kernel_id" and the "directory" of the
+            session file relative to the working directory of the kernel, or
+            None if no kernel is available
+        """
+        self._add_recent(path)
+
+        kernels = [
+            kernel for kernel in self._kernels if kernel["id"] in self._kernel_manager
+        ]
+        # Prefer the kernel prepared for this session, then a generic one,
+        # then one prepared for another session
+        candidates = (
+            [kernel for kernel in kernels if kernel["path"] == path]
+            + [kernel for kernel in kernels if kernel["path"] is None]
+            + kernels
+        )
+        kernel = candidates[0] if candidates else None
+        if kernel is not None:
+            self._kernels.remove(kernel)
+        self.start()
+        if kernel is None:
+            return None
+        if kernel["path"] not in (None, path):
+            self._release(kernel)
+
+        session_dir = (self._root_dir / path).parent
+        return {
+            "kernel_id": kernel["id"],
+            "directory": os.path.relpath(session_dir, kernel["cwd"]),
+        }
+
+    def _release(self, kernel: Dict) -> None:
+        """Drop the datasets read in a kernel for another session file, once
+        it is prepared"""
+
+        async def release():
+            await kernel["ready"]
+            await self._execute(
+                kernel["id"],
+                "from glue_jupyterlab.glue_prewarm import clear_preloaded\n"
+                "clear_preloaded()",
+            )
+
+        task = asyncio.ensure_future(release())
+        self._release_tasks.add(task)
+        task.add_done_callback(self._release_tasks.discard)
+
+    def _next_path(self) -> Optional[str]:
+        """The next recent session file to prepare a kernel for"""
+        prepared = {kernel["path"] for kernel in self._kernels}
+        for path in self._recent[: self._preload_recent]:
+            if path not in prepared and (self._root_dir / path).is_file():
+                return path
+        return None
+
+    async def _start_kernel(self, path: Optional[str]) -> Dict:
+        if path is None:
+            kernel_dir = ""
+            code = "from glue_jupyterlab.glue_prewarm import prewarm\nprewarm()"
+        else:
+            kernel_dir = Path(path).parent.as_posix()
+            code = (
+                "from glue_jupyterlab.glue_prewarm import prewarm\n"
+                f"prewarm({json.dumps(Path(path).name)})"
+            )
+
+        kwargs = {"path": kernel_dir}
+        if self._kernel_name is not None:
+            kwargs["kernel_name"] = self._kernel_name
+        kernel_id = await ensure_async(self._kernel_manager.start_kernel(**kwargs))
+        return {
+            "id": kernel_id,
+            "path": path,
+            "cwd": self._root_dir / kernel_dir,
+            "ready": asyncio.ensure_future(self._execute(kernel_id, code)),
+        }
+
+    async def _execute(self, kernel_id: str, code: str) -> None:
+        client = self._kernel_manager.get_kernel(kernel_id).client()
+        client.start_channels()
+        try:
+            await client.wait_for_ready(timeout=KERNEL_READY_TIMEOUT)
+            reply = await client.execute_interactive(
+                code, silent=True, store_history=False, output_hook=lambda msg: None
+            )
+            if reply["content"]["status"] != "ok":
+                self._log_warning(
+                    f"Could not prepare the kernel {kernel_id}: "
+                    f"{reply['content'].get('evalue')}"
+                )
+        except Exception as e:
+            self._log_warning(f"Could not prepare the kernel {kernel_id}: {e}")
+        finally:
+            client.stop_channels()
+
+    def _read_recent(self) -> List[str]:
+        try:
+            with open(self._recent_file) as fobj:
+                recent = json.load(fobj)
+        except (OSError, ValueError):
+            return []
+        return [path for path in recent if isinstance(path, str)][:MAX_RECENT]
+
+    def _add_recent(self, path: str) -> None:
+        self._recent = [path] + [other for other in self._recent if other != path]
+        del self._recent[MAX_RECENT:]
+        try:
+            self._recent_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self._recent_file, "w") as fobj:
+                json.dump(self._recent, fobj)
+        except OSError as e:
+            self._log_warning(f"Could not save the recent glue sessions: {e}")
+
+    def _log_warning(self, message: str) -> None:
+        if self._log is not None:
+            self._log.warning(message)
+
+
+def setup_kernel_pool(server_app) -> Optional[KernelPool]:
+    """Create the pool of kernels configured by the environment, if any, and
+    start its kernels once the server runs"""
+    size = int(os.environ.get(KERNEL_POOL_SIZE_ENV) or 0)
+    if size <= 0:
+        return None
+
+    pool = KernelPool(
+        server_app.kernel_manager,
+        server_app.root_dir,
+        size,
+        preload_recent=int(os.environ.get(PRELOAD_RECENT_ENV) or 0),
+        log=server_app.log,
+    )
+    server_app.web_app.settings["glue_jupyterlab_kernel_pool"] = pool
+    IOLoop.current().add_callback(pool.start)
+    return pool
@@ -0,0 +1,55 @@
+import json
+
+from benchmarks.glu_generator import generate_session
+from benchmarks.run_benchmarks import STEPS, SessionBenchmark, compare
+
+
+def test_generate_session(tmp_path):
+    session_path = generate_session(
+        tmp_path, datasets=3, rows=100, components=3, links=2, tabs=2, viewers=2
+    )
+    contents = json.loads(session_path.read_text())
+    assert contents["DataCollection"]["data"] == ["data_0", "data_1", "data_2"]
+    assert len(contents["DataCollection"]["links"]) == 4
+    assert contents["__main__"]["tab_names"] == ["Tab 1", "Tab 2"]
+    assert [len(viewers) for viewers in contents["__main__"]["viewers"]] == [2, 2]
+    for i in range(3):
+        assert (tmp_path / f"data_{i}.csv").exists()
+
+
+def test_session_benchmark(tmp_path):
+    session_path = generate_session(tmp_path, rows=100, layers=2)
+    benchmark = SessionBenchmark(tmp_path, session_path)
+    timings = benchmark.run(STEPS)
+    assert list(timings) == STEPS
+    # All the viewers of the generated session are rendered
+    assert benchmark.check() == []
+    assert len(benchmark.session._viewers["Tab 1"]) == 2
+    assert len(benchmark.session.app.data_collection.external_links) == 1
+
+
+def test_compare():
+    baseline = {
+        "results": {
+            "small": {
+                "timings": {"ydoc_set": 0.1, "ydoc_get": 0.001},
+                "peak_memory": 100,
+            }
+        }
+    }
+    results = {
+        "results": {
+            "small": {
+                "timings": {"ydoc_set": 0.12, "ydoc_get": 0.003},
+                "peak_memory": 100,
+            }
+        }
+    }
+    assert compare(results, baseline) == []
+
+    results["results"]["small"]["timings"]["ydoc_set"] = 0.2
+    results["results"]["small"]["peak_memory"] = 200
+    regressions = compare(results, baseline)
+    assert len(regressions) == 2
+    assert regressions[0].startswith("small/ydoc_set")
+    assert regressions[1].startswith("small/peak_memory")
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+from pathlib import Path
+from glue.core import Data
+from glue.core.component import CategoricalComponent
+from glue.core.data_factories import load_data
+from glue_jupyterlab.glue_cache import DataCache
+from glue_jupyterlab.glue_loaders import read_table_chunked
+
+
+@pytest.fixture
+def data_cache(tmp_path):
+    return DataCache(str(tmp_path / "cache"))
+
+
+@pytest.mark.parametrize("file_name", ["w5.fits", "w5_psc.csv"])
+def test_load_data(data_cache, file_name):
+    path = str(Path(__file__).parents[2] / "examples" / file_name)
+    reference = load_data(path)
+
+    data_cache.load_data(path)
+    assert len(data_cache.info()) == 1
+
+    data = data_cache.load_data(path)
+    assert data.label == reference.label
+    assert type(data.coords) is type(reference.coords)
+
+    components = data.coordinate_components + data.main_components
+    ref_components = reference.coordinate_components + reference.main_components
+    assert [str(cid) for cid in components] == [str(cid) for cid in ref_components]
+    for cid in reference.main_components:
+        assert isinstance(data.get_component(str(cid)).data, np.memmap) or (
+            data.get_component(str(cid)).categorical
+        )
+        np.testing.assert_array_equal(data[str(cid)], reference[cid])
+
+    # The LoadLog is restored, the component indices match a fresh load
+    for cid in ref_components:
+        index = reference._load_log.id(reference.get_component(cid))
+        assert data._load_log.id(data.get_component(str(cid))) == index
+    assert data._load_log.factory is reference._load_log.factory
+
+
+@pytest.mark.parametrize("factory", [None, read_table_chunked])
+def test_load_data_strings(data_cache, tmp_path, factory):
+    path = tmp_path / "names.csv"
+    path.write_text("x,name\n1,short\n2,\n3," + "y" * 100 + "\n4,short\n")
+    reference = load_data(str(path), factory=factory)
+
+    data_cache.load_data(str(path), factory=factory)
+    assert len(data_cache.info()) == 1
+
+    data = data_cache.load_data(str(path), factory=factory)
+    component = data.get_component("name")
+    assert isinstance(component.data.base, np.memmap)
+    np.testing.assert_array_equal(component.labels, reference["name"])
+    np.testing.assert_array_equal(
+        component.codes, reference.get_component("name").codes
+    )
+    np.testing.assert_array_equal(data["x"], reference["x"])
+
+
+def read_object_labels(path):
+    names = Path(path).read_text().split()
+    data = Data(label="names")
+    data.add_component(CategoricalComponent(np.array(names, dtype=object)), "name")
+    return data
+
+
+def test_load_data_object_labels(data_cache, tmp_path):
+    path = tmp_path / "names.txt"
+    path.write_text("short\n" + "y" * 100 + "\nshort\n")
+    reference = read_object_labels(path)
+    assert reference.get_component("name").labels.dtype.kind == "O"
+
+    data_cache.load_data(str(path), factory=read_object_labels)
+    assert len(data_cache.info()) == 1
+
+    data = data_cache.load_data(str(path), factory=read_object_labels)
+    assert isinstance(data.get_component("name").data.base, np.memmap)
+    np.testing.assert_array_equal(data["name"], reference["name"])
+
+
+def test_eviction_and_clear(tmp_path):
+    examples = Path(__file__).parents[2] / "examples"
+    data_cache = DataCache(str(tmp_path / "cache"), max_size=1)
+    data_cache.load_data(str(examples / "w5_psc.csv"))
+    # The entry is bigger than the cache
+    assert data_cache.info() == []
+
+    data_cache = DataCache(str(tmp_path / "cache"))
+    data_cache.load_data(str(examples / "w5_psc.csv"))
+    data_cache.load_data(str(examples / "w5.fits"))
+    assert [entry["label"] for entry in data_cache.info()] == ["w5", "w5_psc"]
+
+    data_cache.clear()
+    assert data_cache.info() == []
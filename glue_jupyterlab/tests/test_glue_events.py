@@ -0,0 +1,79 @@
+import asyncio
+
+from glue_jupyterlab.glue_events import EventScheduler, merge_change, tab_changes
+
+
+class FakeEvent:
+    def __init__(self, keys, path=()):
+        self.keys = keys
+        self._path = list(path)
+
+    def path(self):
+        return self._path
+
+
+def add(value):
+    return {"action": "add", "newValue": value}
+
+
+def delete(value):
+    return {"action": "delete", "oldValue": value}
+
+
+def test_merge_change():
+    assert merge_change(None, add(1)) == add(1)
+    assert merge_change(add(1), delete(1)) is None
+    assert merge_change(add(1), {"action": "update", "oldValue": 1, "newValue": 2}) == {
+        "action": "add",
+        "newValue": 2,
+    }
+    assert merge_change(delete(1), add(2)) == {
+        "action": "update",
+        "oldValue": 1,
+        "newValue": 2,
+    }
+
+
+def test_tab_changes():
+    events = [
+        FakeEvent({"Tab 1": add({})}),
+        FakeEvent({"Viewer": add({})}, ["Tab 2"]),
+        FakeEvent({"x_min": add(0)}, ["Tab 2", "Viewer", "state"]),
+        FakeEvent({"Other": add({})}, ["Tab 2"]),
+        FakeEvent({"Other": delete({})}, ["Tab 2"]),
+    ]
+    changes = tab_changes(events)
+    assert changes == {("Tab 1",): add({}), ("Tab 2", "Viewer"): add({})}
+
+
+def test_scheduler_without_loop():
+    batches = []
+    scheduler = EventScheduler(batches.append)
+    scheduler.push("contents", FakeEvent({"a": add(1)}))
+    scheduler.push("contents", FakeEvent({"b": add(2)}))
+    # Processed immediately
+    assert batches == [{"contents": {("a",): add(1)}}, {"contents": {("b",): add(2)}}]
+    assert scheduler.metrics["coalesced"] == 0
+
+
+async def test_scheduler_coalesce():
+    batches = []
+    scheduler = EventScheduler(batches.append, delay=0.01)
+    for i in range(10):
+        scheduler.push("links", FakeEvent({"link": add(i)}))
+    scheduler.push("tabs", [FakeEvent({"Viewer": add({})}, ["Tab 1"])])
+    assert batches == []
+
+    await asyncio.sleep(0.05)
+    assert batches == [
+        {
+            "links": {("link",): add(9)},
+            "tabs": {("Tab 1", "Viewer"): add({})},
+        }
+    ]
+    metrics = scheduler.metrics
+    assert metrics["events"] == 11
+    assert metrics["batches"] == 1
+    assert metrics["coalesced"] == 10
+    assert metrics["changes"] == 2
+    assert metrics["max_batch"] == 11
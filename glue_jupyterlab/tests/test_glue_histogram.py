@@ -0,0 +1,91 @@
+import numpy as np
+import glue_jupyter as gj
+from glue.core.data import Data
+
+from glue_jupyterlab.glue_histogram import (
+    CachedHistogramView,
+    HistogramEngine,
+)
+
+
+def make_data():
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=10000)
+    x[::100] = np.nan
+    return Data(x=x, y=rng.random(10000), label="catalog")
+
+
+def glue_histogram(data, range, bins, log=False, subset_state=None):
+    return data.compute_histogram(
+        [data.id["x"]],
+        range=[range],
+        bins=[bins],
+        log=[log],
+        subset_state=subset_state,
+    )
+
+
+def test_histogram():
+    data = make_data()
+    engine = HistogramEngine()
+    for range, bins in [((-2, 2), 20), ((-5, 0.5), 7), ((0.5, -5), 100)]:
+        edges, hist = engine.histogram(data, data.id["x"], range, bins)
+        np.testing.assert_allclose(edges, np.linspace(*sorted(range), bins + 1))
+        np.testing.assert_array_equal(hist, glue_histogram(data, range, bins))
+
+    edges, hist = engine.histogram(data, data.id["y"], (0.01, 1), 10, log=True)
+    expected = data.compute_histogram(
+        [data.id["y"]], range=[(0.01, 1)], bins=[10], log=[True]
+    )
+    np.testing.assert_array_equal(hist, expected)
+
+
+def test_subset_histogram():
+    data = make_data()
+    engine = HistogramEngine()
+    subset_state = data.id["y"] > 0.7
+    edges, hist = engine.histogram(
+        data, data.id["x"], (-2, 2), 30, subset_state=subset_state
+    )
+    expected = glue_histogram(data, (-2, 2), 30, subset_state=subset_state)
+    np.testing.assert_array_equal(hist, expected)
+
+    # Rebinning reuses the sorted values of the subset
+    values = engine.sorted_values(data, data.id["x"], subset_state)
+    engine.histogram(data, data.id["x"], (-1, 1), 10, subset_state=subset_state)
+    assert engine.sorted_values(data, data.id["x"], subset_state) is values
+
+    # Invalidated when the data changes
+    data.update_components({data.id["y"]: 1 - data["y"]})
+    edges, hist = engine.histogram(
+        data, data.id["x"], (-2, 2), 30, subset_state=subset_state
+    )
+    expected = glue_histogram(data, (-2, 2), 30, subset_state=subset_state)
+    np.testing.assert_array_equal(hist, expected)
+
+
+def test_histogram_cache_bounds():
+    data = make_data()
+    engine = HistogramEngine(max_size=200000)
+    engine.sorted_values(data, data.id["x"])
+    engine.sorted_values(data, data.id["y"])
+    assert engine.size <= 200000
+
+
+def test_cached_histogram_view():
+    app = gj.jglue()
+    data = make_data()
+    app.add_data(data)
+    viewer = app.new_data_viewer(CachedHistogramView, data=data, show=False)
+    app.data_collection.new_subset_group("positive", data.id["x"] > 0)
+    viewer.state.hist_n_bin = 15
+
+    for layer in viewer.layers:
+        subset_state = getattr(layer.layer, "subset_state", None)
+        expected = glue_histogram(
+            data,
+            (viewer.state.hist_x_min, viewer.state.hist_x_max),
+            15,
+            subset_state=subset_state,
+        )
+        np.testing.assert_array_equal(layer.hist_unscaled, expected)
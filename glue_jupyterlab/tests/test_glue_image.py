@@ -0,0 +1,83 @@
+import numpy as np
+import glue_jupyter as gj
+from glue.core.data import Data
+
+from glue_jupyterlab.glue_image import (
+    ImagePyramid,
+    PyramidImageView,
+    TileCache,
+    get_pyramid,
+)
+
+
+def test_pyramid_levels():
+    pyramid = ImagePyramid(np.zeros((100, 70)), tile_size=16)
+    assert pyramid.shapes == [(100, 70), (50, 35), (25, 18), (13, 9)]
+    assert pyramid.level_for([(0, 99, 100), (0, 69, 70)]) == 0
+    assert pyramid.level_for([(0, 99, 25), (0, 69, 18)]) == 2
+    assert pyramid.level_for([(0, 99, 2), (0, 69, 2)]) == 3
+
+
+def test_pyramid_buffer():
+    array = np.arange(100 * 70, dtype=float).reshape(100, 70)
+    cache = TileCache()
+    pyramid = ImagePyramid(array, tile_size=16, tile_cache=cache)
+
+    # The level 0 is the nearest pixel of the array, NaN outside
+    bounds = [(-10, 99, 110), (0, 69, 35)]
+    buffer = pyramid.buffer(bounds, level=0)
+    assert np.all(np.isnan(buffer[:10]))
+    cols = np.round(np.linspace(0, 69, 35)).astype(int)
+    np.testing.assert_array_equal(buffer[10:], array[:, cols])
+    assert len(cache) == 0
+
+    # The other levels are the mean of the pixels
+    buffer = pyramid.buffer([(0, 98, 50), (0, 68, 35)], level=1)
+    expected = array.reshape(50, 2, 35, 2).mean(axis=(1, 3))
+    np.testing.assert_array_equal(buffer, expected)
+    assert len(cache) > 0
+
+    buffer = pyramid.buffer([(0, 99, 25), (0, 69, 18)], level=2)
+    np.testing.assert_allclose(buffer[0, 0], array[:4, :4].mean())
+    # Edge pixels only average the pixels in the array
+    np.testing.assert_allclose(buffer[0, -1], array[:4, 68:].mean())
+
+
+def test_tile_cache_bounds():
+    cache = TileCache(max_size=3 * 8 * 16)
+    for i in range(5):
+        cache.put(i, np.zeros(16))
+    assert len(cache) == 3
+    assert cache.get(0) is None
+    assert cache.get(4) is not None
+    assert cache.size == 3 * 8 * 16
+
+
+def test_get_pyramid():
+    data = Data(x=np.zeros((20, 20)), label="image")
+    component = data.get_component("x")
+    pyramid = get_pyramid(component)
+    assert get_pyramid(component) is pyramid
+
+    data.update_components({data.id["x"]: np.ones((20, 20))})
+    assert get_pyramid(component) is not pyramid
+
+
+def test_pyramid_image_view():
+    app = gj.jglue()
+    array = np.random.default_rng(0).random((2000, 1000))
+    data = Data(x=array, label="image")
+    app.add_data(data)
+    viewer = app.new_data_viewer(PyramidImageView, data=data, show=False)
+    layer = viewer.layers[0]
+
+    # Zoomed out, the image is read from the top of the pyramid (a single
+    # tile of 500x250 pixels)
+    image = layer.get_image_data(bounds=[(0, 1999, 100), (0, 999, 50)])
+    assert image.shape == (100, 50)
+    expected = array[:4, :4].mean()
+    np.testing.assert_allclose(image[0, 0], expected)
+
+    # At full resolution, glue computes the image
+    image = layer.get_image_data(bounds=[(0, 99, 100), (0, 49, 50)])
+    np.testing.assert_array_equal(image, array[:100, :50])
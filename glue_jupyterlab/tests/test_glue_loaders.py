@@ -0,0 +1,59 @@
+import numpy as np
+from pathlib import Path
+from glue.core.data_factories import load_data
+from glue_jupyterlab.glue_loaders import (
+    CHUNKED_TABLE_READER,
+    get_data_factory,
+    read_table_chunked,
+)
+
+
+def test_read_table_chunked():
+    path = str(Path(__file__).parents[2] / "examples" / "w5_psc.csv")
+    reference = load_data(path)
+    data = load_data(path, factory=read_table_chunked, chunk_size=100)
+
+    assert data.label == "w5_psc"
+    assert data.shape == reference.shape
+    assert [str(cid) for cid in data.main_components] == [
+        str(cid) for cid in reference.main_components
+    ]
+    for cid in reference.main_components:
+        expected = reference[cid]
+        values = data[str(cid)]
+        if expected.dtype.kind in "biuf":
+            assert isinstance(data.get_component(str(cid)).data, np.memmap)
+            np.testing.assert_allclose(values, expected, equal_nan=True)
+        else:
+            assert list(values) == list(expected)
+
+
+def test_read_table_chunked_strings(tmp_path):
+    names = ["short", "x" * 1000, "", "other"]
+    rows = [(i, names[i % 4]) for i in range(1000)]
+    path = tmp_path / "strings.csv"
+    path.write_text("id,name\n" + "".join(f"{i},{name}\n" for i, name in rows))
+
+    data = read_table_chunked(str(path), chunk_size=128)
+    component = data.get_component("name")
+    # Written by chunks to a memory-mapped file
+    assert isinstance(component.data.base, np.memmap)
+    assert component.labels.dtype == np.dtype("U1000")
+    assert list(component.labels) == [name for _, name in rows]
+    assert list(component.categories) == sorted(names)
+    np.testing.assert_array_equal(
+        component.codes, [sorted(names).index(name) for _, name in rows]
+    )
+
+
+def test_get_data_factory():
+    path = str(Path(__file__).parents[2] / "examples" / "w5_psc.csv")
+    assert get_data_factory(path, {}, None) is None
+    assert get_data_factory(path, {}, 1 << 30) is None
+    assert get_data_factory(path, {}, 0) is read_table_chunked
+
+    load_log = {"factory": {"function": CHUNKED_TABLE_READER}}
+    assert get_data_factory(path, load_log, None) is read_table_chunked
+
+    fits_path = str(Path(__file__).parents[2] / "examples" / "w5.fits")
+    assert get_data_factory(fits_path, {}, 0) is None
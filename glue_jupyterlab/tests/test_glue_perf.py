@@ -0,0 +1,83 @@
+import json
+import os
+import subprocess
+import sys
+
+from glue_jupyterlab.glue_perf import TRACE_FILE_ENV, PerfRecorder
+
+
+def test_spans_and_counters():
+    perf = PerfRecorder()
+    notified = []
+    perf.add_listener(lambda: notified.append(True))
+
+    @perf.timed()
+    def load():
+        with perf.span("parse", path="file.csv"):
+            perf.count("bytes_read", 100)
+
+    load()
+    load()
+    report = perf.report()
+    assert report["spans"]["load"]["count"] == 2
+    assert report["spans"]["parse"]["count"] == 2
+    assert report["spans"]["load"]["total"] >= report["spans"]["parse"]["total"]
+    assert report["counters"] == {"bytes_read": 200}
+    # Only notified at the end of the top-level spans
+    assert len(notified) == 2
+
+    perf.reset()
+    assert perf.report() == {"spans": {}, "counters": {}}
+
+
+def test_trace(tmp_path):
+    perf = PerfRecorder()
+    with perf.span("untraced"):
+        pass
+    perf.start_trace()
+    assert perf.tracing
+    with perf.span("render", viewer="scatter"):
+        with perf.span("factory"):
+            pass
+
+    path = tmp_path / "trace.json"
+    perf.dump_trace(str(path))
+    events = json.loads(path.read_text())["traceEvents"]
+    assert [event["name"] for event in events] == ["factory", "render"]
+    assert all(event["ph"] == "X" for event in events)
+    assert events[1]["args"] == {"viewer": "scatter"}
+    assert events[1]["dur"] >= events[0]["dur"]
+
+    assert len(perf.stop_trace()) == 2
+    assert not perf.tracing
+
+
+def test_trace_max_events():
+    perf = PerfRecorder()
+    perf.start_trace(max_events=3)
+    for idx in range(5):
+        with perf.span("span", index=idx):
+            pass
+    events = perf.stop_trace()
+    assert [event["args"]["index"] for event in events] == ["2", "3", "4"]
+
+
+def test_trace_from_environment(tmp_path):
+    path = tmp_path / "trace.json"
+    code = """
+from glue_jupyterlab.glue_perf import PERF
+from jupyter_ydoc import ydocs
+
+# Not traced by the server, which imports the glue documents
+assert "glu" in ydocs
+assert not PERF.tracing
+import glue_jupyterlab.glue_session
+
+assert PERF.tracing
+"""
+    subprocess.run(
+        [sys.executable, "-c", code],
+        env=dict(os.environ, **{TRACE_FILE_ENV: str(path)}),
+        check=True,
+    )
+    assert "traceEvents" in json.loads(path.read_text())
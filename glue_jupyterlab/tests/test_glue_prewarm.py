@@ -0,0 +1,23 @@
+from glue_jupyterlab.glue_perf import PERF
+from glue_jupyterlab.glue_prewarm import prewarm, take_preloaded
+from glue_jupyterlab.glue_session import SharedGlueSession
+
+
+def test_prewarm(session_path, yglue_doc):
+    report = prewarm(session_path)
+    assert sorted(report["datasets"]) == ["w5", "w5_psc"]
+    assert take_preloaded("w5.fits") is not None
+    assert take_preloaded("w5_psc.csv") is not None
+    # Handed over once
+    assert take_preloaded("w5.fits") is None
+
+
+def test_session_preloaded(session_path, yglue_doc):
+    prewarm(session_path)
+    PERF.reset()
+    glue_session = SharedGlueSession(session_path)
+    glue_session._document = yglue_doc
+    glue_session._load_data()
+    glue_session.load_all_data()
+    assert set(glue_session._data) == {"w5", "w5_psc"}
+    assert PERF.report()["counters"]["datasets_preloaded"] == 2
@@ -0,0 +1,75 @@
+import numpy as np
+import glue_jupyter as gj
+from glue.core.data import Data
+
+from glue_jupyterlab.glue_scatter import (
+    DecimatedScatter3DView,
+    apply_rendering_mode,
+    sample_indices,
+)
+
+
+def test_sample_indices():
+    priority = np.random.default_rng(0).random(100)
+    candidates = np.arange(0, 100, 2)
+    assert sample_indices(priority, candidates, 60) is candidates
+
+    sample = sample_indices(priority, candidates, 10)
+    assert len(sample) == 10
+    assert np.all(np.diff(sample) > 0)
+    assert set(sample) <= set(candidates)
+
+    # Zooming in keeps the points already displayed
+    zoomed = sample_indices(priority, candidates[:25], 10)
+    assert set(sample) & set(candidates[:25]) <= set(zoomed)
+
+
+def test_decimated_scatter3d():
+    app = gj.jglue()
+    size = 1000
+    rng = np.random.default_rng(1)
+    data = Data(x=rng.random(size), y=rng.random(size), z=rng.random(size), label="d")
+    app.add_data(data)
+    viewer = app.new_data_viewer(DecimatedScatter3DView, data=data, show=False)
+    layer = viewer.layers[0]
+    assert len(layer.scatter.x) == size
+
+    viewer.set_points_mode("density", max_points=100)
+    assert len(layer.scatter.x) == 100
+
+    # Refined on zoom
+    viewer.state.x_max = 0.5
+    assert len(layer.scatter.x) == 100
+    assert np.all(layer.scatter.z <= 0.5)
+
+    apply_rendering_mode(viewer, {"points_mode": "markers"})
+    assert len(layer.scatter.x) == size
+
+
+def test_apply_rendering_mode_2d():
+    app = gj.jglue()
+    data = Data(x=[1, 2, 3], y=[2, 3, 4], label="d")
+    app.add_data(data)
+    viewer = app.scatter2d(data=data, show=False)
+    assert not viewer.layers[0].state.density_map
+
+    apply_rendering_mode(viewer, {"points_mode": "density", "density_contrast": 0.5})
+    assert viewer.layers[0].state.density_map
+    assert viewer.layers[0].state.density_contrast == 0.5
+
+
+def test_decimated_scatter3d_remove():
+    app = gj.jglue()
+    rng = np.random.default_rng(1)
+    data = Data(x=rng.random(100), y=rng.random(100), z=rng.random(100), label="d")
+    app.add_data(data)
+    viewer = app.new_data_viewer(DecimatedScatter3DView, data=data, show=False)
+    viewer.set_points_mode("density", max_points=10)
+    layer = viewer.layers[0]
+
+    viewer.remove_data(data)
+    updates = []
+    layer.update = lambda: updates.append(True)
+    # The removed layer does not follow the limits of the viewer anymore
+    viewer.state.x_max = 0.5
+    assert updates == []
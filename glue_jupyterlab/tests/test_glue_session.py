@@ -1,7 +1,18 @@
+import asyncio
+import json
+import subprocess
+import sys
+import threading
+import numpy as np
 import y_py as Y
+from glue.core.link_helpers import LinkSame
+from glue.main import REQUIRED_PLUGINS
 from copy import deepcopy
 from pathlib import Path
 from ipywidgets import Output
+from glue_jupyterlab.glue_cache import DataCache
+from glue_jupyterlab.glue_events import merge_change
+from glue_jupyterlab.glue_pool import ViewerPool
 from glue_jupyterlab.glue_session import SharedGlueSession
 from glue_jupyterlab.glue_utils import nested_compare
 
@@ -13,10 +24,123 @@ def test_init(session_path):
     assert isinstance(glue_session._sessionYDoc, Y.YDoc)
 
 
+def test_startup_report(yglue_session):
+    report = yglue_session.get_startup_report()
+    assert report["import"] > 0
+    assert report["init"] > 0
+
+
+def test_deferred_plugins(session_path):
+    # Run in a new process, the plugins loaded by the other tests stay loaded
+    code = f"""
+import json
+from glue.main import _loaded_plugins
+from glue_jupyterlab.glue_session import SharedGlueSession
+
+session = SharedGlueSession({session_path!r})
+before = sorted(_loaded_plugins)
+session._load_plugins(
+    [{{"_type": "glue.plugins.wcs_autolinking.wcs_autolinking.WCSLink"}}]
+)
+print(json.dumps([before, sorted(_loaded_plugins), session.get_startup_report()]))
+"""
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    before, after, report = json.loads(output.splitlines()[-1])
+
+    # Only the plugins required by glue are loaded with the application
+    assert before == sorted(REQUIRED_PLUGINS)
+    assert after == sorted(REQUIRED_PLUGINS + ["glue.plugins.wcs_autolinking"])
+    assert "glue.plugins.tools" not in after
+    assert "wcs_autolinking" in report["plugins"]
+    assert "export_python" not in report["plugins"]
+
+
 def test__load_data(yglue_session):
     yglue_session._load_data()
+    # Datasets are registered but not read yet
+    assert "w5" in yglue_session._data_paths
+    assert "w5_psc" in yglue_session._data_paths
+    assert yglue_session._data == {}
+    assert yglue_session.get_loading_progress() == {
+        "total": 2,
+        "loaded": 0,
+        "pending": ["w5", "w5_psc"],
+    }
+
+    assert yglue_session._get_data("w5") is not None
+    assert "w5" in yglue_session._data
+    assert "w5_psc" not in yglue_session._data
+    assert yglue_session._document._yloading["loaded"] == 1
+
+    yglue_session.load_all_data()
+    assert "w5_psc" in yglue_session._data
+    assert yglue_session.get_loading_progress()["pending"] == []
+
+
+async def test__load_data_background(yglue_session):
+    yglue_session._load_data()
+    # Files are read in the thread pool
+    assert set(yglue_session._data_futures) == {"w5", "w5_psc"}
+
+    yglue_session.create_viewer("Tab 1", "ScatterViewer")
+    yglue_session.render_viewer()
+
+    for _ in range(200):
+        if not yglue_session.get_loading_progress()["pending"]:
+            break
+        await asyncio.sleep(0.05)
+
     assert "w5" in yglue_session._data
     assert "w5_psc" in yglue_session._data
+    # The viewer is rendered once its data is published
+    assert yglue_session._viewers["Tab 1"]["ScatterViewer"]["widget"] is not None
+
+
+async def test__load_data_background_unused(yglue_session):
+    # w5_psc is only used by this viewer and by the links
+    document = yglue_session._document
+    document.remove_tab_viewer("Tab 1", "ScatterViewer_0")
+    with document._ydoc.begin_transaction() as t:
+        for link_name in list(document.view("links")):
+            document._ylinks.pop(t, link_name)
+
+    read = []
+    read_data_file = yglue_session._read_data_file
+
+    def read_recorded(data_name):
+        read.append(data_name)
+        return read_data_file(data_name)
+
+    yglue_session._read_data_file = read_recorded
+    yglue_session._load_data()
+    assert set(yglue_session._data_futures) == {"w5"}
+
+    yglue_session.render_viewer()
+    for _ in range(200):
+        if "w5" in yglue_session._data:
+            break
+        await asyncio.sleep(0.05)
+    await asyncio.sleep(0.1)
+
+    # The unused dataset is never read
+    assert read == ["w5"]
+    assert yglue_session.get_loading_progress()["pending"] == ["w5_psc"]
+
+
+def test__load_data_cache(session_path, yglue_doc, tmp_path):
+    data_cache = DataCache(str(tmp_path))
+    for _ in range(2):
+        glue_session = SharedGlueSession(session_path, data_cache=data_cache)
+        glue_session._document = yglue_doc
+        glue_session._load_data()
+        glue_session.load_all_data()
+        assert len(data_cache.info()) == 2
+
+    # The second session reads the cached components
+    component = glue_session._data["w5"].get_component("PRIMARY")
+    assert isinstance(component.data, np.memmap)
 
 
 def test_create_viewer(yglue_session):
@@ -57,12 +181,200 @@ def test_render_removed_viewer(yglue_session):
     assert "ScatterViewer" not in yglue_session._viewers["Tab 1"]
 
 
+def test_render_tab_events(yglue_session):
+    yglue_session._load_data()
+    yglue_session.render_viewer()
+    document = yglue_session._document
+    scatter = yglue_session._viewers["Tab 1"]["ScatterViewer"]["widget"]
+    viewer_id = list(document.get_tab_data("Tab 2"))[0]
+
+    document._ytabs.observe_deep(yglue_session._render_tab_events)
+    document.remove_tab_viewer("Tab 2", viewer_id)
+
+    assert viewer_id not in yglue_session._viewers["Tab 2"]
+    # Viewers of other tabs are left untouched
+    assert yglue_session._viewers["Tab 1"]["ScatterViewer"]["widget"] is scatter
+
+    with document._ydoc.begin_transaction() as t:
+        document._ytabs.pop(t, "Tab 2")
+
+    assert "Tab 2" not in yglue_session._viewers
+    assert "Tab 1" in yglue_session._viewers
+
+
+async def test_document_events_coalesced(yglue_session):
+    yglue_session._load_data()
+    yglue_session.load_all_data()
+    yglue_session.render_viewer()
+    document = yglue_session._document
+    document.observe(yglue_session._on_document_change)
+
+    document.remove_tab_viewer("Tab 1", "ScatterViewer")
+    document.remove_tab_viewer("Tab 1", "HistogramViewer")
+    # Processed at the end of the event window
+    assert "ScatterViewer" in yglue_session._viewers["Tab 1"]
+    await asyncio.sleep(0.2)
+
+    assert "ScatterViewer" not in yglue_session._viewers["Tab 1"]
+    assert "HistogramViewer" not in yglue_session._viewers["Tab 1"]
+    metrics = yglue_session.get_event_metrics()
+    assert metrics["events"] == 2
+    assert metrics["batches"] == 1
+    assert metrics["coalesced"] == 1
+
+
+def test_performance_report(yglue_session):
+    yglue_session._load_data()
+    yglue_session.render_viewer()
+    yglue_session.mirror_performance()
+
+    report = yglue_session.get_performance_report()
+    assert report["startup"]["init"] > 0
+    assert report["spans"]["render_viewer"]["count"] >= 1
+    assert report["spans"]["viewer_factory/ScatterViewer"]["count"] >= 1
+    assert report["counters"]["bytes_read"] > 0
+
+    mirrored = yglue_session._sessionYDoc.get_map("performance")
+    assert "render_viewer" in mirrored["spans"]
+    yglue_session.mirror_performance(False)
+
+
+def test_viewer_pool(yglue_session):
+    yglue_session._load_data()
+    yglue_session.create_viewer("Tab 1", "ScatterViewer")
+    yglue_session.render_viewer()
+    scatter = yglue_session._viewers["Tab 1"]["ScatterViewer"]["widget"]
+
+    yglue_session.remove_viewer("Tab 1", "ScatterViewer")
+    assert len(yglue_session._viewer_pool) == 1
+
+    # A viewer of the same type and data reuses the detached widget
+    yglue_session.create_viewer("Tab 1", "ScatterViewer")
+    yglue_session.render_viewer()
+    assert yglue_session._viewers["Tab 1"]["ScatterViewer"]["widget"] is scatter
+    assert len(yglue_session._viewer_pool) == 0
+
+
+def test_viewer_pool_reset(yglue_session):
+    yglue_session._load_data()
+    data = yglue_session._get_data("w5_psc")
+    view_type = "glue.viewers.scatter.qt.data_viewer.ScatterViewer"
+    viewer = yglue_session._create_viewer_widgets(
+        view_type, "w5_psc", data, {"x_log": True, "x_min": -5}
+    )
+    widget = viewer["widget"]
+    x_min = yglue_session._initial_states[widget]["x_min"]
+    widget.layers[0].state.size_scaling = 3
+    yglue_session._viewer_pool.put(viewer["pool_key"], viewer, 0)
+
+    # The reused viewer only keeps the new state
+    viewer = yglue_session._create_viewer_widgets(
+        view_type, "w5_psc", data, {"y_log": True}
+    )
+    assert viewer["widget"] is widget
+    assert widget.state.y_log
+    assert not widget.state.x_log
+    assert widget.state.x_min == x_min
+    assert len(widget.layers) == 1
+    assert widget.layers[0].state.size_scaling == 1
+
+
+def test_estimate_viewer_memory(yglue_session):
+    yglue_session._load_data()
+    data = yglue_session._get_data("w5_psc")
+    assert yglue_session._estimate_viewer_memory("w5_psc") == data.size * 16
+
+    yglue_session._data["datasets"] = [data, data]
+    assert yglue_session._estimate_viewer_memory("datasets") == data.size * 32
+    assert yglue_session._estimate_viewer_memory("missing") == 0
+
+
+def test_render_config_lazy(yglue_session):
+    yglue_session._load_data()
+    yglue_session.create_viewer("Tab 1", "ScatterViewer")
+    yglue_session.render_viewer()
+    viewer = yglue_session._viewers["Tab 1"]["ScatterViewer"]
+    assert viewer["layer_options"] is None
+
+    yglue_session.render_config("Layer", "Tab 1", "ScatterViewer")
+    layer_options = viewer["layer_options"]
+    assert layer_options is not None
+    # Created once, then cached
+    yglue_session.render_config("Layer", "Tab 1", "ScatterViewer")
+    assert viewer["layer_options"] is layer_options
+
+    yglue_session.close_config("Layer", "Tab 1", "ScatterViewer")
+    assert viewer["layer_options"] is None
+    assert layer_options.comm is None
+
+
+def test_viewer_pool_bounds():
+    destroyed = []
+
+    class FakeWidget:
+        def __del__(self):
+            destroyed.append(id(self))
+
+    pool = ViewerPool(max_size=2, max_memory=100)
+    viewers = [{"viewer_options": FakeWidget()} for _ in range(3)]
+    for viewer in viewers:
+        pool.put("scatter", viewer, 10)
+    # The least recently released viewer is destroyed
+    assert len(pool) == 2
+    assert pool.memory == 20
+    assert destroyed == [id(viewers[0]["viewer_options"])]
+
+    pool.put("image", {}, 95)
+    assert len(pool) == 1
+    assert pool.take("scatter") is None
+    assert pool.take("image") == {}
+    assert pool.memory == 0
+
+
 def test__read_view_state(yglue_session):
     yglue_session._load_data()
     view_type, state = yglue_session._read_view_state("Tab 1", "ScatterViewer")
     assert view_type == "glue.viewers.scatter.qt.data_viewer.ScatterViewer"
     assert len(state) > 0
 
+    # The component ids are resolved against the data of the viewer
+    data = yglue_session._get_data("w5")
+    _, state = yglue_session._read_view_state("Tab 1", "ScatterViewer", data)
+    assert state["x_att"] is data.id["PRIMARY"]
+    assert state["x_axislabel"] == "PRIMARY"
+
+
+def test__read_layer_states(yglue_session):
+    layer_states = yglue_session._read_layer_states("Tab 1", "ScatterViewer")
+    assert [values["layer"] for values in layer_states] == ["w5", "Subset 1_0"]
+
+
+def test_restore_layers(yglue_session):
+    yglue_session._load_data()
+    yglue_session.create_viewer("Tab 1", "ScatterViewer")
+    yglue_session.render_viewer()
+    scatter = yglue_session._viewers["Tab 1"]["ScatterViewer"]["widget"]
+
+    layer = scatter.layers[0]
+    assert layer.layer.label == "w5"
+    # The serialized layer state is restored, not only the viewer state
+    assert layer.state.stretch == "log"
+    assert layer.state.color == "#595959"
+    assert layer.state.cmap_att is layer.layer.id["PRIMARY"]
+
+    yglue_session.add_viewer_layer("Tab 1", "ScatterViewer", "w5")
+    assert len(scatter.layers) == 1
+
+
+def test_subset_mask_cache(yglue_session):
+    yglue_session._load_data()
+    data = yglue_session._get_data("w5")
+    subset_state = data.id["PRIMARY"] > 1000
+
+    mask = data.get_mask(subset_state)
+    np.testing.assert_array_equal(mask, subset_state.to_mask(data))
+    assert len(yglue_session._subset_masks) == 1
+
 
 def test_add_data(yglue_session):
     yglue_session._load_data()
@@ -91,12 +403,42 @@ def test_add_data(yglue_session):
     assert "w6_psc" in updated_contents["DataCollection"]["data"]
 
 
+def test_add_data_incremental(yglue_session):
+    document = yglue_session._document
+    file_path = Path(__file__).parents[2] / "examples" / "w6_psc.vot"
+    events = []
+    document._ytabs.observe_deep(lambda e: events.append("tabs"))
+    document._ylinks.observe(lambda e: events.append("links"))
+    document._ycontents.observe(lambda e: events.append(sorted(e.keys)))
+
+    yglue_session.add_data(file_path)
+
+    # Only the new entries and the data collection are sent
+    assert len(events) == 1
+    assert "DataCollection" in events[0]
+    assert "w6_psc" in events[0]
+    assert "w5" not in events[0]
+    assert "w6_psc" in document.view("dataset")
+    assert "w5" not in yglue_session._data
+
+
 def test_add_identity_link(yglue_session, identity_link):
     yglue_session._load_data()
     change = {"LinkTest": {"action": "add", "newValue": identity_link}}
     yglue_session._update_links(change)
 
-    assert yglue_session._get_identity_link(identity_link) is not None
+    link = yglue_session._get_identity_link(identity_link)
+    assert link is not None
+
+    # The reversed link is the same identity link
+    reversed_link = dict(identity_link)
+    reversed_link.update(
+        data1="w5_psc",
+        data2="w5",
+        cids1_labels=["DEJ2000"],
+        cids2_labels=["Declination"],
+    )
+    assert yglue_session._get_identity_link(reversed_link) is link
 
 
 def test_delete_identity_link(yglue_session, identity_link):
@@ -105,3 +447,124 @@ def test_delete_identity_link(yglue_session, identity_link):
     yglue_session._update_links(change)
 
     assert yglue_session._get_identity_link(identity_link) is None
+    assert len(yglue_session.app.data_collection.external_links) == 0
+
+
+def test_identity_link_changed_by_glue(yglue_session, identity_link):
+    test_add_identity_link(yglue_session, identity_link)
+    data_collection = yglue_session.app.data_collection
+    link = yglue_session._get_identity_link(identity_link)
+
+    # Links removed and added without the session
+    data_collection.remove_link(link)
+    assert yglue_session._get_identity_link(identity_link) is None
+
+    w5 = yglue_session._get_data("w5")
+    w5_psc = yglue_session._get_data("w5_psc")
+    link = LinkSame(w5.id["Declination"], w5_psc.id["DEJ2000"])
+    data_collection.add_link(link)
+    assert yglue_session._get_identity_link(identity_link) is link
+
+
+def test_identity_links_batch(yglue_session, identity_link, monkeypatch):
+    yglue_session._load_data()
+    other_link = dict(identity_link)
+    other_link.update(
+        cids1=["Right Ascension"],
+        cids2=["RAJ2000"],
+        cids1_labels=["Right Ascension"],
+        cids2_labels=["RAJ2000"],
+    )
+    data_collection = yglue_session.app.data_collection
+    external_links = type(data_collection).external_links
+    reads = []
+
+    def read_links(self):
+        reads.append(self)
+        return external_links.fget(self)
+
+    monkeypatch.setattr(type(data_collection), "external_links", property(read_links))
+    yglue_session._update_links(
+        {
+            "LinkTest": {"action": "add", "newValue": identity_link},
+            "OtherLink": {"action": "add", "newValue": other_link},
+        }
+    )
+    # The links are read once to check the index, once to record them
+    assert len(reads) == 2
+    assert len(data_collection.external_links) == 2
+
+    reads.clear()
+    yglue_session._update_links(
+        {
+            "LinkTest": {"action": "delete", "oldValue": identity_link},
+            "OtherLink": {"action": "delete", "oldValue": other_link},
+        }
+    )
+    assert len(reads) == 2
+    assert len(data_collection.external_links) == 0
+    assert yglue_session._get_identity_link(identity_link) is None
+
+
+def test_edit_identity_link(yglue_session, identity_link):
+    test_add_identity_link(yglue_session, identity_link)
+    edited_link = dict(identity_link)
+    edited_link.update(
+        cids1=["Right Ascension"],
+        cids2=["RAJ2000"],
+        cids1_labels=["Right Ascension"],
+        cids2_labels=["RAJ2000"],
+    )
+    # The link deleted then added again in the same event window
+    change = merge_change(
+        merge_change(None, {"action": "delete", "oldValue": identity_link}),
+        {"action": "add", "newValue": edited_link},
+    )
+    assert change["action"] == "update"
+    yglue_session._process_document_changes({"links": {("LinkTest",): change}})
+
+    assert yglue_session._get_identity_link(identity_link) is None
+    link = yglue_session._get_identity_link(edited_link)
+    assert link is not None
+    assert list(yglue_session.app.data_collection.external_links) == [link]
+
+
+async def test_add_viewer_layer_loading(yglue_session):
+    # Hold the reading of w5_psc until the layer is added
+    read_data_file = yglue_session._read_data_file
+    released = threading.Event()
+
+    def read_held(data_name):
+        if data_name == "w5_psc":
+            released.wait(10)
+        return read_data_file(data_name)
+
+    yglue_session._read_data_file = read_held
+    yglue_session._load_data()
+    yglue_session.create_viewer("Tab 1", "ScatterViewer")
+    for _ in range(200):
+        yglue_session.render_viewer()
+        if yglue_session._viewers["Tab 1"]["ScatterViewer"]["widget"] is not None:
+            break
+        await asyncio.sleep(0.05)
+    scatter = yglue_session._viewers["Tab 1"]["ScatterViewer"]["widget"]
+
+    yglue_session.add_viewer_layer("Tab 1", "ScatterViewer", "w5_psc")
+    assert "w5_psc" not in {layer.layer.label for layer in scatter.layers}
+    print(
+        "DBG",
+        yglue_session._pending_layers,
+        list(yglue_session._data),
+        list(yglue_session._data_futures),
+    )
+
+    released.set()
+    for _ in range(200):
+        if "w5_psc" in yglue_session._data:
+            break
+        await asyncio.sleep(0.05)
+    await asyncio.sleep(0.05)
+
+    # The layer is added once its dataset is loaded
+    assert "w5_psc" in {layer.layer.label for layer in scatter.layers}
+    assert yglue_session._pending_layers == {}
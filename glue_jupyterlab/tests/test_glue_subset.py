@@ -0,0 +1,137 @@
+import numpy as np
+import pytest
+from glue.core.data import Data
+from glue.core.data_collection import DataCollection
+from glue.core.exceptions import IncompatibleAttribute
+from glue.core.link_helpers import LinkSame
+from glue.core.subset import (
+    AndState,
+    InvertState,
+    MultiOrState,
+    OrState,
+    RangeSubsetState,
+    XorState,
+)
+
+from glue_jupyterlab.glue_subset import SubsetMaskCache
+
+
+def make_data():
+    rng = np.random.default_rng(0)
+    return Data(x=rng.random(1001), y=rng.random(1001), label="catalog")
+
+
+def test_subset_masks():
+    data = make_data()
+    cache = SubsetMaskCache()
+    state1 = data.id["x"] > 0.3
+    state2 = data.id["y"] < 0.6
+    states = [
+        state1,
+        AndState(state1, state2),
+        OrState(state1, state2),
+        XorState(state1, state2),
+        InvertState(state1),
+        MultiOrState([state1, state2, data.id["x"] < 0.1]),
+    ]
+    for state in states:
+        expected = state.to_mask(data)
+        np.testing.assert_array_equal(cache.get_mask(data, state), expected)
+
+        view = np.array([0, 5, 1000, -1, 5])
+        np.testing.assert_array_equal(cache.get_mask(data, state, view), expected[view])
+        np.testing.assert_array_equal(
+            cache.get_mask(data, state, slice(10, 20)), expected[10:20]
+        )
+
+    # The operands copied by the compound subsets are computed once
+    assert len(cache) == len(states) + 2
+    assert cache.size == len(cache) * 126
+
+
+def test_subset_masks_reuse():
+    data = make_data()
+    cache = SubsetMaskCache()
+    cache.install(data)
+
+    calls = []
+
+    class CountingState(RangeSubsetState):
+        def to_mask(self, data, view=None):
+            calls.append(view)
+            return super().to_mask(data, view=view)
+
+    subset = data.new_subset()
+    subset.subset_state = CountingState(0.2, 0.5, data.id["x"])
+    mask = subset.to_mask()
+    np.testing.assert_array_equal(
+        subset.to_mask(view=np.arange(10)), mask[np.arange(10)]
+    )
+    data.compute_histogram(
+        [data.id["y"]], range=[(0, 1)], bins=[10], subset_state=subset.subset_state
+    )
+    assert calls == [None]
+
+    # The masks are recomputed when the values are updated
+    data.update_components({data.id["x"]: np.zeros(1001)})
+    assert not subset.to_mask().any()
+    assert calls == [None, None]
+
+
+def test_subset_masks_links():
+    a = Data(x=np.arange(10.0), label="a")
+    b = Data(y=np.arange(10.0), label="b")
+    data_collection = DataCollection([a, b])
+    cache = SubsetMaskCache()
+    cache.install(a)
+    link = LinkSame(a.id["x"], b.id["y"])
+    data_collection.add_link(link)
+
+    assert a.get_mask(b.id["y"] > 4).sum() == 5
+
+    # The mask is not valid anymore once the link is removed
+    data_collection.remove_link(link)
+    with pytest.raises(IncompatibleAttribute):
+        a.get_mask(b.id["y"] > 4)
+
+
+def test_subset_masks_subclass():
+    class EmptyMaskData(Data):
+        def get_mask(self, subset_state, view=None):
+            try:
+                return super().get_mask(subset_state, view=view)
+            except IncompatibleAttribute:
+                mask = np.zeros(self.shape, dtype=bool)
+                return mask if view is None else mask[view]
+
+    data = EmptyMaskData(x=np.arange(10.0), label="data")
+    other = Data(y=np.arange(10.0), label="other")
+    cache = SubsetMaskCache()
+    cache.install(data)
+    assert data.get_mask(data.id["x"] > 4).sum() == 5
+    assert len(cache) == 1
+
+    # The subsets the cache cannot compute go through the method of the class
+    assert not data.get_mask(other.id["y"] > 4).any()
+
+
+def test_subset_masks_2d():
+    data = Data(image=np.arange(35.0).reshape(5, 7), label="image")
+    cache = SubsetMaskCache()
+    state = data.id["image"] > 10
+    np.testing.assert_array_equal(cache.get_mask(data, state), state.to_mask(data))
+    np.testing.assert_array_equal(
+        cache.get_mask(data, state, (slice(1, 3), slice(None))),
+        state.to_mask(data)[1:3],
+    )
+
+
+def test_subset_masks_bounds():
+    data = make_data()
+    cache = SubsetMaskCache(max_size=300)
+    states = [data.id["x"] > value for value in (0.1, 0.2, 0.3)]
+    for state in states:
+        cache.get_mask(data, state)
+    # The least recently used mask is dropped
+    assert len(cache) == 2
+    assert cache.size == 252
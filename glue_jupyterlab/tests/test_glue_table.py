@@ -0,0 +1,102 @@
+import numpy as np
+import glue_jupyter as gj
+from glue.core.data import Data
+
+from glue_jupyterlab.glue_table import PagedTableViewer, TablePager
+
+
+def make_data():
+    return Data(
+        x=np.array([3.0, 1.0, np.nan, 2.0, 5.0]),
+        name=np.array(["c", "a", "e", "b", "d"]),
+        label="table",
+    )
+
+
+def test_pager_page():
+    pager = TablePager(make_data())
+    assert len(pager) == 5
+
+    page = pager.page(1, 2)
+    assert page["total"] == 5
+    assert page["columns"] == ["name", "x"]
+    assert page["rows"] == [
+        {"__row__": 1, "x": 1.0, "name": "a"},
+        {"__row__": 2, "x": None, "name": "e"},
+    ]
+
+    page = pager.page(0, 3, sort_by="name", descending=True)
+    assert [row["__row__"] for row in page["rows"]] == [2, 4, 0]
+
+
+def test_pager_filters():
+    pager = TablePager(make_data())
+    filters = [{"column": "x", "op": ">=", "value": 2}]
+    page = pager.page(0, 10, sort_by="x", filters=filters, columns=["name"])
+    assert page["total"] == 3
+    assert [row["name"] for row in page["rows"]] == ["b", "c", "d"]
+
+    filters.append({"column": "name", "op": "!=", "value": "c"})
+    page = pager.page(0, 10, filters=filters)
+    assert [row["__row__"] for row in page["rows"]] == [3, 4]
+
+
+def test_pager_cache():
+    data = make_data()
+    pager = TablePager(data)
+    indices = pager.sorted_indices("x")
+    assert pager.sorted_indices("x") is indices
+    order = pager.order("x", filters=[{"column": "x", "op": "<", "value": 4}])
+    assert pager.order("x", filters=[{"column": "x", "op": "<", "value": 4}]) is order
+
+    # Invalidated when the values change
+    data.update_components({data.id["x"]: np.array([5.0, 4.0, 3.0, 2.0, 1.0])})
+    assert list(pager.sorted_indices("x")) == [4, 3, 2, 1, 0]
+    order = pager.order("x", filters=[{"column": "x", "op": "<", "value": 4}])
+    assert list(order) == [4, 3, 2]
+
+
+def test_pager_cache_derived():
+    data = make_data()
+    data["twice"] = data.id["x"] * 2
+    pager = TablePager(data)
+    assert "twice" in pager.columns()
+    # The values of a derived column are computed on each access, the cache
+    # is kept while the dataset is unchanged
+    indices = pager.sorted_indices("twice")
+    assert pager.sorted_indices("twice") is indices
+    filters = [{"column": "twice", "op": ">", "value": 4}]
+    order = pager.order("twice", filters=filters)
+    assert pager.order("twice", filters=filters) is order
+
+    data.update_components({data.id["x"]: np.array([5.0, 4.0, 3.0, 2.0, 1.0])})
+    assert list(pager.sorted_indices("twice")) == [4, 3, 2, 1, 0]
+    assert list(pager.order("twice", filters=filters)) == [2, 1, 0]
+
+
+def test_paged_table_viewer():
+    app = gj.jglue()
+    data = make_data()
+    app.add_data(data)
+    data.new_subset(data.id["x"] > 2, label="big")
+    viewer = app.new_data_viewer(PagedTableViewer, data=data, show=False)
+    table = viewer.widget_table
+    table.options = {**table.options, "itemsPerPage": 2, "sortBy": ["x"]}
+    assert [item["__row__"] for item in table.items] == [1, 3]
+
+    table.selections = ["big"]
+    table.options = {**table.options, "page": 2}
+    assert [item["big"] for item in table.items] == [True, True]
+
+
+def test_get_table_page(yglue_session):
+    yglue_session._load_data()
+    data = make_data()
+    yglue_session.app.add_data(data)
+    viewer = yglue_session.app.new_data_viewer(PagedTableViewer, data=data, show=False)
+    yglue_session._viewers["Tab 1"] = {"TableViewer": {"widget": viewer}}
+
+    page = yglue_session.get_table_page("Tab 1", "TableViewer", 0, 2, sort_by="x")
+    assert page["total"] == 5
+    assert [row["x"] for row in page["rows"]] == [1.0, 2.0]
+    assert yglue_session.get_table_page("Tab 1", "Unknown", 0, 2) is None
@@ -1,4 +1,7 @@
 import json
+import pytest
+from tornado.httpclient import HTTPClientError
+from glue_jupyterlab.handlers import get_advanced_links_payload
 
 
 async def test_get_advanced_links_list(jp_fetch):
@@ -9,3 +12,30 @@ async def test_get_advanced_links_list(jp_fetch):
     assert response.code == 200
     payload = json.loads(response.body)
     assert list(payload["data"].keys()) == ["General", "Astronomy", "Join"]
+
+
+async def test_get_advanced_links_not_modified(jp_fetch):
+    response = await jp_fetch("glue-jupyterlab", "advanced-links")
+    etag = response.headers["Etag"]
+
+    with pytest.raises(HTTPClientError) as e:
+        await jp_fetch(
+            "glue-jupyterlab", "advanced-links", headers={"If-None-Match": etag}
+        )
+    assert e.value.code == 304
+
+    # The links computed again have the same ETag
+    get_advanced_links_payload.cache_clear()
+    response = await jp_fetch("glue-jupyterlab", "advanced-links")
+    assert response.code == 200
+    assert response.headers["Etag"] == etag
+
+
+async def test_warm_kernel_disabled(jp_fetch):
+    response = await jp_fetch(
+        "glue-jupyterlab",
+        "warm-kernel",
+        method="POST",
+        body=json.dumps({"path": "session.glu"}),
+    )
+    assert json.loads(response.body) == {"kernel_id": None, "directory": None}
@@ -0,0 +1,96 @@
+import shutil
+from pathlib import Path
+
+from glue_jupyterlab.kernel_pool import KernelPool
+
+EXAMPLES = Path(__file__).parents[2] / "examples"
+
+
+async def evaluate(kernel_manager, kernel_id, expression):
+    client = kernel_manager.get_kernel(kernel_id).client()
+    client.start_channels()
+    try:
+        await client.wait_for_ready(timeout=60)
+        reply = await client.execute_interactive(
+            "", user_expressions={"value": expression}, output_hook=lambda msg: None
+        )
+    finally:
+        client.stop_channels()
+    return reply["content"]["user_expressions"]["value"]["data"]["text/plain"]
+
+
+async def test_kernel_pool(jp_serverapp, jp_root_dir, tmp_path):
+    session_dir = jp_root_dir / "sessions"
+    session_dir.mkdir()
+    for name in ("session.glu", "w5.fits", "w5_psc.csv"):
+        shutil.copy(EXAMPLES / name, session_dir / name)
+
+    recent_file = tmp_path / "recent.json"
+    recent_file.write_text('["sessions/session.glu"]')
+    kernel_manager = jp_serverapp.kernel_manager
+    pool = KernelPool(
+        kernel_manager,
+        str(jp_root_dir),
+        size=2,
+        preload_recent=1,
+        recent_file=str(recent_file),
+    )
+    pool.start()
+    await pool.wait_ready()
+    assert sorted(kernel["path"] or "" for kernel in pool.kernels) == [
+        "",
+        "sessions/session.glu",
+    ]
+
+    # The kernel prepared for the session runs in its directory, with its
+    # datasets read
+    kernel = pool.take("sessions/session.glu")
+    assert kernel["directory"] == "."
+    preloaded = await evaluate(
+        kernel_manager,
+        kernel["kernel_id"],
+        "len(__import__('glue_jupyterlab.glue_prewarm').glue_prewarm._PRELOADED)",
+    )
+    assert preloaded == "2"
+
+    # Then the generic kernel, running in the root directory
+    kernel = pool.take("other/session.glu")
+    assert kernel["directory"] == "other"
+    assert pool.recent == ["other/session.glu", "sessions/session.glu"]
+
+    # The pool is filled again
+    await pool.wait_ready()
+    assert len(pool.kernels) == 2
+
+
+async def test_kernel_pool_other_session(jp_serverapp, jp_root_dir, tmp_path):
+    session_dir = jp_root_dir / "sessions"
+    session_dir.mkdir()
+    for name in ("session.glu", "w5.fits", "w5_psc.csv"):
+        shutil.copy(EXAMPLES / name, session_dir / name)
+
+    recent_file = tmp_path / "recent.json"
+    recent_file.write_text('["sessions/session.glu"]')
+    kernel_manager = jp_serverapp.kernel_manager
+    pool = KernelPool(
+        kernel_manager,
+        str(jp_root_dir),
+        size=1,
+        preload_recent=1,
+        recent_file=str(recent_file),
+    )
+    pool.start()
+    await pool.wait_ready()
+    assert [kernel["path"] for kernel in pool.kernels] == ["sessions/session.glu"]
+
+    # The only kernel is prepared for another session, its datasets are
+    # dropped
+    kernel = pool.take("other/session.glu")
+    assert kernel["directory"] == "../other"
+    await pool.wait_ready()
+    preloaded = await evaluate(
+        kernel_manager,
+        kernel["kernel_id"],
+        "len(__import__('glue_jupyterlab.glue_prewarm').glue_prewarm._PRELOADED)",
+    )
+    assert preloaded == "0"
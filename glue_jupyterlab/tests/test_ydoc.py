@@ -1,4 +1,5 @@
 import json
+from copy import deepcopy
 
 
 def test_set(yglue_doc):
@@ -92,3 +93,97 @@ def test_links(yglue_doc_links, identity_link):
     link_names = updated_content.get(_data_collection_name, {}).get("links", [])
 
     assert "TestLink" in link_names
+
+
+def test_extract_links_from_file(session_links_path, yglue_doc_links):
+    with open(session_links_path, "r") as fobj:
+        contents = json.load(fobj)
+    data_names = contents["DataCollection"]["data"]
+    dataset = {data_name: contents[data_name] for data_name in data_names}
+    attributes = {
+        attribute: contents[attribute]
+        for data_name in data_names
+        for attribute in contents[data_name]["primary_owner"]
+    }
+    # An attribute listed by several datasets belongs to the first one
+    contents["w6_psc"]["primary_owner"].append("RAJ2000")
+    expected = deepcopy(contents)
+
+    links = yglue_doc_links.extract_links_from_file(
+        ["ComponentLink", "ICRS_to_FK5"], contents, dataset, attributes
+    )
+
+    link = links["ComponentLink"]
+    assert (link["data1"], link["data2"]) == ("w5_psc", "w6_psc")
+    assert link["cids1_labels"] == ["RAJ2000"]
+    assert link["cids2_labels"] == ["RAJ2000"]
+    link = links["ICRS_to_FK5"]
+    assert (link["data1"], link["data2"]) == ("w5", "w5_psc")
+    assert link["cids2_labels"] == ["RAJ2000", "DEJ2000"]
+    # The contents of the file are left untouched
+    assert contents == expected
+
+
+def test_view_cache(yglue_doc):
+    for name in ["contents", "attributes", "dataset", "links", "tabs"]:
+        ymap = getattr(yglue_doc, f"_y{name}")
+        assert yglue_doc.view(name) == json.loads(ymap.to_json())
+
+    # Properties return copies which do not alter the cache
+    contents = yglue_doc.contents
+    contents.pop("HistogramViewer")
+    assert "HistogramViewer" in yglue_doc.view("contents")
+
+    ## Fake editing of the y structure
+    with yglue_doc._ydoc.begin_transaction() as t:
+        yglue_doc._ytabs["Tab 1"].set(t, "NewViewer", {"pos": [0, 0]})
+        yglue_doc._ycontents.pop(t, "HistogramViewer")
+
+    assert yglue_doc.view("tabs") == json.loads(yglue_doc._ytabs.to_json())
+    assert yglue_doc.get_tab_data("Tab 1")["NewViewer"] == {"pos": [0, 0]}
+    assert "HistogramViewer" not in yglue_doc.view("contents")
+
+
+def test_set_diff(session_path, yglue_doc):
+    with open(session_path, "r") as fobj:
+        data = json.load(fobj)
+
+    events = []
+    for name in ["contents", "attributes", "dataset", "links"]:
+        getattr(yglue_doc, f"_y{name}").observe(
+            lambda e, name=name: events.append((name, sorted(e.keys)))
+        )
+    yglue_doc._ytabs.observe_deep(
+        lambda evs: events.extend(("tabs", e.path(), sorted(e.keys)) for e in evs)
+    )
+
+    # Setting the same content is a no-op
+    yglue_doc.set(json.dumps(data))
+    assert events == []
+
+    # Only the modified viewer is updated, and the removed tab deleted
+    data["ScatterViewer"]["pos"] = [10, 10]
+    data["__main__"]["tab_names"] = data["__main__"]["tab_names"][:1]
+    data["__main__"]["viewers"] = data["__main__"]["viewers"][:1]
+    yglue_doc.set(json.dumps(data))
+
+    assert sorted(events) == [
+        ("contents", ["ScatterViewer", "__main__"]),
+        ("tabs", [], ["Tab 2"]),
+        ("tabs", ["Tab 1"], ["ScatterViewer"]),
+    ]
+    assert "Tab 2" not in yglue_doc._ytabs
+    assert yglue_doc.get_tab_data("Tab 1")["ScatterViewer"]["pos"] == [10, 10]
+
+
+def test_iter_source(yglue_doc_links):
+    content = yglue_doc_links.get()
+    assert content == json.dumps(json.loads(content), indent=2, sort_keys=True)
+
+    compact = "".join(yglue_doc_links.iter_source(compact=True))
+    assert compact == json.dumps(
+        json.loads(content), separators=(",", ":"), sort_keys=True
+    )
+
+    yglue_doc_links.compact = True
+    assert yglue_doc_links.get() == compact
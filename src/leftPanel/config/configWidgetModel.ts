@@ -58,6 +58,13 @@ export class ConfigWidgetModel implements IDisposable {
       if (!output) {
         return;
       }
+      if (this._currentArgs) {
+        SimplifiedOutputArea.execute(
+          this._closeConfigCode(this._currentArgs),
+          output,
+          context
+        );
+      }
       output.model.clear();
       this._currentArgs = undefined;
     }
@@ -83,8 +90,12 @@ export class ConfigWidgetModel implements IDisposable {
       if (!output) {
         return;
       }
+      // Tear down the config widgets of the previous viewer
+      const closeCode = this._currentArgs
+        ? `${this._closeConfigCode(this._currentArgs)}\n`
+        : '';
       SimplifiedOutputArea.execute(
-        `GLUE_SESSION.render_config("${this._config}","${args.tabId}","${args.cellId}")`,
+        `${closeCode}GLUE_SESSION.render_config("${this._config}","${args.tabId}","${args.cellId}")`,
         output,
         context
       );
@@ -92,6 +103,10 @@ export class ConfigWidgetModel implements IDisposable {
     }
   }
 
+  private _closeConfigCode(args: IRequestConfigDisplay): string {
+    return `GLUE_SESSION.close_config("${this._config}","${args.tabId}","${args.cellId}")`;
+  }
+
   private _sessionChanged(
     sender: IControlPanelModel,
     glueSessionWidget: IGlueSessionWidget | null
@@ -4,7 +4,8 @@ import glueIconStr from '../style/icons/glue-icon.svg';
 import { DocumentRegistry } from '@jupyterlab/docregistry';
 import { IRenderMimeRegistry } from '@jupyterlab/rendermime';
 import { Signal } from '@lumino/signaling';
-import { KernelMessage } from '@jupyterlab/services';
+import { URLExt } from '@jupyterlab/coreutils';
+import { KernelMessage, ServerConnection } from '@jupyterlab/services';
 
 export const glueIcon = new LabIcon({
   name: 'gluelab:glue-icon',
@@ -47,3 +48,32 @@ export const logKernelError = (msg: KernelMessage.IExecuteReplyMsg): void => {
     console.error('[Kernel Execution Error]', { ename, evalue, traceback });
   }
 };
+
+const WARM_KERNEL_URL = '/glue-jupyterlab/warm-kernel';
+
+/**
+ * Take a kernel prepared for a glue session by the server extension.
+ *
+ * @param {string} path The path of the session file
+ * @returns The id of the kernel and the directory of the session relative
+ * to the working directory of the kernel, null if there is no kernel ready
+ */
+export async function requestWarmKernel(
+  path: string
+): Promise<{ kernel_id: string | null; directory: string | null }> {
+  const settings = ServerConnection.makeSettings();
+  const requestUrl = URLExt.join(settings.baseUrl, WARM_KERNEL_URL);
+  try {
+    const response = await ServerConnection.makeRequest(
+      requestUrl,
+      { method: 'POST', body: JSON.stringify({ path }) },
+      settings
+    );
+    if (response.ok) {
+      return await response.json();
+    }
+  } catch (error) {
+    console.warn('Could not get a kernel for the glue session', error);
+  }
+  return { kernel_id: null, directory: null };
+}
@@ -13,7 +13,7 @@ import { CommandIDs } from '../commands';
 import { HTabPanel } from '../common/tabPanel';
 import { GlueSessionModel } from '../document/docModel';
 import { LinkEditor } from '../linkPanel/linkEditor';
-import { logKernelError, mockNotebook } from '../tools';
+import { logKernelError, mockNotebook, requestWarmKernel } from '../tools';
 import { DATASET_MIME, IDict, IGlueSessionSharedModel } from '../types';
 import { TabView } from './tabView';
 
@@ -138,6 +138,14 @@ export class SessionWidget extends BoxPanel {
 
   private async _startKernel() {
     const panel = mockNotebook(this._rendermime, this._context);
+    // Use a kernel already prepared by the server extension, if any
+    const warmKernel = await requestWarmKernel(this._context.localPath);
+    if (warmKernel.kernel_id) {
+      this._context.sessionContext.kernelPreference = {
+        ...this._context.sessionContext.kernelPreference,
+        id: warmKernel.kernel_id
+      };
+    }
     await this._context?.sessionContext.initialize();
     await this._context?.sessionContext.ready;
     // TODO: Make ipywidgets independent from a Notebook context
@@ -159,7 +167,13 @@ export class SessionWidget extends BoxPanel {
     this._kernel = kernel;
 
     // TODO Handle loading errors and report in the UI?
+    // A kernel of the pool may run in another directory than the session
+    const chdir =
+      warmKernel.directory && warmKernel.directory !== '.'
+        ? `import os; os.chdir(${JSON.stringify(warmKernel.directory)})`
+        : '';
     const code = `
+    ${chdir}
     from glue_jupyterlab.glue_session import SharedGlueSession
     GLUE_SESSION = SharedGlueSession("${this._context.localPath}")
     `;